@@ -0,0 +1,104 @@
+"""
+Import-time benchmark for the src modules (cold start of batch jobs and notebooks).
+
+Every module is imported in a fresh interpreter with `python -X importtime`, --repeat
+times; the best cumulative time is kept, together with the heavy third-party packages
+that the import pulled in (a ranking-only job should not pay for plotly or numpy):
+
+    python benchmarks/bench_import_time.py --output before.json
+    python benchmarks/bench_import_time.py --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(BENCH_PATH, '..')
+sys.path.append(PROJECT_PATH)
+
+from benchmarks.run_benchmarks import DEFAULT_DATA_DIR, _metadata
+
+MODULES = ['src.analysis_utils', 'src.plots_utils', 'src.data_utils', 'src.cache_utils', 'src.query_service']
+
+# Packages whose presence (and cumulative cost) is reported for every module
+HEAVY_PACKAGES = ['polars', 'numpy', 'pyarrow', 'plotly', 'plotly.express', 'plotly.graph_objects', 'pandas']
+
+#################################################################################################################
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from the `-X importtime` report (first import wins)."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return times
+
+def measure(module, statement=None):
+    """Import times of one fresh interpreter running `import module` (or a custom statement)."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement or f'import {module}'],
+        cwd=PROJECT_PATH, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+def bench_module(module, repeat):
+    runs = [measure(module) for _ in range(repeat)]
+    best = min(runs, key=lambda times: times[module][1])
+
+    return {
+        'module': module,
+        'best_ms': best[module][1] / 1000,
+        'median_ms': sorted(times[module][1] for times in runs)[len(runs) // 2] / 1000,
+        'repeat': repeat,
+        # Heavy packages loaded by the import and their cumulative cost in the best run
+        'packages_ms': {pkg: best[pkg][1] / 1000 for pkg in HEAVY_PACKAGES if pkg in best},
+    }
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {r['module']: r for r in baseline['results']}
+
+    print(f"\nvs. {baseline_path} (commit {baseline['metadata'].get('commit')})")
+    print(f"{'module':<24} {'best_ms':>9} {'base_ms':>9} {'ratio':>7}  packages (now / base)")
+    for r in results:
+        b = base.get(r['module'])
+        if b is None:
+            continue
+        ratio = r['best_ms'] / b['best_ms'] if b['best_ms'] else float('nan')
+        print(f"{r['module']:<24} {r['best_ms']:>9.1f} {b['best_ms']:>9.1f} {ratio:>7.2f}  "
+              f"{sorted(r['packages_ms'])} / {sorted(b['packages_ms'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='JSON file (default: <data/benchmarks>/import_time_<commit>.json)')
+    parser.add_argument('--compare', default=None, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    metadata = _metadata()
+    results = []
+
+    print(f"{'module':<24} {'best_ms':>9} {'median_ms':>10}  heavy packages loaded (cumulative ms)")
+    for module in args.modules:
+        r = bench_module(module, args.repeat)
+        results.append(r)
+        packages = ', '.join(f"{pkg} {ms:.0f}" for pkg, ms in r['packages_ms'].items()) or '-'
+        print(f"{module:<24} {r['best_ms']:>9.1f} {r['median_ms']:>10.1f}  {packages}")
+
+    output = args.output or os.path.join(DEFAULT_DATA_DIR, f"import_time_{metadata['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'metadata': metadata, 'results': results}, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
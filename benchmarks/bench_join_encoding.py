@@ -0,0 +1,85 @@
+"""
+Before/after benchmark of the rates-counts join in scripts/process_homicides_data_unodc.py:
+string join keys vs. dictionary-encoded (pl.Enum) keys, on synthetic UNODC-shaped data.
+
+Each variant runs in a fresh process so the peak RSS is not polluted by the other one.
+
+    python benchmarks/bench_join_encoding.py --scales 1 10 --repeat 3 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import multiprocessing as mp
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(BENCH_PATH, '..')
+
+#################################################################################################################
+
+def _run_variant(variant, scale, repeat, queue):
+    sys.path.append(PROJECT_PATH)
+    from benchmarks.synthetic_data import make_raw_unodc, load_processing_script
+    script = load_processing_script()
+
+    df_raw = script.harmonise_data(make_raw_unodc(scale))
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    encode_timings, derive_timings = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df_in = script.encode_dimensions(df_raw) if variant == 'enum' else df_raw
+        encoded = time.perf_counter()
+        df_out = script.derive_series(df_in)
+        encode_timings.append(encoded - start)
+        derive_timings.append(time.perf_counter() - encoded)
+
+    queue.put({
+        'variant': variant,
+        'scale': scale,
+        'rows_in': df_raw.height,
+        'rows_out': df_out.height,
+        'encode_s': min(encode_timings),
+        'derive_s': min(derive_timings),
+        'total_s': min(e + d for e, d in zip(encode_timings, derive_timings)),
+        'input_mb': df_in.estimated_size('mb'),
+        'output_mb': df_out.estimated_size('mb'),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'peak_rss_delta_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+    })
+
+def run_variant(variant, scale, repeat):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_variant, args=(variant, scale, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+#################################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='Optional JSON file with the raw results')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'scale':>6} {'variant':>8} {'rows_in':>10} {'encode_s':>9} {'derive_s':>9} {'total_s':>8} {'input_mb':>9} {'output_mb':>10} {'rss_delta_mb':>13}")
+    for scale in args.scales:
+        for variant in ('string', 'enum'):
+            r = run_variant(variant, scale, args.repeat)
+            results.append(r)
+            print(f"{scale:>6g} {variant:>8} {r['rows_in']:>10} {r['encode_s']:>9.3f} {r['derive_s']:>9.3f} {r['total_s']:>8.3f} {r['input_mb']:>9.1f} {r['output_mb']:>10.1f} {r['peak_rss_delta_mb']:>13.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Out-of-core check of the streaming mode of scripts/process_homicides_data_unodc.py.
+
+A synthetic raw extract whose in-memory size is --oversize times the --memory-cap is generated
+chunk by chunk (disjoint countries) as a directory of Parquet files, so it is never held in
+memory at once. It is then processed with process_data_streaming in a fresh process with that
+memory cap; the check passes if the peak RSS of the process stays under the cap. With
+--in-memory the regular pipeline (process_data) runs on the same extract for comparison:
+
+    python benchmarks/bench_streaming.py --memory-cap 512 --oversize 2 --in-memory
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing as mp
+from queue import Empty
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(BENCH_PATH, '..')
+sys.path.append(PROJECT_PATH)
+
+from benchmarks.run_benchmarks import DEFAULT_DATA_DIR, _metadata
+
+CHUNK_SCALE = 5 # Countries per generated chunk (x200)
+
+#################################################################################################################
+
+def generate_raw_extract(raw_dir, target_mb, seed=0):
+    """Writes chunks of the synthetic raw extract until their in-memory size reaches target_mb."""
+    from benchmarks.synthetic_data import make_raw_unodc, N_COUNTRIES
+
+    os.makedirs(raw_dir, exist_ok=True)
+    total_mb, rows, chunk = 0.0, 0, 0
+    while total_mb < target_mb:
+        df = make_raw_unodc(CHUNK_SCALE, seed=seed + chunk, first_country=chunk * int(N_COUNTRIES * CHUNK_SCALE))
+        df.write_parquet(os.path.join(raw_dir, f'chunk-{chunk:05d}.parquet'))
+        total_mb += df.estimated_size('mb')
+        rows += df.height
+        chunk += 1
+
+    return {'raw_mb': total_mb, 'raw_rows': rows, 'chunks': chunk}
+
+def _run_mode(mode, raw_dir, output_dir, memory_cap_mb, queue):
+    sys.path.append(PROJECT_PATH)
+    from benchmarks.synthetic_data import load_processing_script
+    from src.data_utils import write_processed_dataset
+    script = load_processing_script()
+
+    output_file = os.path.join(output_dir, 'processed.csv')
+    output_dataset = os.path.join(output_dir, 'processed')
+    output_coverage = os.path.join(output_dir, 'coverage.parquet')
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+
+    if mode == 'streaming':
+        rows, _ = script.process_data_streaming(
+            raw_dir, output_file, output_dataset, output_coverage, memory_cap_mb=memory_cap_mb
+        )
+    else:
+        df = script.process_data(script.scan_raw_data(raw_dir).collect())
+        df.write_csv(output_file)
+        write_processed_dataset(df, output_dataset)
+        script.build_coverage_index(df).write_parquet(output_coverage, statistics=True)
+        rows = df.height
+
+    queue.put({
+        'mode': mode,
+        'rows': rows,
+        'seconds': time.perf_counter() - start,
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'startup_rss_mb': rss_before / 1024,
+    })
+
+def run_mode(mode, raw_dir, output_dir, memory_cap_mb):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_mode, args=(mode, raw_dir, output_dir, memory_cap_mb, queue))
+    proc.start()
+
+    # The in-memory run may be killed by the OOM killer on big extracts: report it instead of waiting forever
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            if not proc.is_alive():
+                return {'mode': mode, 'error': f"exited with code {proc.exitcode}"}
+
+    proc.join()
+    return result
+
+#################################################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--memory-cap', type=int, default=512, help='Memory cap of the streaming run (MB)')
+    parser.add_argument('--oversize', type=float, default=2, help='In-memory size of the raw extract / memory cap')
+    parser.add_argument('--in-memory', action='store_true', help='Also run the in-memory pipeline on the same extract')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Scratch space for the extract and the outputs')
+    parser.add_argument('--output', default=None, help='JSON file (default: <data-dir>/streaming_<commit>.json)')
+    args = parser.parse_args()
+
+    metadata = _metadata()
+    os.makedirs(args.data_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='streaming_', dir=args.data_dir)
+
+    try:
+        raw_dir = os.path.join(work_dir, 'raw')
+        extract = generate_raw_extract(raw_dir, args.memory_cap * args.oversize)
+        print(f"Raw extract: {extract['raw_rows']} rows, {extract['raw_mb']:.0f} MB in memory "
+              f"({extract['chunks']} chunks) vs. memory cap {args.memory_cap} MB")
+
+        modes = ['streaming'] + (['in_memory'] if args.in_memory else [])
+        results = []
+        print(f"\n{'mode':<10} {'rows':>11} {'seconds':>9} {'peak_rss_mb':>12}")
+        for mode in modes:
+            output_dir = os.path.join(work_dir, mode)
+            os.makedirs(output_dir)
+            r = run_mode(mode, raw_dir, output_dir, args.memory_cap)
+            results.append(r)
+            if 'error' in r:
+                print(f"{mode:<10} {r['error']}")
+            else:
+                print(f"{mode:<10} {r['rows']:>11} {r['seconds']:>9.2f} {r['peak_rss_mb']:>12.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    streaming = results[0]
+    passed = 'error' not in streaming and streaming['peak_rss_mb'] <= args.memory_cap
+    print(f"\n{'✅' if passed else '❌'} Streaming peak RSS {streaming.get('peak_rss_mb', float('nan')):.1f} MB "
+          f"(cap {args.memory_cap} MB, extract {extract['raw_mb']:.0f} MB)")
+
+    output = args.output or os.path.join(args.data_dir, f"streaming_{metadata['commit'] or 'local'}.json")
+    with open(output, 'w') as f:
+        json.dump({
+            'metadata': metadata, 'memory_cap_mb': args.memory_cap, 'extract': extract,
+            'passed': passed, 'results': results
+        }, f, indent=2)
+    print(f"Results saved to {output}")
+
+    sys.exit(0 if passed else 1)
+
+if __name__ == '__main__':
+    main()
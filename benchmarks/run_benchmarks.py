@@ -0,0 +1,267 @@
+"""
+Benchmark suite for src/analysis_utils.py and src/plots_utils.py on synthetic UNODC-shaped
+data (no real data file needed). The processed dataset of every scale is generated once
+(through the real processing pipeline) and cached as Parquet under --data-dir.
+
+Each (case, scale) runs in a fresh process: wall time (best / median of --repeat runs),
+peak RSS delta, and peak Python heap (tracemalloc, measured in a separate run so it does
+not skew the timings). Results are saved as JSON, tagged with the git commit, so two
+commits can be compared:
+
+    python benchmarks/run_benchmarks.py --scales 1 10 --output before.json
+    python benchmarks/run_benchmarks.py --scales 1 10 --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import tempfile
+import tracemalloc
+import subprocess
+import multiprocessing as mp
+from queue import Empty
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(BENCH_PATH, '..')
+DEFAULT_DATA_DIR = os.path.join(PROJECT_PATH, 'data', 'benchmarks')
+
+PROP_YEARS_IN_PERIOD_LIMIT = 0.65
+REF_REGION_FOR_START_YEAR = 'Europe'
+
+#################################################################################################################
+
+def synthetic_dataset_path(scale, data_dir=DEFAULT_DATA_DIR):
+    """Processed synthetic dataset for a scale (generated and cached on first use)."""
+    path = os.path.join(data_dir, f"synthetic_processed_x{scale:g}.parquet")
+    if not os.path.exists(path):
+        sys.path.append(PROJECT_PATH)
+        from benchmarks.synthetic_data import make_processed_unodc
+        os.makedirs(data_dir, exist_ok=True)
+        make_processed_unodc(scale).write_parquet(path)
+    return path
+
+def load_synthetic_dataset(path):
+    # Same dtypes the notebooks get from the processed CSV (plain strings)
+    import polars as pl
+    df = pl.read_parquet(path)
+    return df.with_columns(pl.col(pl.Enum, pl.Categorical).cast(pl.String))
+
+#################################################################################################################
+
+# Each case is a setup function: receives the processed DataFrame and returns a no-argument
+# callable with the work to measure (anything that is not the function under test goes here).
+
+def _age_mapping():
+    sys.path.append(PROJECT_PATH)
+    from config.config_01a import AGE_MAPPING
+    return AGE_MAPPING
+
+def _time_series(df, by=None, dimension=None):
+    from src.analysis_utils import process_time_series_data
+    countries = df['Country'].unique().sort().to_list()
+    return process_time_series_data(
+        df, selected_countries=countries, prop_years_in_period_limit=PROP_YEARS_IN_PERIOD_LIMIT,
+        ref_region_for_start_year=REF_REGION_FOR_START_YEAR, by=by,
+        age_mapping=_age_mapping() if by == 'Age' else None, dimension=dimension
+    )
+
+def setup_countries_with_enough_data(df):
+    from src.analysis_utils import get_countries_with_enough_data
+    df_time_series, min_year, max_year = _time_series(df)
+    countries = df['Country'].unique().sort().to_list()
+    return lambda: get_countries_with_enough_data(
+        df_time_series['country'], countries, [min_year, max_year], PROP_YEARS_IN_PERIOD_LIMIT
+    )
+
+def setup_time_series(by, dimension=None):
+    def setup(df):
+        return lambda: _time_series(df, by=by, dimension=dimension)
+    return setup
+
+def setup_ranking(df):
+    from src.analysis_utils import process_ranking_data
+    df_time_series, min_year, max_year = _time_series(df)
+    countries = df['Country'].unique().sort().to_list()
+    return lambda: process_ranking_data(
+        df_time_series['country'], countries, PROP_YEARS_IN_PERIOD_LIMIT,
+        initial_years=[min_year, max_year - 10], max_year=max_year
+    )
+
+def setup_time_series_plot(df):
+    from src.plots_utils import time_series_plot
+    df_time_series, _, _ = _time_series(df)
+    output_path = os.path.join(tempfile.mkdtemp(), 'time_series.html')
+    return lambda: time_series_plot(
+        df_time_series['country'], x='Year', y='homicides_rate', color='Country',
+        hover_data=['Region_2', 'homicides_count'], default_visible_name='Spain',
+        title='Benchmark', plot_save_path=output_path, show=False
+    )
+
+def setup_barplot(df):
+    from src.analysis_utils import process_ranking_data
+    from src.plots_utils import barplot
+    df_time_series, min_year, max_year = _time_series(df)
+    countries = df['Country'].unique().sort().to_list()
+    df_ranking_combined, _ = process_ranking_data(
+        df_time_series['country'], countries, PROP_YEARS_IN_PERIOD_LIMIT,
+        initial_years=[min_year, max_year - 10], max_year=max_year
+    )
+    output_path = os.path.join(tempfile.mkdtemp(), 'barplot.html')
+    return lambda: barplot(
+        df_ranking_combined['country'], x='mean_homicides_rate', y='Country', color='Region_2',
+        facet_col='Periodo', cols_wrap=2, barmode='relative', title='Benchmark',
+        plot_save_path=output_path, show=False
+    )
+
+CASES = {
+    'get_countries_with_enough_data': setup_countries_with_enough_data,
+    'process_time_series_data[total]': setup_time_series(None),
+    'process_time_series_data[sex]': setup_time_series('Sex'),
+    'process_time_series_data[age]': setup_time_series('Age'),
+    'process_time_series_data[category]': setup_time_series('Category', 'by situational context'),
+    'process_ranking_data': setup_ranking,
+    'time_series_plot': setup_time_series_plot,
+    'barplot': setup_barplot,
+}
+
+#################################################################################################################
+
+def _silent(func):
+    # analysis_utils prints progress logs: keep them out of the timings and the output
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            return func()
+        finally:
+            sys.stdout = stdout
+
+def _run_case(case, scale, dataset_path, repeat, queue):
+    sys.path.append(PROJECT_PATH)
+    df = load_synthetic_dataset(dataset_path)
+    run = _silent(lambda: CASES[case](df))
+
+    # Setup already did the imports: the RSS high-water mark from here on is the case itself
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Warm-up (plotly templates, polars thread pool...) before timing
+    _silent(run)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _silent(run)
+        timings.append(time.perf_counter() - start)
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    _silent(run)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queue.put({
+        'case': case,
+        'scale': scale,
+        'rows': df.height,
+        'best_s': min(timings),
+        'median_s': statistics.median(timings),
+        'repeat': repeat,
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': rss_after / 1024,
+        'peak_rss_delta_mb': (rss_after - rss_before) / 1024,
+        'py_peak_mb': py_peak / 1024**2,
+    })
+
+def run_case(case, scale, dataset_path, repeat):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(case, scale, dataset_path, repeat, queue))
+    proc.start()
+
+    # If the child dies (e.g. out of memory at large scales) report it instead of waiting forever
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"Benchmark '{case}' (scale {scale:g}) exited with code {proc.exitcode}")
+
+    proc.join()
+    return result
+
+#################################################################################################################
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_PATH,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _metadata():
+    import polars as pl
+    import plotly
+    return {
+        'commit': _git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'polars': pl.__version__,
+        'plotly': plotly.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {(r['case'], r['scale']): r for r in baseline['results']}
+
+    print(f"\nvs. {baseline_path} (commit {baseline['metadata'].get('commit')})")
+    print(f"{'case':<38} {'scale':>6} {'best_s':>9} {'base_s':>9} {'ratio':>7} {'rss_delta':>10} {'base_rss':>9}")
+    for r in results:
+        b = base.get((r['case'], r['scale']))
+        if b is None:
+            continue
+        ratio = r['best_s'] / b['best_s'] if b['best_s'] else float('nan')
+        print(f"{r['case']:<38} {r['scale']:>6g} {r['best_s']:>9.3f} {b['best_s']:>9.3f} {ratio:>7.2f} {r['peak_rss_delta_mb']:>10.1f} {b['peak_rss_delta_mb']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10], help='e.g. 1 10 100 1000')
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Cache of the synthetic datasets')
+    parser.add_argument('--output', default=None, help='JSON file (default: <data-dir>/results_<commit>.json)')
+    parser.add_argument('--compare', default=None, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    metadata = _metadata()
+    results = []
+
+    print(f"{'case':<38} {'scale':>6} {'rows':>11} {'best_s':>9} {'median_s':>9} {'rss_delta_mb':>13} {'py_peak_mb':>11}")
+    for scale in args.scales:
+        dataset_path = synthetic_dataset_path(scale, args.data_dir)
+        for case in args.cases:
+            r = run_case(case, scale, dataset_path, args.repeat)
+            results.append(r)
+            print(f"{case:<38} {scale:>6g} {r['rows']:>11} {r['best_s']:>9.3f} {r['median_s']:>9.3f} {r['peak_rss_delta_mb']:>13.1f} {r['py_peak_mb']:>11.1f}")
+
+    output = args.output or os.path.join(args.data_dir, f"results_{metadata['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'metadata': metadata, 'results': results}, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
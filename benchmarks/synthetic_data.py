@@ -0,0 +1,121 @@
+import os
+import sys
+import importlib.util
+import numpy as np
+import polars as pl
+
+#################################################################################################################
+
+# Synthetic UNODC-shaped data (no real data file needed). Scale 1 is roughly the size of the
+# real 'Victims of intentional homicide' extract: ~200 countries, 1990-2023, most series sparse.
+
+N_COUNTRIES = 200
+YEARS = (1990, 2023)
+
+REGIONS = {
+    'Africa': ['Northern Africa', 'Sub-Saharan Africa'],
+    'Americas': ['Latin America and the Caribbean', 'Northern America'],
+    'Asia': ['Central Asia', 'Eastern Asia', 'South-eastern Asia', 'Southern Asia', 'Western Asia'],
+    'Europe': ['Eastern Europe', 'Northern Europe', 'Southern Europe', 'Western Europe'],
+    'Oceania': ['Australia and New Zealand', 'Melanesia'],
+}
+
+AGES = ['0-9', '10 -14', '15 -17', '18-19', '20-24', '25-29', '30-44', '45-59', '60 and older', 'Unknown']
+
+SEGMENTS = (
+    [('Total', 'Total', 'Total', 'Total')]
+    + [('Total', 'Total', sex, 'Total') for sex in ('Male', 'Female')]
+    + [('Total', 'Total', sex, age) for sex in ('Male', 'Female', 'Total') for age in AGES]
+    + [('by situational context', c, 'Total', 'Total') for c in (
+        'Organized crime', 'Interpersonal', 'Socio-political homicide - terrorist offences', 'Unknown', 'Total')]
+    + [('by mechanisms', c, 'Total', 'Total') for c in ('Firearms or explosives', 'Sharp object', 'Another weapon', 'Total')]
+)
+
+# Always present: Spain / USA (special cases of the processing script)
+FIXED_COUNTRIES = [('Spain', 'Europe', 'Southern Europe'), ('United States of America', 'Americas', 'Northern America')]
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(BENCH_PATH, '..')
+SCRIPT_FILE = os.path.join(PROJECT_PATH, 'scripts', 'process_homicides_data_unodc.py')
+
+#################################################################################################################
+
+def _countries(scale, rng, first_country=0):
+    n = max(int(N_COUNTRIES * scale), len(FIXED_COUNTRIES))
+    regions = list(REGIONS)
+    region_idx = rng.integers(0, len(regions), n)
+
+    names, region, subregion = [], [], []
+    for i in range(first_country, first_country + n):
+        if i < len(FIXED_COUNTRIES):
+            c, r, sr = FIXED_COUNTRIES[i]
+        else:
+            r = regions[region_idx[i - first_country]]
+            c = f"Country {i:06d}"
+            sr = REGIONS[r][i % len(REGIONS[r])]
+        names.append(c); region.append(r); subregion.append(sr)
+
+    return pl.DataFrame({
+        'Country': names, 'Region': region, 'Subregion': subregion,
+        'base_population': rng.integers(100_000, 200_000_000, n),
+    })
+
+def make_raw_unodc(scale=1, seed=0, segment_presence=0.3, year_presence=0.8, first_country=0):
+    """
+    Raw extract as returned by read_raw_data (indicator already filtered, COLS_REMOVE dropped):
+    one 'Counts' and one 'Rate per 100,000 population' row per series-year.
+    first_country numbers the countries from an offset, so big extracts can be generated
+    in chunks of disjoint countries (see bench_streaming.py).
+    """
+    rng = np.random.default_rng(seed)
+    df_countries = _countries(scale, rng, first_country)
+
+    df_segments = pl.DataFrame(SEGMENTS, schema=['Dimension', 'Category', 'Sex', 'Age'], orient='row')
+    df_years = pl.DataFrame({'Year': pl.int_range(YEARS[0], YEARS[1] + 1, eager=True)})
+
+    # Series: the national Total always exists, the rest of segments are sparse
+    df_series = df_countries.join(df_segments, how='cross')
+    is_total = (
+        (df_series['Dimension'] == 'Total') & (df_series['Category'] == 'Total') &
+        (df_series['Sex'] == 'Total') & (df_series['Age'] == 'Total')
+    ).to_numpy()
+    keep = is_total | (rng.random(df_series.height) < segment_presence)
+    df_series = df_series.filter(pl.Series(keep))
+
+    df = df_series.join(df_years, how='cross')
+    df = df.filter(pl.Series(rng.random(df.height) < year_presence))
+
+    n = df.height
+    share = np.where(df['Sex'].to_numpy() != 'Total', 0.5, 1.0) * np.where(df['Age'].to_numpy() != 'Total', 0.1, 1.0)
+    population = df['base_population'].to_numpy() * (1 + 0.01 * (df['Year'].to_numpy() - YEARS[0])) * share
+    counts = np.where(rng.random(n) < 0.08, 0, rng.integers(1, 5000, n)).astype(float)
+    rates = counts / population * 100000
+
+    df = df.drop('base_population').with_columns(
+        pl.Series('homicides_count', counts), pl.Series('homicides_rate', rates)
+    )
+
+    cols = ['Country', 'Region', 'Subregion', 'Dimension', 'Category', 'Sex', 'Age', 'Year']
+    return pl.concat([
+        df.select(cols + [pl.lit('Counts').alias('Unit of measurement'), pl.col('homicides_count').alias('VALUE')]),
+        df.select(cols + [pl.lit('Rate per 100,000 population').alias('Unit of measurement'), pl.col('homicides_rate').alias('VALUE')]),
+    ])
+
+#################################################################################################################
+
+def load_processing_script():
+    sys.path.append(PROJECT_PATH)
+    spec = importlib.util.spec_from_file_location('process_homicides_data_unodc', SCRIPT_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_processed_unodc(scale=1, seed=0, **kwargs):
+    """
+    Processed dataset with exactly the columns emitted by scripts/process_homicides_data_unodc.py
+    (the synthetic raw extract is run through the real harmonisation and derivation steps).
+    """
+    script = load_processing_script()
+    return script.process_data(make_raw_unodc(scale, seed, **kwargs))
+
+#################################################################################################################
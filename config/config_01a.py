@@ -209,4 +209,352 @@ PLOT_FILENAME['ranking_country'] = f'mean_homicides_world_by_country.html'
 
 PLOT_FILENAME['ranking_region'] = f'mean_homicides_world_by_region.html'
 
-#################################################################################################################
\ No newline at end of file
+#################################################################################################################
+# Informe estático (scripts/build_report.py): el análisis y las figuras del notebook 01a
+# se regeneran sin Jupyter. 'min_year' en initial_years es el año de inicio óptimo que
+# devuelve process_time_series_data.
+
+ANALYSIS = {
+    'name': '01a_total_homicides',
+    'title': 'Homicidios intencionados: total',
+    'by': None,
+    'dimension': None,
+    'age_mapping': None,
+    'initial_years': [1990, 'min_year', 2014, 2019]
+}
+
+FIGURES = [
+    {
+        'name': 'time_series_country_homicides_rate_by_Country',
+        'plot': 'time_series_plot',
+        'data': ('time_series', 'country'),
+        'kwargs': dict(
+            x='Year',
+            y='homicides_rate',
+            color='Country',
+            default_visible_name='Spain',
+            title='Evolución de la Tasa de Homicidios Intencionados en el Mundo (1990-2023)',
+            hover_data=HOVER_DATA['time_series_country'],
+            labels=LABELS['time_series'],
+            hovertemplate=HOVER_TEMPLATES['time_series_country'],
+            color_discrete_map=COLOR_MAP['Region_2'],
+            category_orders=CATEGORY_ORDERS
+        )
+    },
+    {
+        'name': 'time_series_country_homicides_rate_abs_change_by_Country',
+        'plot': 'time_series_plot',
+        'data': ('time_series', 'country'),
+        'kwargs': dict(
+            x='Year',
+            y='homicides_rate_abs_change',
+            color='Country',
+            default_visible_name='Spain',
+            title='Evolución de la Variación Absoluta de la Tasa de Homicidios Intencionados en el Mundo (1990-2023)',
+            hover_data=HOVER_DATA['time_series_country'],
+            labels=LABELS['time_series'],
+            hovertemplate=HOVER_TEMPLATES['time_series_country'],
+            color_discrete_map=COLOR_MAP['Region_2'],
+            category_orders=CATEGORY_ORDERS
+        )
+    },
+    {
+        'name': 'time_series_country_homicides_rate_by_Region_2',
+        'plot': 'time_series_plot',
+        'data': ('time_series', 'country'),
+        'kwargs': dict(
+            x='Year',
+            y='homicides_rate',
+            line_group='Country',
+            color='Region_2',
+            default_visible_name='Spain',
+            title='Evolución de la Tasa de Homicidios Intencionados en el Mundo por Región (1990-2023)',
+            hover_data=HOVER_DATA['time_series_country'],
+            labels=LABELS['time_series'],
+            hovertemplate=HOVER_TEMPLATES['time_series_country'],
+            color_discrete_map=COLOR_MAP['Region_2'],
+            category_orders=CATEGORY_ORDERS
+        )
+    },
+    {
+        'name': 'time_series_country_homicides_rate_abs_change_by_Region_2',
+        'plot': 'time_series_plot',
+        'data': ('time_series', 'country'),
+        'kwargs': dict(
+            x='Year',
+            y='homicides_rate_abs_change',
+            line_group='Country',
+            color='Region_2',
+            default_visible_name='Spain',
+            title='Evolución de la Variación Absoluta de la Tasa de Homicidios Intencionados en el Mundo por Región (1990-2023)',
+            hover_data=HOVER_DATA['time_series_country'],
+            labels=LABELS['time_series'],
+            hovertemplate=HOVER_TEMPLATES['time_series_country'],
+            color_discrete_map=COLOR_MAP['Region_2'],
+            category_orders=CATEGORY_ORDERS
+        )
+    },
+    {
+        'name': 'time_series_region_mean_homicides_rate_by_Region_2',
+        'plot': 'time_series_plot',
+        'data': ('time_series', 'region'),
+        'kwargs': dict(
+            x='Year',
+            y='mean_homicides_rate',
+            line_group='Region_2',
+            color='Region_2',
+            default_visible_name='Spain',
+            title='Evolución de la Tasa Media de Homicidios Intencionados en el Mundo por Región (1990-2023)',
+            hover_data=HOVER_DATA['time_series_region'],
+            labels=LABELS['time_series'],
+            hovertemplate=HOVER_TEMPLATES['time_series_region'],
+            color_discrete_map=COLOR_MAP['Region_2'],
+            category_orders=CATEGORY_ORDERS
+        )
+    },
+    {
+        'name': 'ranking_country_by_Region_2_2col',
+        'plot': 'barplot',
+        'data': ('ranking', 'country'),
+        'kwargs': dict(
+            x='mean_homicides_rate',
+            y='Country',
+            height=1000,
+            orientation='h',
+            color='Region_2',
+            facet_col='Periodo',
+            cols_wrap=2,
+            barmode='relative',
+            color_discrete_map=COLOR_MAP['Region_2'],
+            hover_data=HOVER_DATA['ranking_country'],
+            labels=LABELS['ranking'],
+            hovertemplate=HOVER_TEMPLATES['ranking_country'],
+            title="Ranking Mundial de Homicidios por País"
+        )
+    },
+    {
+        'name': 'ranking_country_by_Region_2_1col',
+        'plot': 'barplot',
+        'data': ('ranking', 'country'),
+        'kwargs': dict(
+            x='mean_homicides_rate',
+            y='Country',
+            height=2000,
+            orientation='h',
+            color='Region_2',
+            facet_col='Periodo',
+            cols_wrap=1,
+            barmode='relative',
+            vertical_spacing=0.01,
+            color_discrete_map=COLOR_MAP['Region_2'],
+            hover_data=HOVER_DATA['ranking_country'],
+            labels=LABELS['ranking'],
+            hovertemplate=HOVER_TEMPLATES['ranking_country'],
+            title="Ranking Mundial de Homicidios por País para diferentes Periodos"
+        )
+    },
+    {
+        'name': 'ranking_region_by_Region_2_1col',
+        'plot': 'barplot',
+        'data': ('ranking', 'region'),
+        'kwargs': dict(
+            x='mean_homicides_rate',
+            y='Region_2',
+            height=800,
+            orientation='h',
+            color='Region_2',
+            facet_col='Periodo',
+            cols_wrap=1,
+            barmode='relative',
+            vertical_spacing=0.03,
+            color_discrete_map=COLOR_MAP['Region_2'],
+            hover_data=HOVER_DATA['ranking_region'],
+            labels=LABELS['ranking'],
+            hovertemplate=HOVER_TEMPLATES['ranking_region'],
+            title="Ranking Mundial de Homicidios por País para diferentes Periodos"
+        )
+    },
+    {
+        'name': 'ranking_region_by_Region_2_2col',
+        'plot': 'barplot',
+        'data': ('ranking', 'region'),
+        'kwargs': dict(
+            x='mean_homicides_rate',
+            y='Region_2',
+            height=800,
+            orientation='h',
+            color='Region_2',
+            facet_col='Periodo',
+            cols_wrap=2,
+            barmode='relative',
+            vertical_spacing=0.03,
+            color_discrete_map=COLOR_MAP['Region_2'],
+            hover_data=HOVER_DATA['ranking_region'],
+            labels=LABELS['ranking'],
+            hovertemplate=HOVER_TEMPLATES['ranking_region'],
+            title="Ranking Mundial de Homicidios por País para diferentes Periodos"
+        )
+    },
+]
+
+#################################################################################################################
+
+# Figuras de los desgloses (notebooks 01b-01e): las mismas figuras, cambiando solo 'by' y los títulos
+
+def breakdown_figures(by, label, default_visible_name, facet_col_wrap=None, region_dash=False):
+    """
+    Lista FIGURES de un desglose (by='Sex', 'Age' o 'Category').
+    - label: nombre del desglose en los títulos, ej. 'Sexo' -> '... por Región y Sexo (1990-2023)'
+    - default_visible_name: series visibles al abrir las figuras con line_dash, ej. ['Spain, Female', 'Spain, Male']
+    - facet_col_wrap: facetas por fila en las series temporales (None: todas en una fila)
+    - region_dash: añade la serie regional con line_dash (legible con pocos segmentos, ej. Sexo)
+    """
+    facet = dict(facet_col=by, facet_col_wrap=facet_col_wrap) if facet_col_wrap else dict(facet_col=by)
+
+    time_series_country = dict(
+        x='Year',
+        y='homicides_rate',
+        line_group='Country',
+        hover_data=HOVER_DATA['time_series_country'],
+        labels=LABELS['time_series'],
+        hovertemplate=HOVER_TEMPLATES['time_series_country'],
+        color_discrete_map=COLOR_MAP['Region_2'],
+        category_orders=CATEGORY_ORDERS
+    )
+    time_series_region = dict(
+        time_series_country,
+        y='mean_homicides_rate',
+        line_group='Region_2',
+        hover_data=HOVER_DATA['time_series_region'],
+        hovertemplate=HOVER_TEMPLATES['time_series_region']
+    )
+
+    # Con line_dash el segmento no se distingue por la faceta: se añade al hover
+    dash_hover = dict(
+        hover_data={**HOVER_DATA['time_series_country'], by: True},
+        hovertemplate=HOVER_TEMPLATES['time_series_country'].replace(
+            '<extra></extra>', f'<br><b>{label}:</b> %{{customdata[3]}}<extra></extra>'
+        )
+    )
+
+    ranking = dict(
+        x='mean_homicides_rate',
+        reverse_y_order=False,
+        orientation='h',
+        color=by,
+        barmode='group',
+        facet_col='Periodo',
+        yticks_color_column='Region_2',
+        yticks_color_map=COLOR_MAP['Region_2'],
+        labels=LABELS['ranking'],
+        **({'color_discrete_map': COLOR_MAP[by]} if by in COLOR_MAP else {})
+    )
+    ranking_country = dict(
+        ranking,
+        y='Country',
+        hover_data=HOVER_DATA['ranking_country'],
+        hovertemplate=HOVER_TEMPLATES['ranking_country'],
+        title=f"Ranking Mundial de Homicidios por País y {label}"
+    )
+    ranking_region = dict(
+        ranking,
+        y='Region_2',
+        height=800,
+        vertical_spacing=0.03,
+        hover_data=HOVER_DATA['ranking_region'],
+        hovertemplate=HOVER_TEMPLATES['ranking_region'],
+        title=f"Ranking Mundial de Homicidios por Región y {label}"
+    )
+
+    figures = [
+        {
+            'name': f'time_series_country_homicides_rate_by_Country_facet_{by}',
+            'plot': 'time_series_plot',
+            'data': ('time_series', 'country'),
+            'kwargs': dict(
+                time_series_country, **facet,
+                color='Country',
+                default_visible_name='Spain',
+                title=f'Evolución de la Tasa de Homicidios Intencionados en el Mundo por {label} (1990-2023)'
+            )
+        },
+        {
+            'name': f'time_series_country_homicides_rate_by_Region_2_facet_{by}',
+            'plot': 'time_series_plot',
+            'data': ('time_series', 'country'),
+            'kwargs': dict(
+                time_series_country, **facet,
+                color='Region_2',
+                default_visible_name='Spain',
+                title=f'Evolución de la Tasa de Homicidios Intencionados en el Mundo por Región y {label} (1990-2023)'
+            )
+        },
+        {
+            'name': f'time_series_country_homicides_rate_by_Region_2_dash_{by}',
+            'plot': 'time_series_plot',
+            'data': ('time_series', 'country'),
+            'kwargs': dict(
+                time_series_country, **dash_hover,
+                line_dash=by,
+                color='Region_2',
+                default_visible_name=default_visible_name,
+                title=f'Evolución de la Tasa de Homicidios por Región y {label} (1990-2023)'
+            )
+        },
+        {
+            'name': f'time_series_region_mean_homicides_rate_by_Region_2_facet_{by}',
+            'plot': 'time_series_plot',
+            'data': ('time_series', 'region'),
+            'kwargs': dict(
+                time_series_region, **facet,
+                color='Region_2',
+                default_visible_name='Spain',
+                title=f'Evolución de la Tasa Media de Homicidios Intencionados en el Mundo por Región y {label} (1990-2023)'
+            )
+        },
+    ]
+
+    if region_dash:
+        figures.append({
+            'name': f'time_series_region_mean_homicides_rate_by_Region_2_dash_{by}',
+            'plot': 'time_series_plot',
+            'data': ('time_series', 'region'),
+            'kwargs': dict(
+                time_series_region,
+                line_dash=by,
+                color='Region_2',
+                default_visible_name=default_visible_name,
+                title=f'Evolución de la Tasa de Homicidios por Región y {label} (1990-2023)'
+            )
+        })
+
+    figures += [
+        {
+            'name': f'ranking_country_by_{by}_1col',
+            'plot': 'barplot',
+            'data': ('ranking', 'country'),
+            'kwargs': dict(ranking_country, height=2000, cols_wrap=1, vertical_spacing=0.01)
+        },
+        {
+            'name': f'ranking_country_by_{by}_2col',
+            'plot': 'barplot',
+            'data': ('ranking', 'country'),
+            'kwargs': dict(ranking_country, height=1000, cols_wrap=2, vertical_spacing=0.03)
+        },
+        {
+            'name': f'ranking_region_by_{by}_1col',
+            'plot': 'barplot',
+            'data': ('ranking', 'region'),
+            'kwargs': dict(ranking_region, cols_wrap=1)
+        },
+        {
+            'name': f'ranking_region_by_{by}_2col',
+            'plot': 'barplot',
+            'data': ('ranking', 'region'),
+            'kwargs': dict(ranking_region, cols_wrap=2)
+        },
+    ]
+
+    return figures
+
+#################################################################################################################
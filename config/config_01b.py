@@ -0,0 +1,31 @@
+# Configuración del notebook 01b: comparte países, colores y textos con config_01a
+from config.config_01a import (
+    SELECTED_COUNTRIES,
+    PROP_YEARS_IN_PERIOD_LIMIT,
+    REF_REGION_FOR_START_YEAR,
+    breakdown_figures
+)
+
+#################################################################################################################
+
+# Informe estático (scripts/build_report.py): el análisis y las figuras del notebook 01b
+# se regeneran sin Jupyter. 'min_year' en initial_years es el año de inicio óptimo que
+# devuelve process_time_series_data.
+
+ANALYSIS = {
+    'name': '01b_sex_homicides',
+    'title': 'Homicidios intencionados por sexo',
+    'by': 'Sex',
+    'dimension': None,
+    'age_mapping': None,
+    'initial_years': [1990, 'min_year', 2014, 2019]
+}
+
+FIGURES = breakdown_figures(
+    by='Sex',
+    label='Sexo',
+    default_visible_name=['Spain, Female', 'Spain, Male'],
+    region_dash=True
+)
+
+#################################################################################################################
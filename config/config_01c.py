@@ -0,0 +1,32 @@
+# Configuración del notebook 01c: comparte países, colores y textos con config_01a
+from config.config_01a import (
+    SELECTED_COUNTRIES,
+    PROP_YEARS_IN_PERIOD_LIMIT,
+    REF_REGION_FOR_START_YEAR,
+    AGE_MAPPING,
+    breakdown_figures
+)
+
+#################################################################################################################
+
+# Informe estático (scripts/build_report.py): el análisis y las figuras del notebook 01c
+# se regeneran sin Jupyter. 'min_year' en initial_years es el año de inicio óptimo que
+# devuelve process_time_series_data.
+
+ANALYSIS = {
+    'name': '01c_age_homicides',
+    'title': 'Homicidios intencionados por edad',
+    'by': 'Age',
+    'dimension': None,
+    'age_mapping': AGE_MAPPING,
+    'initial_years': [1990, 'min_year', 2014, 2019]
+}
+
+FIGURES = breakdown_figures(
+    by='Age',
+    label='Edad',
+    default_visible_name=['Spain, 15-19', 'Spain, 20-29'],
+    facet_col_wrap=3
+)
+
+#################################################################################################################
@@ -0,0 +1,31 @@
+# Configuración del notebook 01d: comparte países, colores y textos con config_01a
+from config.config_01a import (
+    SELECTED_COUNTRIES,
+    PROP_YEARS_IN_PERIOD_LIMIT,
+    REF_REGION_FOR_START_YEAR,
+    breakdown_figures
+)
+
+#################################################################################################################
+
+# Informe estático (scripts/build_report.py): el análisis y las figuras del notebook 01d
+# se regeneran sin Jupyter. 'min_year' en initial_years es el año de inicio óptimo que
+# devuelve process_time_series_data.
+
+ANALYSIS = {
+    'name': '01d_situational_context_homicides',
+    'title': 'Homicidios intencionados por contexto situacional',
+    'by': 'Category',
+    'dimension': 'by situational context',
+    'age_mapping': None,
+    'initial_years': ['min_year', 2019, 2021]
+}
+
+FIGURES = breakdown_figures(
+    by='Category',
+    label='Contexto Situacional',
+    default_visible_name=['Spain, Interpersonal', 'Spain, Organized crime'],
+    facet_col_wrap=3
+)
+
+#################################################################################################################
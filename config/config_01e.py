@@ -0,0 +1,31 @@
+# Configuración del notebook 01e: comparte países, colores y textos con config_01a
+from config.config_01a import (
+    SELECTED_COUNTRIES,
+    PROP_YEARS_IN_PERIOD_LIMIT,
+    REF_REGION_FOR_START_YEAR,
+    breakdown_figures
+)
+
+#################################################################################################################
+
+# Informe estático (scripts/build_report.py): el análisis y las figuras del notebook 01e
+# se regeneran sin Jupyter. 'min_year' en initial_years es el año de inicio óptimo que
+# devuelve process_time_series_data.
+
+ANALYSIS = {
+    'name': '01e_mechanisms_homicides',
+    'title': 'Homicidios intencionados por mecanismo',
+    'by': 'Category',
+    'dimension': 'by mechanisms',
+    'age_mapping': None,
+    'initial_years': ['min_year', 2019, 2021]
+}
+
+FIGURES = breakdown_figures(
+    by='Category',
+    label='Mecanismo',
+    default_visible_name=['Spain, Firearms', 'Spain, Sharp object'],
+    facet_col_wrap=3
+)
+
+#################################################################################################################
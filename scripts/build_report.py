@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import glob
+import time
+import html
+import hashlib
+import argparse
+import logging
+import importlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+
+# --- CONFIG & PATHS ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Paths
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(SCRIPT_PATH, '..')
+CONFIG_DIR = os.path.join(PROJECT_PATH, 'config')
+INPUT_FILE = os.path.join(PROJECT_PATH, 'data', 'processed', 'processed_unodc_intentional_homicide_rate.csv')
+OUTPUT_DIR = os.path.join(PROJECT_PATH, 'plots', 'report')
+
+# Code whose changes invalidate every analysis (besides the dataset and the config): every module under src/
+CODE_FILES = sorted(glob.glob(os.path.join(PROJECT_PATH, 'src', '*.py')))
+
+STATE_FILE = 'report_state.json'
+TABLES = {
+    'time_series_country': ('time_series', 'country'),
+    'time_series_region': ('time_series', 'region'),
+    'ranking_country': ('ranking', 'country'),
+    'ranking_region': ('ranking', 'region'),
+}
+
+sys.path.append(PROJECT_PATH)
+from src.data_utils import dataset_fingerprint, scan_processed_data
+
+def discover_configs():
+    """Every config module with an ANALYSIS spec (config/config_01a.py, config_01b.py...)."""
+    names = []
+    for path in sorted(glob.glob(os.path.join(CONFIG_DIR, 'config_*.py'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if hasattr(importlib.import_module(f'config.{name}'), 'ANALYSIS'):
+            names.append(name)
+    return names
+
+def analysis_hash(config_name, input_fingerprint):
+    """
+    Hash of everything an analysis output depends on: the input dataset, the resolved
+    analysis/figure specs and shared settings of its config module, and the analysis code.
+    """
+    config = importlib.import_module(f'config.{config_name}')
+    spec = {
+        'input': input_fingerprint,
+        'analysis': config.ANALYSIS,
+        'figures': config.FIGURES,
+        'selected_countries': config.SELECTED_COUNTRIES,
+        'prop_years_in_period_limit': config.PROP_YEARS_IN_PERIOD_LIMIT,
+        'ref_region_for_start_year': config.REF_REGION_FOR_START_YEAR,
+    }
+    hasher = hashlib.blake2b(json.dumps(spec, sort_keys=True, default=str).encode(), digest_size=16)
+    for path in CODE_FILES:
+        with open(path, 'rb') as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+def read_state(analysis_dir):
+    path = os.path.join(analysis_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def run_analysis(config_name, input_file, output_dir, config_hash):
+    """
+    Worker: runs the notebook pipeline of one config module (time series -> rankings ->
+    figures) and writes its tables, figures and a self-contained index.html bundle.
+    """
+    from src.analysis_utils import process_time_series_data, process_ranking_data, set_verbosity
+    from src.export_utils import export_figures
+
+    # Analyses run side by side: keep their progress logs out of the builder output
+    set_verbosity('quiet')
+
+    start = time.perf_counter()
+    config = importlib.import_module(f'config.{config_name}')
+    analysis = config.ANALYSIS
+    analysis_dir = os.path.join(output_dir, analysis['name'])
+    os.makedirs(os.path.join(analysis_dir, 'tables'), exist_ok=True)
+
+    # Same dtypes the notebooks get from the processed CSV (plain strings)
+    df = (
+        scan_processed_data(input_file)
+        .with_columns(pl.col(pl.Enum, pl.Categorical).cast(pl.String))
+        .collect()
+    )
+
+    by = analysis.get('by')
+    df_time_series, min_year, max_year = process_time_series_data(
+        df = df,
+        selected_countries = config.SELECTED_COUNTRIES,
+        prop_years_in_period_limit = config.PROP_YEARS_IN_PERIOD_LIMIT,
+        ref_region_for_start_year = config.REF_REGION_FOR_START_YEAR,
+        by = by,
+        age_mapping = analysis.get('age_mapping'),
+        dimension = analysis.get('dimension')
+    )
+
+    initial_years = [min_year if year == 'min_year' else year for year in analysis['initial_years']]
+    df_ranking_combined, _ = process_ranking_data(
+        df = df_time_series['country'],
+        selected_countries = config.SELECTED_COUNTRIES,
+        prop_years_in_period_limit = config.PROP_YEARS_IN_PERIOD_LIMIT,
+        initial_years = initial_years,
+        max_year = max_year,
+        by = by
+    )
+
+    data = {'time_series': df_time_series, 'ranking': df_ranking_combined}
+
+    # Tables the notebooks display
+    for table_name, (group, level) in TABLES.items():
+        data[group][level].write_csv(os.path.join(analysis_dir, 'tables', f'{table_name}.csv'))
+
+    specs = [
+        {
+            'name': figure['name'],
+            'plot': figure['plot'],
+            'kwargs': dict(figure['kwargs'], df=data[figure['data'][0]][figure['data'][1]])
+        }
+        for figure in config.FIGURES
+    ]
+    exported, bundle_path = export_figures(
+        specs, os.path.join(analysis_dir, 'figures'), formats=('html',),
+        bundle_path=os.path.join(analysis_dir, 'index.html'), bundle_title=analysis['title']
+    )
+
+    state = {
+        'config': config_name,
+        'name': analysis['name'],
+        'title': analysis['title'],
+        'hash': config_hash,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': round(time.perf_counter() - start, 2),
+        'years': [min_year, max_year],
+        'figures': list(exported),
+    }
+    with open(os.path.join(analysis_dir, STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+    return state
+
+def write_site_index(output_dir, states):
+    """Top-level index.html linking every analysis bundle."""
+    items = '\n'.join(
+        f'<li><a href="{html.escape(s["name"])}/index.html">{html.escape(s["title"])}</a> '
+        f'({len(s["figures"])} figures, {s["years"][0]}-{s["years"][1]}, built {s["built_at"]})</li>'
+        for s in states
+    )
+    path = os.path.join(output_dir, 'index.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8"><title>Report</title></head>\n'
+                f'<body>\n<h1>Report</h1>\n<ul>\n{items}\n</ul>\n</body>\n</html>\n')
+    return path
+
+def main(configs=None, input_file=INPUT_FILE, output_dir=OUTPUT_DIR, n_workers=None, force=False):
+    configs = configs or discover_configs()
+    logger.info(f"📂 Input: {input_file}")
+    input_fingerprint = dataset_fingerprint(os.path.abspath(input_file))
+
+    states, pending = {}, {}
+    for config_name in configs:
+        analysis = importlib.import_module(f'config.{config_name}').ANALYSIS
+        config_hash = analysis_hash(config_name, input_fingerprint)
+        state = read_state(os.path.join(output_dir, analysis['name']))
+        if not force and state is not None and state['hash'] == config_hash:
+            logger.info(f"⏭️ {config_name}: inputs and config unchanged, skipping")
+            states[config_name] = state
+        else:
+            pending[config_name] = config_hash
+
+    if pending:
+        logger.info(f"🧮 Building {len(pending)} analyses: {', '.join(pending)}")
+        # 'spawn': forking a process with Polars' thread pool running can deadlock
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context('spawn')) as executor:
+            futures = {
+                executor.submit(run_analysis, config_name, input_file, output_dir, config_hash): config_name
+                for config_name, config_hash in pending.items()
+            }
+            for future in as_completed(futures):
+                state = future.result()
+                states[futures[future]] = state
+                logger.info(f"✅ {futures[future]}: {len(state['figures'])} figures in {state['seconds']}s")
+
+    index_path = write_site_index(output_dir, [states[c] for c in configs])
+    logger.info(f"✅ Report index: {index_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the static HTML report of every analysis without Jupyter.')
+    parser.add_argument('--configs', nargs='+', default=None, help='Config modules to build (default: every config with ANALYSIS)')
+    parser.add_argument('--input', default=INPUT_FILE, help='Processed dataset (CSV or Parquet dataset directory)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='Analyses built in parallel (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if inputs and config are unchanged')
+    args = parser.parse_args()
+
+    main(configs=args.configs, input_file=args.input, output_dir=args.output_dir, n_workers=args.workers, force=args.force)
@@ -0,0 +1,305 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import logging
+import urllib.request
+import polars as pl
+
+# --- CONFIG & PATHS ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Paths
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(SCRIPT_PATH, '..')
+INPUT_DIR = os.path.join(PROJECT_PATH, 'data', 'raw', 'eurostat') # Local copies of the bulk files (<code>.tsv.gz, ...)
+OUTPUT_DIR = os.path.join(PROJECT_PATH, 'data', 'processed')
+CACHE_DIR = os.path.join(PROJECT_PATH, 'data', 'cache', 'eurostat') # Parsed bulk files, keyed by content hash
+
+OUTPUT_NAME = 'processed_eurostat_crime' # .csv, Parquet dataset partitioned by Dataset and _state.json
+
+sys.path.append(PROJECT_PATH)
+from src.data_utils import write_processed_dataset, dataset_fingerprint
+
+# Bulk files
+DATASETS = ['crim_off_cat', 'crim_hom_soff', 'crim_hom_vrel', 'crim_gen_reg'] # Downloaded by --download
+BULK_URL = 'https://ec.europa.eu/eurostat/api/dissemination/sdmx/2.1/data/{code}?format=TSV&compressed=true'
+BULK_EXTENSIONS = ('.tsv.gz', '.tsv', '.csv.gz', '.csv') # Bulk TSV or SDMX-CSV
+SDMX_META_COLS = ['DATAFLOW', 'LAST UPDATE', 'TIME_PERIOD', 'OBS_VALUE', 'OBS_FLAG', 'CONF_STATUS']
+VALUE_PATTERN = r'^\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)' # '58 p' -> 58, ': c' -> null
+FLAG_PATTERN = r'^\s*\S+\s+([a-z]+)\s*$' # '58 p' -> 'p', ': c' -> 'c'
+PARTITION_COL = 'Dataset'
+
+# Harmonisation: Eurostat country code (first two characters of geo, also for NUTS regions)
+# -> Country / Region / Subregion with the UNODC names, so both sources join on Country
+GEO_COUNTRIES = {
+    'AT': ('Austria', 'Europe', 'Western Europe'),
+    'BE': ('Belgium', 'Europe', 'Western Europe'),
+    'CH': ('Switzerland', 'Europe', 'Western Europe'),
+    'DE': ('Germany', 'Europe', 'Western Europe'),
+    'FR': ('France', 'Europe', 'Western Europe'),
+    'LI': ('Liechtenstein', 'Europe', 'Western Europe'),
+    'LU': ('Luxembourg', 'Europe', 'Western Europe'),
+    'NL': ('Netherlands (Kingdom of the)', 'Europe', 'Western Europe'),
+    'DK': ('Denmark', 'Europe', 'Northern Europe'),
+    'EE': ('Estonia', 'Europe', 'Northern Europe'),
+    'FI': ('Finland', 'Europe', 'Northern Europe'),
+    'IE': ('Ireland', 'Europe', 'Northern Europe'),
+    'IS': ('Iceland', 'Europe', 'Northern Europe'),
+    'LT': ('Lithuania', 'Europe', 'Northern Europe'),
+    'LV': ('Latvia', 'Europe', 'Northern Europe'),
+    'NO': ('Norway', 'Europe', 'Northern Europe'),
+    'SE': ('Sweden', 'Europe', 'Northern Europe'),
+    'UK': ('United Kingdom', 'Europe', 'Northern Europe'),
+    'AL': ('Albania', 'Europe', 'Southern Europe'),
+    'BA': ('Bosnia and Herzegovina', 'Europe', 'Southern Europe'),
+    'EL': ('Greece', 'Europe', 'Southern Europe'),
+    'ES': ('Spain', 'Europe', 'Southern Europe'),
+    'HR': ('Croatia', 'Europe', 'Southern Europe'),
+    'IT': ('Italy', 'Europe', 'Southern Europe'),
+    'ME': ('Montenegro', 'Europe', 'Southern Europe'),
+    'MK': ('North Macedonia', 'Europe', 'Southern Europe'),
+    'MT': ('Malta', 'Europe', 'Southern Europe'),
+    'PT': ('Portugal', 'Europe', 'Southern Europe'),
+    'RS': ('Serbia', 'Europe', 'Southern Europe'),
+    'SI': ('Slovenia', 'Europe', 'Southern Europe'),
+    'XK': ('Kosovo under UNSCR 1244', 'Europe', 'Southern Europe'),
+    'BG': ('Bulgaria', 'Europe', 'Eastern Europe'),
+    'CZ': ('Czechia', 'Europe', 'Eastern Europe'),
+    'HU': ('Hungary', 'Europe', 'Eastern Europe'),
+    'MD': ('Republic of Moldova', 'Europe', 'Eastern Europe'),
+    'PL': ('Poland', 'Europe', 'Eastern Europe'),
+    'RO': ('Romania', 'Europe', 'Eastern Europe'),
+    'SK': ('Slovakia', 'Europe', 'Eastern Europe'),
+    'UA': ('Ukraine', 'Europe', 'Eastern Europe'),
+    'CY': ('Cyprus', 'Asia', 'Western Asia'),
+    'GE': ('Georgia', 'Asia', 'Western Asia'),
+    'TR': ('Türkiye', 'Asia', 'Western Asia'),
+}
+
+GEO_COLS = ['Dataset', 'Country', 'Region', 'Subregion', 'Region_2', 'geo', 'Geo_level']
+VALUE_COLS = ['Year', 'value', 'flag']
+
+def dataset_code(path):
+    """'data/raw/eurostat/crim_off_cat.tsv.gz' -> 'crim_off_cat'."""
+    name = os.path.basename(path)
+    for ext in BULK_EXTENSIONS:
+        if name.lower().endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
+def find_bulk_files(input_dir):
+    """Bulk files of the local cache, one per dataset (the first extension of BULK_EXTENSIONS wins)."""
+    files = {}
+    for ext in BULK_EXTENSIONS:
+        for path in sorted(glob.glob(os.path.join(input_dir, f'*{ext}'))):
+            files.setdefault(dataset_code(path), path)
+    return [files[code] for code in sorted(files)]
+
+def download_bulk_files(codes, input_dir):
+    """Refreshes the local cache from the Eurostat bulk API (the only step that needs network)."""
+    os.makedirs(input_dir, exist_ok=True)
+    for code in codes:
+        path = os.path.join(input_dir, f'{code}.tsv.gz')
+        logger.info(f"🌐 Downloading {code} -> {path}")
+        with urllib.request.urlopen(BULK_URL.format(code=code), timeout=120) as response, open(path + '.part', 'wb') as f:
+            f.write(response.read())
+        os.replace(path + '.part', path)
+
+def parse_bulk_tsv(path):
+    """
+    Bulk TSV (one row per series, one column per period, 'value flag' cells) -> long format.
+    The 'freq,unit,...,geo\\TIME_PERIOD' key column is split with str.split_exact and the
+    periods are unpivoted, so the whole file is parsed with vectorized string expressions.
+    """
+    lf = pl.scan_csv(path, separator='\t', infer_schema=False, quote_char=None)
+    key_col, *period_cols = lf.collect_schema().names()
+
+    dims = key_col.split('\\')[0].split(',')
+    year_cols = [c for c in period_cols if c.strip().isdigit()] # Annual periods only
+
+    return (
+        lf.select(
+            pl.col(key_col).str.split_exact(',', len(dims) - 1).struct.rename_fields(dims).alias('_key'),
+            *year_cols
+        )
+        .unnest('_key')
+        .unpivot(index=dims, on=year_cols, variable_name='Year', value_name='_cell')
+        .with_columns(
+            pl.col(d).str.strip_chars() for d in dims
+        )
+        .with_columns(
+            pl.col('Year').str.strip_chars().cast(pl.Int64),
+            pl.col('_cell').str.extract(VALUE_PATTERN).cast(pl.Float64).alias('value'),
+            pl.col('_cell').str.extract(FLAG_PATTERN).alias('flag'),
+        )
+        .drop('_cell')
+    )
+
+def parse_sdmx_csv(path):
+    """SDMX-CSV (one row per observation) -> the same long format as parse_bulk_tsv."""
+    lf = pl.scan_csv(path, infer_schema=False)
+    cols = lf.collect_schema().names()
+    dims = [c for c in cols if c not in SDMX_META_COLS]
+
+    return lf.select(
+        *dims,
+        pl.col('TIME_PERIOD').str.strip_chars().cast(pl.Int64, strict=False).alias('Year'), # Non-annual -> null
+        pl.col('OBS_VALUE').str.extract(VALUE_PATTERN).cast(pl.Float64).alias('value'),
+        (pl.col('OBS_FLAG') if 'OBS_FLAG' in cols else pl.lit(None, dtype=pl.String)).alias('flag'),
+    )
+
+def parse_bulk_file(path):
+    """Long format of a bulk file: its dimensions + Dataset, Year, value, flag (annual rows with a value or flag)."""
+    lf = parse_bulk_tsv(path) if '.tsv' in os.path.basename(path).lower() else parse_sdmx_csv(path)
+    if 'freq' in lf.collect_schema().names():
+        lf = lf.filter(pl.col('freq') == 'A').drop('freq')
+
+    return (
+        lf.filter(pl.col('Year').is_not_null() & (pl.col('value').is_not_null() | pl.col('flag').is_not_null()))
+        .with_columns(pl.lit(dataset_code(path)).alias('Dataset'))
+        .collect()
+    )
+
+def code_fingerprint():
+    """Hash of this script: a change in parsing or harmonisation invalidates the cache and the outputs."""
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+
+def load_bulk_file(path, cache_dir=CACHE_DIR):
+    """
+    Parsed bulk file through the content-hashed cache: <code>_<content hash>.parquet.
+    Unchanged files are read back from Parquet; older entries of the same dataset are removed.
+    """
+    code = dataset_code(path)
+    key = hashlib.blake2b(f"{dataset_fingerprint(path)}-{code_fingerprint()}".encode(), digest_size=16).hexdigest()
+    cache_file = os.path.join(cache_dir, f'{code}_{key}.parquet')
+
+    if os.path.exists(cache_file):
+        return pl.read_parquet(cache_file), True
+
+    df = parse_bulk_file(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(cache_dir, f'{code}_*.parquet')):
+        os.remove(stale)
+    df.write_parquet(cache_file + '.part')
+    os.replace(cache_file + '.part', cache_file)
+
+    return df, False
+
+def harmonise_geo(df):
+    """
+    Eurostat geo codes -> Country / Region / Subregion / Region_2 of the UNODC schema.
+    NUTS regions keep their code in 'geo' and get the country of their first two characters;
+    Geo_level is 0 for countries and the NUTS level for regions (sub-national rows).
+    Aggregates (EU27_2020, EA19, EFTA...) have no country and are dropped.
+    """
+    df_geo = pl.DataFrame(
+        [(code, *names) for code, names in GEO_COUNTRIES.items()],
+        schema=['_country_code', 'Country', 'Region', 'Subregion'], orient='row'
+    )
+
+    return (
+        df.with_columns(
+            pl.col('geo').str.slice(0, 2).alias('_country_code'),
+            pl.col('geo').str.extract(r'^[A-Z]{2}([0-9A-Z]*)').str.len_chars().cast(pl.Int64).alias('Geo_level'),
+        )
+        .join(df_geo, on='_country_code', how='inner')
+        .with_columns( # Same Region_2 rule as process_homicides_data_unodc.harmonise_data
+            pl.when(pl.col('Country') == 'Spain')
+            .then(pl.lit('Spain'))
+            .otherwise(pl.col('Region'))
+            .alias('Region_2')
+        )
+        .drop('_country_code')
+    )
+
+def process_data(frames):
+    """Harmonised long format of every dataset (diagonal concat: each dataset has its own dimensions)."""
+    df = pl.concat([harmonise_geo(df) for df in frames], how='diagonal')
+    dim_cols = sorted(c for c in df.columns if c not in GEO_COLS + VALUE_COLS)
+
+    return (
+        df.select(GEO_COLS + dim_cols + VALUE_COLS)
+        .sort(['Dataset', 'Country', 'geo'] + dim_cols + ['Year'], nulls_last=True)
+    )
+
+def main(input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, cache_dir=CACHE_DIR, force=False, download=None):
+    try:
+        if download:
+            download_bulk_files(download, input_dir)
+
+        paths = find_bulk_files(input_dir)
+        if not paths:
+            logger.error(f"❌ No bulk files (.tsv.gz, .tsv, .csv.gz, .csv) in: {input_dir} (use --download to fetch them)")
+            return
+
+        output_file = os.path.join(output_dir, f'{OUTPUT_NAME}.csv')
+        output_dataset = os.path.join(output_dir, OUTPUT_NAME)
+        output_state = os.path.join(output_dir, f'{OUTPUT_NAME}_state.json')
+
+        # 1. Skip everything if the bulk files and this script are unchanged since the last run
+        state = {
+            'inputs': {dataset_code(p): dataset_fingerprint(p) for p in paths},
+            'code': code_fingerprint(),
+        }
+        if not force and os.path.exists(output_state) and os.path.exists(output_file) and os.path.exists(output_dataset):
+            with open(output_state) as f:
+                previous = json.load(f)
+            if {k: previous.get(k) for k in state} == state:
+                logger.info(f"⏭️ Bulk files unchanged since {previous['created_at']}: nothing to do")
+                return
+
+        # 2. Parse (or read from the cache) every bulk file
+        frames = []
+        for path in paths:
+            df, hit = load_bulk_file(path, cache_dir)
+            logger.info(f"{'♻️ Cached' if hit else '🧹 Parsed'}: {os.path.basename(path)} ({df.height} rows)")
+            frames.append(df)
+
+        # 3. Harmonise countries and save to CSV and to a columnar (Parquet) dataset
+        df = process_data(frames)
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        df.write_csv(output_file)
+        write_processed_dataset(df, output_dataset, partition_by=PARTITION_COL)
+
+        with open(output_state, 'w') as f:
+            json.dump(dict(state, created_at=time.strftime('%Y-%m-%dT%H:%M:%S'), rows=df.height), f, indent=2)
+
+        logger.info(f"✅ Success! Saved to: {output_file}")
+        logger.info(f"✅ Success! Saved to: {output_dataset}")
+        logger.info(f"📊 Rows: {df.height} | Datasets: {df['Dataset'].n_unique()} | Countries: {df['Country'].n_unique()}")
+
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Process the Eurostat crime datasets from local bulk files (no network needed).')
+    parser.add_argument('--input-dir', default=INPUT_DIR, help='Local cache of bulk TSV / SDMX-CSV files')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Parsed bulk files, keyed by content hash')
+    parser.add_argument('--force', action='store_true', help='Rebuild the outputs even if nothing changed')
+    parser.add_argument(
+        '--download', nargs='*', default=None, metavar='CODE',
+        help=f"Refresh the local cache from the Eurostat bulk API first (default datasets: {' '.join(DATASETS)})"
+    )
+    args = parser.parse_args()
+
+    if args.download is not None and not args.download:
+        args.download = DATASETS
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        input_dir=args.input_dir, output_dir=args.output_dir, cache_dir=args.cache_dir,
+        force=args.force, download=args.download
+    )
@@ -1,6 +1,13 @@
 import os
+import sys
+import glob
+import json
+import time
+import shutil
+import tempfile
+import argparse
 import logging
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import polars as pl
 
 # --- CONFIG & PATHS ---
@@ -15,93 +22,551 @@ OUTPUT_DIR = os.path.join(PROJECT_PATH, 'data', 'processed')
 
 INPUT_FILE = os.path.join(INPUT_DIR, 'data_cts_intentional_homicide.xlsx')
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'processed_unodc_intentional_homicide_rate.csv')
+OUTPUT_DATASET = os.path.join(OUTPUT_DIR, 'processed_unodc_intentional_homicide_rate') # Parquet partitioned by Dimension
+OUTPUT_COVERAGE = os.path.join(OUTPUT_DIR, 'processed_unodc_intentional_homicide_rate_coverage.parquet') # Year bitmaps per series
+OUTPUT_SERIES_HASHES = os.path.join(OUTPUT_DIR, 'processed_unodc_intentional_homicide_rate_series_hashes.parquet') # Raw row hashes per series
+OUTPUT_CHANGES = os.path.join(OUTPUT_DIR, 'processed_unodc_intentional_homicide_rate_changes.json') # Change manifest of the last run
+
+sys.path.append(PROJECT_PATH)
+from src.data_utils import write_processed_dataset, sink_processed_dataset, dataset_fingerprint
+from src.analysis_utils import build_coverage_index, compute_change_metrics
 
 # Filters
 TARGET_INDICATOR = 'Victims of intentional homicide'
 #TARGET_UNIT = 'Rate per 100,000 population'
 TARGET_SHEET = 'data_cts_intentional_homicide'
 COLS_REMOVE = ['Iso3_code', 'Indicator', 'Source']
+HEADER_ROW = 2 # 0-based: the sheet has two title rows above the header
+SCHEMA_OVERRIDES = {'Year': pl.Int64, 'VALUE': pl.Float64}
 
-def main():
-    try:
-        logger.info(f"📂 Processing file: {INPUT_FILE}")
-
-        # 1. Read Excel with Pandas (Handling header offset)
-        # Using openpyxl engine implicitly
-        pdf = pd.read_excel(
-            INPUT_FILE, 
-            sheet_name=TARGET_SHEET, 
-            header=2
+# Processing
+SERIES_COLS = ["Country", "Dimension", "Category", "Sex", "Age"]
+DIMENSION_COLS = ["Country", "Region", "Subregion", "Dimension", "Category", "Sex", "Age", "Region_2"]
+OUTPUT_COLS = [
+    "Country", "Region", "Subregion", "Dimension", "Category", "Sex", "Age", "Year",
+    "homicides_rate", "homicides_count", "population", "Region_2", "homicides_rate_abs_change"
+]
+N_WORKERS = 1
+
+# Streaming (out-of-core) mode
+# Both constants were measured with peak RSS (VmHWM) on a 1 CPU machine, on synthetic extracts
+# from benchmarks/synthetic_data.py; re-measure them if the pipeline or the Polars version changes.
+# - ENGINE_OVERHEAD_MB: peak of process_data_streaming with buckets of a few rows, i.e. everything
+#   but the buckets (interpreter + Polars ~60 MB, Parquet prefetch and sink buffers of the staging
+#   and output passes). It grows with the extract and levels off at 420-460 MB from ~250 MB
+#   (224 MB for a 64 MB extract, 453 MB for 260 MB, 424 MB for 655 MB).
+# - WORKING_SET_FACTOR: RSS growth while one bucket is read, hashed and sunk through derive_series,
+#   over the estimated_size of its raw rows. It tends to 5 as buckets grow (3.1x at 14 MB,
+#   4.5x at 27 MB, 5.0x at 55 MB); smaller buckets are dominated by fixed costs.
+# benchmarks/bench_streaming.py checks the resulting peak against the cap end to end.
+MEMORY_CAP_MB = 1024
+ENGINE_OVERHEAD_MB = 448 # Not available to buckets
+WORKING_SET_FACTOR = 5 # Peak memory of a bucket relative to the in-memory size of its raw rows
+SAMPLE_ROWS = 100_000 # Rows used to estimate the in-memory size of a raw row
+STAGING_BUCKETS_PER_PASS = 8 # Buckets written by each pass over the raw extract
+
+# Harmonisation
+REGION_RENAMES = {'Americas': 'Latam'}
+COUNTRY_RENAMES = {
+    'United Kingdom (England and Wales)': 'United Kingdom',
+    'Venezuela (Bolivarian Republic of)': 'Venezuela',
+    'United States of America': 'USA'
+}
+CATEGORY_RENAMES = {
+    'Socio-political homicide - terrorist offences': 'Terrorist homicide',
+}
+
+def read_raw_data(input_file, sheet_name=TARGET_SHEET, indicator=TARGET_INDICATOR):
+    """
+    Reads the UNODC sheet straight into Polars through the calamine (fastexcel) engine,
+    with no pandas/openpyxl copy. Unused columns are skipped at read time; calamine
+    loads every row of the sheet, and the indicator filter is applied afterwards on the
+    resulting DataFrame.
+    """
+    # 'Indicator' is needed for the filter, so it is only dropped after filtering
+    cols_skip = [c for c in COLS_REMOVE if c != 'Indicator']
+
+    df = pl.read_excel(
+        input_file,
+        sheet_name=sheet_name,
+        engine='calamine',
+        read_options={
+            'header_row': HEADER_ROW,
+            'use_columns': lambda col: col.name not in cols_skip
+        },
+        schema_overrides=SCHEMA_OVERRIDES
+    )
+
+    return (
+        df.lazy()
+        .filter(pl.col('Indicator') == indicator)
+        .drop(COLS_REMOVE, strict=False)
+        .collect()
+    )
+
+def is_workbook(input_file):
+    return os.path.splitext(input_file)[1].lower() in ('.xlsx', '.xls')
+
+def scan_raw_data(input_file, indicator=TARGET_INDICATOR):
+    """
+    LazyFrame over a raw extract in CSV or Parquet (a file or a directory of Parquet files),
+    with the same indicator filter and projection as read_raw_data. Used by the streaming
+    mode and for inputs other than the workbook (e.g. extracts bigger than memory).
+    """
+    if os.path.isdir(input_file) or input_file.lower().endswith('.parquet'):
+        lf = pl.scan_parquet(input_file)
+    elif input_file.lower().endswith('.csv'):
+        lf = pl.scan_csv(input_file, schema_overrides=SCHEMA_OVERRIDES)
+    else:
+        raise ValueError(f"Unsupported raw input (expected .xlsx, .csv, .parquet or a Parquet directory): {input_file}")
+
+    # Extracts already filtered by indicator (e.g. the synthetic benchmark data) have no 'Indicator' column
+    if 'Indicator' in lf.collect_schema().names():
+        lf = lf.filter(pl.col('Indicator') == indicator)
+
+    return (
+        lf.drop(COLS_REMOVE, strict=False)
+        .with_columns(pl.col(c).cast(dtype) for c, dtype in SCHEMA_OVERRIDES.items())
+    )
+
+def rename_values(col, mapping):
+    """
+    Same as pl.col(col).replace(mapping), written as a when/then chain: replace makes the
+    streaming engine fall back to in-memory execution, the chain streams.
+    """
+    expr = pl
+    for old, new in mapping.items():
+        expr = expr.when(pl.col(col) == old).then(pl.lit(new))
+    return expr.otherwise(pl.col(col)).alias(col) if mapping else pl.col(col)
+
+def harmonise_data(df):
+    """Region_2 mapping and name harmonisation (row-wise, on the raw string columns)."""
+    return df.with_columns(
+            pl.when(pl.col("Country") == "Spain")
+            .then(pl.lit("Spain"))   
+            .when(pl.col("Country") == "United States of America") 
+            .then(pl.lit("USA"))      
+            .otherwise(pl.col("Region"))  
+            .alias("Region_2")         
+    ).with_columns(
+            rename_values('Region_2', REGION_RENAMES),
+            rename_values('Country', COUNTRY_RENAMES),
+            rename_values('Category', CATEGORY_RENAMES)
+    )
+
+def dimension_categories(df, cols=DIMENSION_COLS):
+    """Sorted categories of every dimension column ({col: [...]}; DataFrame or LazyFrame)."""
+    # Distinct combinations first: unique() streams, implode() over every row does not
+    df_combinations = df.lazy().select(cols).unique().collect()
+
+    categories = df_combinations.select(
+        pl.col(c).drop_nulls().unique().sort().implode() for c in cols
+    ).row(0)
+
+    return dict(zip(cols, categories))
+
+def encode_dimensions(df, cols=DIMENSION_COLS, categories=None):
+    """
+    Dictionary-encodes the free-text dimensions as pl.Enum so the rates/counts join,
+    the sort and the window run on integer codes. Categories are sorted, so sorting
+    on the Enum gives the same order as sorting the strings. The Enum dtypes are kept
+    in the Parquet output (downstream filters and group_bys also run on integers).
+    Pass the categories of the whole dataset when encoding it piece by piece (streaming mode).
+    """
+    if categories is None:
+        categories = dimension_categories(df, cols)
+
+    return df.with_columns(
+        pl.col(c).cast(pl.Enum(categories[c])) for c in cols
+    )
+
+def backfill_population(df):
+    """
+    population can only be derived where homicides_rate > 0 (count * 100k / rate), so
+    zero-rate years are left without it and drop out of the weighted aggregations.
+    Gaps are filled per series by linear interpolation over Year (forward/backward fill
+    at the edges). Series with no derivable year at all whose rate is relative to the whole
+    population (Sex and Age 'Total', e.g. situational context) take the population of the
+    country's Total series. Sex/Age series with no derivable year stay null.
+    Expects one row per series-year; only uses rows of the same country.
+    """
+    is_whole_population = (pl.col('Sex') == 'Total') & (pl.col('Age') == 'Total')
+    is_headline = is_whole_population & (pl.col('Dimension') == 'Total') & (pl.col('Category') == 'Total')
+
+    df = df.with_columns(
+        pl.col('population').cast(pl.Float64)
+        .interpolate_by('Year')
+        .forward_fill()
+        .backward_fill()
+        .over(SERIES_COLS, order_by='Year')
+    )
+
+    df_total_population = (
+        df.filter(is_headline)
+        .select('Country', 'Year', pl.col('population').alias('total_population'))
+    )
+
+    return (
+        df.join(df_total_population, on=['Country', 'Year'], how='left', maintain_order='left')
+        .with_columns(
+            pl.when(pl.col('population').is_null() & is_whole_population)
+            .then(pl.col('total_population'))
+            .otherwise(pl.col('population'))
+            .round(0).cast(pl.Int64)
+            .alias('population')
         )
+        .drop('total_population')
+    )
+
+def derive_series(df):
+    """
+    Rates/counts join, population derivation (+ backfill) and the year-over-year change.
+    Every step only uses rows of the same country, so it can run on any subset of countries
+    (see process_data_parallel).
+    """
+    df_rates = df.filter(pl.col('Unit of measurement') == 'Rate per 100,000 population').rename({'VALUE': 'homicides_rate'})
+    df_counts = df.filter(pl.col('Unit of measurement') == 'Counts').rename({'VALUE': 'homicides_count'})
+
+    join_cols = ["Country", "Region", "Subregion", "Year", "Dimension", "Category", "Sex", "Age"]
+
+    return (
+        df_rates.join(
+            df_counts.select(join_cols + ['homicides_count']), # Solo traemos la columna de valor y las llaves
+            on=join_cols, 
+            how='inner' # Inner para asegurar que tenemos ambos datos
+        ).drop("Unit of measurement")
+    ).with_columns( # CÁLCULO DE POBLACIÓN
+            # Evitamos división por cero. Si la tasa es 0, no podemos calcular población así.
+            # En esos casos (raros en totales nacionales), la población quedará nula.
+            population = pl.when(pl.col('homicides_rate') > 0)
+                        .then((pl.col('homicides_count') * 100000) / pl.col('homicides_rate'))
+                        .otherwise(None)
+                        .round(0).cast(pl.Int64) # Población entera
+    ).pipe(
+        backfill_population
+    ).with_columns(
+        pl.col('homicides_rate').round(2)
+    ).sort(
+        SERIES_COLS + ["Year"]
+    ).pipe( # Year-over-year change on calendar years: a missing year gives null, not a diff across the gap
+        compute_change_metrics, series_cols=SERIES_COLS, metrics=('abs_change',)
+    ).select(
+        OUTPUT_COLS
+    )
+
+def process_data(df):
+    """Full pipeline on the filtered raw extract: harmonise -> encode -> derive series."""
+    return derive_series(encode_dimensions(harmonise_data(df)))
 
-        # 2. Convert to Polars for speed
-        df = pl.from_pandas(pdf)
-
-        # 3. Data processing
-        logger.info("🧹 Processing the data...")
-
-        df = df.filter(
-            (pl.col('Indicator') == TARGET_INDICATOR) 
-            ).drop(COLS_REMOVE)
-
-        df_rates = df.filter(pl.col('Unit of measurement') == 'Rate per 100,000 population').rename({'VALUE': 'homicides_rate'})
-        df_counts = df.filter(pl.col('Unit of measurement') == 'Counts').rename({'VALUE': 'homicides_count'})
-
-        join_cols = ["Country", "Region", "Subregion", "Year", "Dimension", "Category", "Sex", "Age"]
-
-        df = (
-            df_rates.join(
-                df_counts.select(join_cols + ['homicides_count']), # Solo traemos la columna de valor y las llaves
-                on=join_cols, 
-                how='inner' # Inner para asegurar que tenemos ambos datos
-            ).drop("Unit of measurement")
-        ).with_columns( # CÁLCULO DE POBLACIÓN
-                # Evitamos división por cero. Si la tasa es 0, no podemos calcular población así.
-                # En esos casos (raros en totales nacionales), la población quedará nula.
-                population = pl.when(pl.col('homicides_rate') > 0)
-                            .then((pl.col('homicides_count') * 100000) / pl.col('homicides_rate'))
-                            .otherwise(None)
-                            .round(0).cast(pl.Int64) # Población entera
-        ).with_columns(
-            pl.col('homicides_rate').round(2)
-        ).with_columns(
-                pl.when(pl.col("Country") == "Spain")
-                .then(pl.lit("Spain"))   
-                .when(pl.col("Country") == "United States of America") 
-                .then(pl.lit("USA"))      
-                .otherwise(pl.col("Region"))  
-                .alias("Region_2")         
-        ).with_columns(
-                pl.col('Region_2').replace({'Americas': 'Latam'}),
-                pl.col('Country').replace(
-                    {
-                        'United Kingdom (England and Wales)': 'United Kingdom',
-                        'Venezuela (Bolivarian Republic of)': 'Venezuela',
-                        'United States of America': 'USA'
-                    }),
-                pl.col('Category').replace({
-                        'Socio-political homicide - terrorist offences': 'Terrorist homicide',
-
-                        })
-        ).sort(
-            ["Country", "Dimension", "Category", "Sex", "Age", "Year"]
-        ).with_columns(
-            homicides_rate_abs_change = (pl.col("homicides_rate").diff().over(["Country", "Dimension", "Category", "Sex", "Age"])).round(2)
+def process_data_parallel(df, n_workers):
+    """
+    Harmonises and encodes the whole extract once (so every partition shares the
+    same Enum dtypes), hash-partitions the rows by Country and runs derive_series
+    on each partition in a thread pool (Polars releases the GIL). Countries never span
+    partitions, so the merged and re-sorted result is identical to process_data(df).
+    """
+    partitions = (
+        encode_dimensions(harmonise_data(df))
+        .with_columns(
+            (pl.col('Country').cast(pl.String).hash(seed=0) % n_workers).alias('_partition')
         )
+        .partition_by('_partition', include_key=False)
+    )
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        results = list(executor.map(derive_series, partitions))
+
+    return pl.concat(results, how='vertical').sort(SERIES_COLS + ["Year"])
+
+def compute_series_hashes(df):
+    """
+    One hash per (Country, Dimension, Category, Sex, Age) series of the harmonised raw
+    extract, built from the sorted hashes of its rows (order-independent).
+    Hashes use fixed seeds but are only stable within a Polars version (stored in the manifest).
+    """
+    df = df.with_columns(pl.col(c).cast(pl.String) for c in DIMENSION_COLS)
+
+    return (
+        df.with_columns(pl.Series('row_hash', df.hash_rows(seed=0)))
+        .group_by(SERIES_COLS)
+        .agg(pl.col('row_hash').sort().alias('row_hashes'))
+        .select(SERIES_COLS + [pl.col('row_hashes').hash(seed=0).alias('series_hash')])
+        .sort(SERIES_COLS)
+    )
+
+def diff_series_hashes(df_previous, df_current):
+    """Series added, changed (different hash) and removed between two hash tables."""
+    df_diff = df_previous.join(
+        df_current, on=SERIES_COLS, how='full', coalesce=True, nulls_equal=True, suffix='_current'
+    )
+    added = df_diff.filter(pl.col('series_hash').is_null()).select(SERIES_COLS)
+    removed = df_diff.filter(pl.col('series_hash_current').is_null()).select(SERIES_COLS)
+    changed = df_diff.filter(
+        pl.col('series_hash').is_not_null() & pl.col('series_hash_current').is_not_null() &
+        (pl.col('series_hash') != pl.col('series_hash_current'))
+    ).select(SERIES_COLS)
+    return added, changed, removed
+
+def process_data_incremental(df, df_previous, df_previous_hashes):
+    """
+    Reprocesses only the countries with series whose raw rows changed since the last run
+    and merges them into the previous processed dataset. Every derived column only depends
+    on rows of the same country (the population backfill reads the country's Total series),
+    so the merged result is identical to a full reprocess.
+    Returns (df_processed, df_hashes, changes).
+    """
+    df_harmonised = harmonise_data(df)
+    df_hashes = compute_series_hashes(df_harmonised)
+
+    added, changed, removed = diff_series_hashes(df_previous_hashes, df_hashes)
+    df_affected = pl.concat([added, changed, removed])
+    df_affected_countries = df_affected.select('Country').unique()
+
+    # 1. Recompute every series of the affected countries (string keys, encoded later on the merged result)
+    df_new_series = derive_series(
+        df_harmonised.join(df_affected_countries, on='Country', how='semi', nulls_equal=True)
+    )
 
-        # 4. Save to CSV
+    # 2. Keep the untouched countries from the previous snapshot
+    df_kept = (
+        df_previous
+        .with_columns(pl.col(c).cast(pl.String) for c in DIMENSION_COLS)
+        .join(df_affected_countries, on='Country', how='anti', nulls_equal=True)
+        .select(OUTPUT_COLS)
+    )
+
+    df_merged = (
+        encode_dimensions(pl.concat([df_kept, df_new_series], how='vertical'))
+        .sort(SERIES_COLS + ["Year"])
+    )
+
+    changes = {
+        'added': added.to_dicts(),
+        'changed': changed.to_dicts(),
+        'removed': removed.to_dicts(),
+        'affected_countries': sorted(df_affected['Country'].unique().drop_nulls().to_list()),
+    }
+
+    return df_merged, df_hashes, changes
+
+def country_buckets(lf, memory_cap_mb=MEMORY_CAP_MB):
+    """
+    Splits the sorted countries into contiguous buckets whose raw rows, once expanded by
+    derive_series, fit in the memory cap. Buckets are ranges of the sorted countries, so
+    processing them in order gives the globally sorted output. A country is never split
+    (the population backfill reads its Total series), so a single country bigger than the
+    cap gets a bucket of its own. Returns a (Country, _bucket) DataFrame.
+    """
+    rows_per_bucket = bucket_rows(lf, memory_cap_mb)
+    df_countries = lf.group_by('Country').agg(pl.len().alias('rows')).sort('Country').collect()
+
+    # Greedy fill in country order (one row per country): a bucket is closed before it overflows
+    buckets, bucket, filled = [], 0, 0
+    for rows in df_countries['rows']:
+        if filled and filled + rows > rows_per_bucket:
+            bucket, filled = bucket + 1, 0
+        filled += rows
+        buckets.append(bucket)
+
+    return df_countries.select('Country', pl.Series('_bucket', buckets, dtype=pl.Int64))
+
+def bucket_rows(lf, memory_cap_mb=MEMORY_CAP_MB):
+    """Raw rows per bucket: the cap left by the engine, over the working set of a raw row."""
+    if memory_cap_mb <= ENGINE_OVERHEAD_MB:
+        raise ValueError(f"The memory cap ({memory_cap_mb} MB) must be above the streaming engine overhead ({ENGINE_OVERHEAD_MB} MB)")
+
+    df_sample = lf.head(SAMPLE_ROWS).collect()
+    bytes_per_row = df_sample.estimated_size() / max(df_sample.height, 1)
+    bucket_bytes = (memory_cap_mb - ENGINE_OVERHEAD_MB) * 1024**2 / WORKING_SET_FACTOR
+    return max(int(bucket_bytes / bytes_per_row), 1)
+
+def process_data_streaming(input_file, output_file, output_dataset, output_coverage, memory_cap_mb=MEMORY_CAP_MB):
+    """
+    Out-of-core version of the full pipeline, for extracts that do not fit in memory
+    (e.g. UNODC joined with Eurostat sub-national indicators). Same outputs as process_data
+    plus the CSV / dataset / coverage writes of main, with the new streaming engine:
+    1. The raw extract is scanned, harmonised and staged on disk partitioned by country
+       bucket (country_buckets), a few buckets per streaming pass.
+    2. Each bucket is encoded with the categories of the whole extract and goes through
+       derive_series (rates/counts join, population, sorted diff); the result is sunk to Parquet.
+    3. CSV, Parquet dataset and coverage index are streamed from the processed buckets.
+    Only one bucket is in memory at a time. Returns (rows, df_hashes).
+    """
+    staging_dir = tempfile.mkdtemp(prefix='.staging_', dir=os.path.dirname(os.path.abspath(output_file)))
+    raw_dir = os.path.join(staging_dir, 'raw')
+    processed_dir = os.path.join(staging_dir, 'processed')
+
+    try:
+        with pl.Config(engine_affinity='streaming'):
+            if is_workbook(input_file):
+                # calamine cannot stream a sheet: the workbook is read once and staged as Parquet
+                raw_file = os.path.join(staging_dir, 'raw_extract.parquet')
+                read_raw_data(input_file).write_parquet(raw_file)
+                input_file = raw_file
+
+            lf_raw = harmonise_data(scan_raw_data(input_file))
+            df_buckets = country_buckets(lf_raw, memory_cap_mb)
+            n_buckets = df_buckets['_bucket'].max() + 1
+            logger.info(f"🪣 {df_buckets.height} countries in {n_buckets} buckets (memory cap: {memory_cap_mb} MB)")
+
+            # 1. Stage the harmonised rows by bucket (every open partition holds a write buffer,
+            #    so a pass only writes a few buckets)
+            lf_staged = lf_raw.join(df_buckets.lazy(), on='Country', how='left', nulls_equal=True)
+            for first_bucket in range(0, n_buckets, STAGING_BUCKETS_PER_PASS):
+                (
+                    lf_staged
+                    .filter(pl.col('_bucket').is_between(first_bucket, first_bucket + STAGING_BUCKETS_PER_PASS - 1))
+                    .sink_parquet(pl.PartitionBy(raw_dir, key='_bucket', include_key=False), mkdir=True)
+                )
+            categories = dimension_categories(pl.scan_parquet(raw_dir, hive_partitioning=True))
+
+            # 2. One bucket at a time
+            os.makedirs(processed_dir)
+            hashes = []
+            for bucket in range(n_buckets):
+                # Read once: the join of derive_series needs the whole bucket anyway
+                df_bucket = pl.read_parquet(os.path.join(raw_dir, f'_bucket={bucket}'), hive_partitioning=False)
+                hashes.append(compute_series_hashes(df_bucket))
+                derive_series(
+                    encode_dimensions(df_bucket.lazy(), categories=categories)
+                ).sink_parquet(os.path.join(processed_dir, f'part-{bucket:05d}.parquet'))
+
+            # 3. Outputs, streamed from the processed buckets (already in global order)
+            parts = sorted(glob.glob(os.path.join(processed_dir, '*.parquet')))
+            pl.scan_parquet(parts).sink_csv(output_file)
+            sink_processed_dataset((pl.scan_parquet(part) for part in parts), output_dataset)
+            build_coverage_index(pl.scan_parquet(parts)).write_parquet(output_coverage, statistics=True)
+
+            rows = pl.scan_parquet(parts).select(pl.len()).collect().item()
+            df_hashes = pl.concat(hashes).sort(SERIES_COLS)
+
+        return rows, df_hashes
+
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+def _fingerprints(paths):
+    return {os.path.abspath(p): dataset_fingerprint(p) if os.path.exists(p) else None for p in paths}
+
+def main(n_workers=N_WORKERS, incremental=False, streaming=False, memory_cap_mb=MEMORY_CAP_MB, input_file=INPUT_FILE):
+    try:
+        logger.info(f"📂 Processing file: {input_file}")
+
+        outputs = [OUTPUT_FILE, OUTPUT_DATASET]
+        previous_fingerprints = _fingerprints(outputs)
         if not os.path.exists(OUTPUT_DIR):
             os.makedirs(OUTPUT_DIR)
 
-        df.write_csv(OUTPUT_FILE)
+        if streaming:
+            # 1-4. Read, process and save bucket by bucket (bounded memory)
+            logger.info(f"🌊 Processing the data... (streaming, memory cap: {memory_cap_mb} MB)")
+            rows, df_hashes = process_data_streaming(
+                input_file, OUTPUT_FILE, OUTPUT_DATASET, OUTPUT_COVERAGE, memory_cap_mb=memory_cap_mb
+            )
+            mode = 'streaming'
+            changes = {'added': None, 'changed': None, 'removed': None, 'affected_countries': None}
+        else:
+            # 1. Read Excel directly into Polars (calamine engine, filter + projection at read time)
+            df = read_raw_data(input_file) if is_workbook(input_file) else scan_raw_data(input_file).collect()
+
+            # 2. Data processing
+            can_increment = (
+                incremental and 
+                os.path.exists(OUTPUT_DATASET) and os.path.exists(OUTPUT_SERIES_HASHES) and os.path.exists(OUTPUT_CHANGES)
+            )
+            if can_increment:
+                with open(OUTPUT_CHANGES) as f:
+                    can_increment = json.load(f).get('polars_version') == pl.__version__
+
+            if can_increment:
+                logger.info("🧹 Processing the data... (incremental)")
+                df, df_hashes, changes = process_data_incremental(
+                    df, 
+                    df_previous = pl.read_parquet(OUTPUT_DATASET, hive_partitioning=True), 
+                    df_previous_hashes = pl.read_parquet(OUTPUT_SERIES_HASHES)
+                )
+                logger.info(
+                    f"🔁 Series added: {len(changes['added'])}, changed: {len(changes['changed'])}, "
+                    f"removed: {len(changes['removed'])} ({len(changes['affected_countries'])} countries)"
+                )
+            else:
+                if incremental:
+                    logger.info("ℹ️ No compatible previous snapshot: running a full reprocess")
+                logger.info(f"🧹 Processing the data... (workers: {n_workers})")
+
+                df_hashes = compute_series_hashes(harmonise_data(df))
+
+                if n_workers > 1:
+                    df = process_data_parallel(df, n_workers)
+                else:
+                    df = process_data(df)
+
+                changes = {'added': None, 'changed': None, 'removed': None, 'affected_countries': None}
+
+            # 3. Save to CSV and to a columnar (Parquet) dataset
+            df.write_csv(OUTPUT_FILE)
+            write_processed_dataset(df, OUTPUT_DATASET)
+
+            # 4. Coverage index (one year bitmap per Country/Dimension/Category/Sex/Age series)
+            build_coverage_index(df).write_parquet(OUTPUT_COVERAGE, statistics=True)
+
+            rows = df.height
+            mode = 'incremental' if can_increment else 'full'
+
+        # 5. Series hashes + change manifest (used by the next incremental run and by the results cache)
+        df_hashes.write_parquet(OUTPUT_SERIES_HASHES)
+        with open(OUTPUT_CHANGES, 'w') as f:
+            json.dump({
+                'created_at': time.time(),
+                'mode': mode,
+                'polars_version': pl.__version__,
+                'previous_fingerprints': previous_fingerprints,
+                'fingerprints': _fingerprints(outputs),
+                **changes
+            }, f, indent=2)
         
         logger.info(f"✅ Success! Saved to: {OUTPUT_FILE}")
-        logger.info(f"📊 Rows: {df.height}")
+        logger.info(f"✅ Success! Saved to: {OUTPUT_DATASET}")
+        logger.info(f"✅ Success! Saved to: {OUTPUT_COVERAGE}")
+        logger.info(f"✅ Change manifest: {OUTPUT_CHANGES}")
+        logger.info(f"📊 Rows: {rows}")
 
     except FileNotFoundError:
-        logger.error(f"❌ Input file not found at: {INPUT_FILE}")
+        logger.error(f"❌ Input file not found at: {input_file}")
     except Exception as e:
         logger.error(f"❌ Error: {e}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Process the UNODC intentional homicide workbook.')
+    parser.add_argument(
+        '--input', default=INPUT_FILE,
+        help='UNODC workbook, or a raw extract as CSV / Parquet (file or directory of Parquet files)'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=N_WORKERS,
+        help='Number of country partitions processed in parallel (1 = single pass)'
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='Only reprocess the series that changed since the last run (falls back to a full run)'
+    )
+    parser.add_argument(
+        '--streaming', action='store_true',
+        help='Out-of-core mode: process the extract bucket by bucket of countries with bounded memory'
+    )
+    parser.add_argument(
+        '--memory-cap', type=int, default=MEMORY_CAP_MB,
+        help='Memory budget of the streaming mode in MB (sizes the country buckets)'
+    )
+    args = parser.parse_args()
+
+    if args.streaming and (args.incremental or args.workers > 1):
+        parser.error('--streaming cannot be combined with --incremental or --workers')
+    return args
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(
+        n_workers=args.workers, incremental=args.incremental,
+        streaming=args.streaming, memory_cap_mb=args.memory_cap, input_file=args.input
+    )
@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+import logging
+
+# --- CONFIG & PATHS ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Paths
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(SCRIPT_PATH, '..')
+INPUT_FILE = os.path.join(PROJECT_PATH, 'data', 'processed', 'processed_unodc_intentional_homicide_rate.csv')
+
+sys.path.append(PROJECT_PATH)
+from config.config_01a import AGE_MAPPING
+from src.analysis_utils import set_verbosity
+from src.query_service import QueryService, make_server
+
+def main(input_file=INPUT_FILE, host='127.0.0.1', port=8050, max_entries=256):
+    # Per-request analysis logs would flood the console
+    set_verbosity('quiet')
+
+    logger.info(f"📂 Loading: {input_file}")
+    service = QueryService(input_file, age_mapping=AGE_MAPPING, max_entries=max_entries)
+    logger.info(f"📊 Rows: {service.df.height} | Countries: {len(service.countries)} | Loaded in {service.load_seconds:.2f}s")
+
+    server = make_server(service, host=host, port=port)
+    logger.info(f"🚀 Serving on http://{host}:{port} (/time_series, /ranking, /countries, /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopped")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve time series and rankings of the processed dataset over HTTP.')
+    parser.add_argument('--input', default=INPUT_FILE, help='Processed dataset (CSV or Parquet dataset directory)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--max-entries', type=int, default=256, help='Cached parameter sets (LRU)')
+    args = parser.parse_args()
+
+    main(input_file=args.input, host=args.host, port=args.port, max_entries=args.max_entries)
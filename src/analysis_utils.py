@@ -1,112 +1,403 @@
+import sys
+import logging
 import polars as pl 
-import numpy as np 
+
+from src.profiling_utils import stage, profiled, collect_profiled, collect_all_profiled
 
 ######################################################################################################################
 
-def get_countries_with_enough_data(df, countries, period, prop_years_in_period_limit, by=None):
+# Logs de control de los análisis:
+# - INFO: cabeceras y recuentos (países sin datos, países válidos...)
+# - DEBUG: listas completas (países descartados, proporción de años por país)
+# plots_utils escribe aquí también (tamaño de los HTML), con el mismo handler y set_verbosity.
+LOGGER = logging.getLogger('homicides.analysis')
+
+VERBOSITY_LEVELS = {
+    'quiet': logging.WARNING,   # Barridos / batch: sin logs (los diagnósticos ni se calculan)
+    'summary': logging.INFO,
+    'detail': logging.DEBUG,    # Por defecto: la salida completa de siempre
+}
+
+class _StdoutHandler(logging.StreamHandler):
+    """StreamHandler que escribe en el sys.stdout vigente (notebooks, redirect_stdout...)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+def set_verbosity(verbosity='detail'):
+    """Nivel de los logs de analysis_utils: 'quiet', 'summary' o 'detail'."""
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Verbosidad no válida: '{verbosity}' (opciones: {list(VERBOSITY_LEVELS)})")
+    LOGGER.setLevel(VERBOSITY_LEVELS[verbosity])
+
+# Salida por defecto: el texto tal cual en stdout (como los print de siempre).
+# Para redirigirlo (fichero, formato con fecha...) basta con cambiar los handlers de LOGGER.
+if not LOGGER.handlers:
+    _handler = _StdoutHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    LOGGER.addHandler(_handler)
+    LOGGER.propagate = False
+    set_verbosity('detail')
+
+######################################################################################################################
+
+class AnalysisReport:
     """
-    Filtra países asegurando que, si hay segmentación (by='Sex'), 
-    TODOS los segmentos cumplan con el límite de datos.
+    Diagnósticos estructurados de los análisis (alternativa a leer los logs).
+    Se pasa como 'report' a process_time_series_data / process_ranking_data / calculate_ranking_country
+    y cada paso añade un registro {'step': ..., ...}:
+    - 'time_series': países sin datos, periodo, países válidos y proporción de años por país
+    - 'ranking_period': países seleccionados / descartados y proporción de años por país
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, step, **data):
+        self.records.append({'step': step, **data})
+
+    def filter(self, step):
+        return [r for r in self.records if r['step'] == step]
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return f"AnalysisReport({len(self.records)} registros: {sorted({r['step'] for r in self.records})})"
+
+######################################################################################################################
+
+# Claves de una serie en el dataset procesado (una fila del índice de cobertura por serie)
+COVERAGE_KEYS = ['Country', 'Dimension', 'Category', 'Sex', 'Age']
+
+# Un bit por año a partir de 'base_year', en palabras UInt64 ('bitmap_word'): bit i de la palabra w <=> año base_year + 64*w + i
+BITMAP_WORD_YEARS = 64
+
+######################################################################################################################
+
+def build_coverage_index(df, keys=COVERAGE_KEYS, base_year=None):
+    """
+    Índice de cobertura: por serie (keys), bitmaps UInt64 con un bit por año con datos
+    (una fila por palabra 'bitmap_word' con años; bit i <=> año base_year + 64*bitmap_word + i).
+    Se construye una vez (ej. en el script de procesado) y permite responder la cobertura
+    de cualquier periodo con operaciones de bits. Con menos de 64 años hay una sola palabra.
+    """
+    lf = df.lazy()
+
+    if base_year is None:
+        base_year = lf.select(pl.col('Year').min()).collect().item()
+
+    if base_year is None:
+        base_year = 0 # Sin datos: índice vacío
+
+    year_offset = pl.col('Year') - base_year
+
+    return (
+        lf
+        .filter(pl.col('Year') >= base_year)
+        .with_columns(
+            (year_offset // BITMAP_WORD_YEARS).cast(pl.UInt32).alias('bitmap_word'),
+            (year_offset % BITMAP_WORD_YEARS).cast(pl.UInt64).alias('_bit')
+        )
+        .group_by(keys + ['bitmap_word'])
+        .agg(
+            pl.lit(2, dtype=pl.UInt64)
+            .pow(pl.col('_bit'))
+            .bitwise_or()
+            .alias('years_bitmap')
+        )
+        .with_columns(
+            pl.col(k).cast(pl.String) for k in keys
+        )
+        .with_columns(
+            pl.lit(base_year, dtype=pl.Int64).alias('base_year')
+        )
+        .sort(keys + ['bitmap_word'])
+        .collect()
+    )
+
+######################################################################################################################
+
+def _year_masks(start_year, end_year, base_year):
+    """Máscaras de bits de los años [start_year, end_year] por palabra del bitmap: {bitmap_word: máscara}."""
+    first_bit = max(start_year - base_year, 0)
+    last_bit = end_year - base_year
+    if last_bit < first_bit:
+        return {}
+
+    masks = {}
+    for word in range(first_bit // BITMAP_WORD_YEARS, last_bit // BITMAP_WORD_YEARS + 1):
+        word_first = max(first_bit - word * BITMAP_WORD_YEARS, 0)
+        word_last = min(last_bit - word * BITMAP_WORD_YEARS, BITMAP_WORD_YEARS - 1)
+        masks[word] = ((1 << (word_last + 1)) - 1) ^ ((1 << word_first) - 1)
+    return masks
+
+######################################################################################################################
+
+def select_coverage_index(coverage_index, selected_countries, by=None, age_mapping=None, dimension=None):
+    """
+    Reduce el índice completo (COVERAGE_KEYS) al desglose pedido, con claves ['Country'[, by]].
+    Aplica los mismos filtros que _filter_breakdown; en 'Age' une los bitmaps de las edades
+    que caen en el mismo grupo (OR de bits), igual que la reagrupación de las series.
+    """
+    index = coverage_index.lazy()
+
+    index = index.filter(
+        _breakdown_filter_expr(selected_countries, by=by, age_mapping=age_mapping, dimension=dimension)
+    )
+    if by == 'Age':
+        index = _map_age_groups(index, age_mapping)
+
+    group_keys = ['Country']
+    if by:
+        group_keys.append(by)
+
+    return (
+        index
+        .group_by(group_keys + ['bitmap_word'])
+        .agg(
+            pl.col('years_bitmap').bitwise_or(),
+            pl.col('base_year').first()
+        )
+        .collect()
+    )
+
+######################################################################################################################
+
+def coverage_from_index(coverage_index, countries, period, by=None):
+    """
+    Proporción de años con datos en 'period' por país, penalizando el peor segmento,
+    a partir de un índice con claves ['Country'[, by]] (popcount de bitmap & máscara).
+    Los países sin datos en el periodo reciben 0.0.
     """
     start_year, end_year = period
     total_years_needed = end_year - start_year + 1
-    
-    # 1. Filtramos primero el DF global al periodo de interés y a los países de la lista
-    # (Esto es mucho más rápido que iterar uno por uno)
-    df_period = df.filter(
-        (pl.col('Country').is_in(countries)) &
-        (pl.col('Year') >= start_year) & 
-        (pl.col('Year') <= end_year)
-    )
 
-    # 2. Definimos las claves de agrupación
     group_keys = ['Country']
     if by:
         group_keys.append(by)
 
-    # 3. Calculamos la proporción REAL de años para cada segmento
-    # Contamos años únicos presentes (n_unique) en lugar de inferir rangos
-    coverage_df = (
-        df_period
+    index = coverage_index.lazy().filter(pl.col('Country').is_in(countries))
+
+    base_years = index.select(pl.col('base_year').unique()).collect()['base_year'].to_list()
+    if len(base_years) > 1:
+        raise ValueError(f"El índice de cobertura mezcla varios base_year: {base_years}")
+    base_year = base_years[0] if base_years else start_year
+
+    masks = _year_masks(start_year, end_year, base_year)
+    df_masks = pl.LazyFrame(
+        {'bitmap_word': list(masks), 'year_mask': list(masks.values())},
+        schema={'bitmap_word': pl.UInt32, 'year_mask': pl.UInt64}
+    )
+
+    country_scores = (
+        index
+        .group_by(group_keys + ['bitmap_word'])
+        .agg(pl.col('years_bitmap').bitwise_or())
+        .join(df_masks, on='bitmap_word', how='inner')
+        .with_columns(
+            (pl.col('years_bitmap') & pl.col('year_mask')).bitwise_count_ones().alias('years_count')
+        )
         .group_by(group_keys)
-        .agg([
-            pl.col('Year').n_unique().alias('years_count')
-        ])
+        .agg(pl.col('years_count').sum())
+        # Segmentos sin datos en el periodo no penalizan (igual que contar años sobre filas)
+        .filter(pl.col('years_count') > 0)
         .with_columns(
             (pl.col('years_count') / total_years_needed).alias('prop')
         )
+        .group_by('Country')
+        .agg(pl.col('prop').min().round(2).alias('final_prop'))
     )
 
-    # 4. Agregamos a nivel de País penalizando el peor segmento
-    # Si by='Sex', un país tendrá dos filas (F y M). 
-    # Tomamos el MIN de la proporción. Si M tiene 0.1 y F tiene 0.9, el país recibe 0.1.
-    country_scores = (
-        coverage_df
-        .group_by('Country')
-        .agg(
-            pl.col('prop').min().alias('final_prop')
-        )
+    return (
+        pl.LazyFrame({'Country': list(dict.fromkeys(countries))}, schema={'Country': pl.String})
+        .join(country_scores, on='Country', how='left')
+        .with_columns(pl.col('final_prop').fill_null(0.0))
+        .collect()
     )
 
-    # 5. Generamos el diccionario de proporciones para todos los países procesados
-    # Usamos un dict comprehension de Polars para velocidad
+######################################################################################################################
+
+def get_countries_with_enough_data(df, countries, period, prop_years_in_period_limit, by=None, coverage_index=None):
+    """
+    Filtra países asegurando que, si hay segmentación (by='Sex'), 
+    TODOS los segmentos cumplan con el límite de datos.
+    Si se pasa coverage_index (claves ['Country'[, by]], ver select_coverage_index),
+    la cobertura se responde con operaciones de bits sin volver a recorrer df.
+    """
+
+    # 1. Índice de cobertura del desglose (un único group_by si no viene precalculado)
+    if coverage_index is None:
+        group_keys = ['Country']
+        if by:
+            group_keys.append(by)
+
+        coverage_index = build_coverage_index(
+            df.lazy().filter(pl.col('Country').is_in(countries)), 
+            keys = group_keys
+        )
+
+    # 2. Proporción por país (peor segmento) y países sin datos a 0
+    country_scores = coverage_from_index(coverage_index, countries, period, by=by)
+
     scores_dict = dict(zip(
         country_scores['Country'].to_list(), 
-        country_scores['final_prop'].round(2).to_list()
+        country_scores['final_prop'].to_list()
     ))
-    
-    # Rellenamos países que no tenían ningún dato en el periodo (prop = 0)
-    for c in countries:
-        if c not in scores_dict:
-            scores_dict[c] = 0.0
-
-    # 6. Filtramos la lista final
-    countries_with_enough_data = [
-        c for c, p in scores_dict.items() 
-        if p >= prop_years_in_period_limit
-    ]
-    
-    # Ordenamos la lista para consistencia
-    countries_with_enough_data.sort()
+
+    # 3. Filtramos y ordenamos la lista final
+    countries_with_enough_data = (
+        country_scores
+        .filter(pl.col('final_prop') >= prop_years_in_period_limit)
+        ['Country'].sort().to_list()
+    )
 
     return countries_with_enough_data, scores_dict
 
 ######################################################################################################################
 
-def process_time_series_data(
-    df, 
-    selected_countries, 
-    prop_years_in_period_limit, 
-    ref_region_for_start_year='Europe',
-    by=None,             # 'Sex', 'Age', 'Category' o None
-    age_mapping=None,     # Solo requerido si by='Age'
-    dimension=None
+# Tasas por 100.000 habitantes
+RATE_SCALE = 100000
+
+def _known_population_counts():
+    """homicides_count de las filas con población conocida (numerador coherente con el denominador)."""
+    return pl.when(pl.col('population').is_not_null()).then(pl.col('homicides_count'))
+
+def _weighted_rate():
+    """
+    Tasa ponderada de un grupo: (Suma Muertos / Suma Pob) * 100k. Es la única vía de agregación:
+    el procesado rellena la población de los años con tasa 0 (ver backfill_population en el script).
+    """
+    return _known_population_counts().sum() / pl.col('population').sum() * RATE_SCALE
+
+######################################################################################################################
+
+CHANGE_METRICS = ('abs_change', 'pct_change', 'rolling_mean', 'cagr', 'region_zscore')
+
+@profiled('change_metrics')
+def compute_change_metrics(
+    df,
+    value_col='homicides_rate',
+    series_cols=('Country',),
+    metrics=CHANGE_METRICS,
+    rolling_windows=(3, 5),
+    cagr_windows=(5, 10),
+    region_col='Region_2',
+    decimals=2
 ):
     """
-    Genera DataFrames de series temporales filtrando dinámicamente por:
-    - Total
-    - Sexo (Dimension=Total, Sex!=Total)
-    - Edad (Dimension=Total, Age!=Total + Mapeo)
-    - Contexto (Dimension='by situational context', Category!=Total)
+    Métricas temporales de todas las series (series_cols identifica cada serie; una fila por año):
+    - '{value_col}_abs_change' / '_pct_change': variación absoluta / % respecto al año anterior.
+    - '{value_col}_rolling_mean_{w}y': media móvil de w años (con datos en al menos la mitad).
+    - '{value_col}_cagr_{w}y': tasa de crecimiento anual compuesta (%) respecto a w años antes.
+    - '{value_col}_region_zscore': z-score frente a los países de su región ese año
+      (y mismo desglose: series_cols salvo 'Country').
+
+    Las series se completan con todos los años de su rango antes de la pasada de ventanas,
+    así que los desfases son años naturales: un hueco da nulo (no se trata como año consecutivo).
+    Un solo sort + ventanas .over(series); funciona sobre pl.DataFrame y pl.LazyFrame
+    y devuelve las filas de entrada (mismo orden) con las columnas de métricas añadidas.
     """
-    
-    df_time_series = {}
+    series_cols = list(series_cols)
+    keys = series_cols + ['Year']
+    v = pl.col(value_col)
+
+    unknown = set(metrics) - set(CHANGE_METRICS)
+    if unknown:
+        raise ValueError(f"Métricas no soportadas: {sorted(unknown)} (opciones: {list(CHANGE_METRICS)})")
+
+    temporal_exprs = []
+    if 'abs_change' in metrics:
+        temporal_exprs.append((v - v.shift(1)).alias(f'{value_col}_abs_change'))
+    if 'pct_change' in metrics:
+        prev = v.shift(1)
+        temporal_exprs.append(
+            pl.when(prev != 0).then((v - prev) / prev * 100).alias(f'{value_col}_pct_change')
+        )
+    if 'rolling_mean' in metrics:
+        temporal_exprs += [
+            v.rolling_mean(window_size=w, min_samples=w // 2 + 1).alias(f'{value_col}_rolling_mean_{w}y')
+            for w in rolling_windows
+        ]
+    if 'cagr' in metrics:
+        temporal_exprs += [
+            pl.when((v > 0) & (v.shift(w) > 0))
+            .then(((v / v.shift(w)) ** (1 / w) - 1) * 100)
+            .alias(f'{value_col}_cagr_{w}y')
+            for w in cagr_windows
+        ]
+
+    metric_names = [e.meta.output_name() for e in temporal_exprs]
+    if 'region_zscore' in metrics:
+        metric_names.append(f'{value_col}_region_zscore')
+
+    lf = df.lazy().drop(metric_names, strict=False)
+    lf_metrics = lf.select(keys + [value_col] + ([region_col] if 'region_zscore' in metrics else []))
+
+    if temporal_exprs:
+        # Rejilla de años completa por serie: los huecos quedan como filas nulas
+        lf_grid = (
+            lf_metrics
+            .group_by(series_cols)
+            .agg(pl.int_range(pl.col('Year').min(), pl.col('Year').max() + 1).alias('Year'))
+            .explode('Year')
+            .with_columns(pl.col('Year').cast(lf_metrics.collect_schema()['Year']))
+        )
+        lf_metrics = (
+            lf_grid
+            .join(lf_metrics.with_columns(pl.lit(True).alias('_observed')), on=keys, how='left')
+            .sort(keys)
+            .with_columns(e.over(series_cols) for e in temporal_exprs)
+            .filter(pl.col('_observed'))
+            .drop('_observed')
+        )
+
+    if 'region_zscore' in metrics:
+        peers = [region_col, 'Year'] + [c for c in series_cols if c != 'Country']
+        region_std = v.std().over(peers)
+        lf_metrics = lf_metrics.with_columns(
+            # Nulo si la región tiene un solo país (o todos con el mismo valor) ese año
+            pl.when(region_std > 0)
+            .then((v - v.mean().over(peers)) / region_std)
+            .alias(f'{value_col}_region_zscore')
+        )
+
+    lf_out = lf.join(
+        lf_metrics.select(keys + [pl.col(metric_names).round(decimals)]),
+        on=keys, how='left', maintain_order='left', nulls_equal=True
+    )
+
+    return lf_out if isinstance(df, pl.LazyFrame) else lf_out.collect()
+
+######################################################################################################################
+
+def _total_age_groups(age_mapping):
+    """Edades (originales) cuyo grupo mapeado es 'Total': se descartan en el desglose por edad."""
+    age_mapping = age_mapping or {}
+    total_ages = [age for age, group in age_mapping.items() if group == 'Total']
+    if 'Total' not in age_mapping:
+        total_ages.append('Total')
+    return total_ages
+
+######################################################################################################################
+
+def _breakdown_filter_expr(selected_countries, by=None, age_mapping=None, dimension=None):
+    """Expresión de filtro de filas para cada desglose (compartida por series e índice de cobertura)."""
 
-    # -------------------------------------------------------------------------
-    # 1. FILTRADO INICIAL Y LÓGICA CONDICIONAL
-    # -------------------------------------------------------------------------
-    
     # Filtro común para todos los casos: Solo los países seleccionados
     country_filter = pl.col('Country').is_in(selected_countries)
-    
-    init_msg = f"⚙️ Procesando desglose por: {by.upper()}" if by else f"⚙️ Procesando desglose por: TOTAL PAÍS"
-    print(init_msg)
-    print('-'*80)
-    
+
     if by == 'Category':
         # --- NUEVO CASO: SITUATIONAL CONTEXT ---
-       
-        df_country = df.filter(
+        return (
             country_filter &
             (pl.col('Dimension') == dimension) & # Dimensión específica
             (pl.col('Category') != 'Total') &    # Queremos las subcategorías
@@ -114,11 +405,9 @@ def process_time_series_data(
             (pl.col('Age') == 'Total')
         )
 
-
     elif by == 'Sex':
         # --- CASO SEXO ---
-
-        df_country = df.filter(
+        return (
             country_filter &
             (pl.col('Dimension') == 'Total') &
             (pl.col('Category') == 'Total') &
@@ -128,74 +417,153 @@ def process_time_series_data(
 
     elif by == 'Age':
         # --- CASO EDAD ---
-
-        # A. Pre-filtro y Mapeo
-        
-        df_pre = df.clone()
-
-        if age_mapping:
-            
-            df_pre = df_pre.with_columns(
-                pl.col('Age').replace(age_mapping) 
-            )
-        
-        df_pre = df_pre.filter(
+        # Descartamos las edades cuyo valor mapeado sería 'Total' (equivale a filtrar tras el mapeo)
+        return (
             country_filter &
             (pl.col('Dimension') == 'Total') &
             (pl.col('Category') == 'Total') &
-            (pl.col('Age') != 'Total')        # Grupos de edad
-        )
-
-        # B. Agregación (Suma de conteos / Recálculo de tasas por el reagrupamiento)
-        has_counts = 'homicides_count' in df.columns
-        has_pop = 'population' in df.columns
-        
-        # Columnas de agrupación (Aseguramos mantener Region_2)
-        grp_cols = ['Country', 'Region_2', 'Year', 'Age']
-        
-        agg_expr = (
-            (pl.col('homicides_count').sum() / pl.col('population').sum() * 100000).round(2)
-            if (has_counts and has_pop)
-            else pl.mean('homicides_rate').round(2)
-        )
-        
-        # Agregamos conteos y poblaciones si existen para no perderlos
-        agg_list = [agg_expr.alias('homicides_rate')]
-        if has_counts: agg_list.append(pl.col('homicides_count').sum())
-        if has_pop:    agg_list.append(pl.col('population').sum())
-
-        df_country = df_pre.group_by(grp_cols).agg(agg_list)
-        
-        # RECALCULAR LA DIFERENCIA ABSOLUTA
-        df_country = (
-            df_country
-            .sort(['Country', 'Age', 'Year']) # Orden vital para series temporales
-            .with_columns(
-                homicides_rate_abs_change = pl.col('homicides_rate')
-                                            .diff()
-                                            .over(['Country', 'Age']) # Diff por País y Grupo de Edad
-                                            .round(2)
-            )
+            ~pl.col('Age').cast(pl.String).is_in(_total_age_groups(age_mapping))  # Grupos de edad
         )
 
     else:
         # --- CASO TOTAL (Headline Rate) ---
-
-        df_country = df.filter(
+        return (
             country_filter &
             (pl.col('Dimension') == 'Total') &
             (pl.col('Category') == 'Total') &
             (pl.col('Sex') == 'Total') &
             (pl.col('Age') == 'Total')
         )
+
+######################################################################################################################
+
+def _map_age_groups(df, age_mapping):
+    """Aplica el mapeo de edades como join contra una tabla pequeña (edades sin mapeo se mantienen)."""
+    if not age_mapping:
+        return df
+
+    df_age_map = pl.DataFrame(
+        {'Age': list(age_mapping.keys()), 'Age_group': list(age_mapping.values())},
+        schema={'Age': pl.String, 'Age_group': pl.String}
+    )
+    if isinstance(df, pl.LazyFrame):
+        df_age_map = df_age_map.lazy()
+
+    return (
+        df
+        .with_columns(pl.col('Age').cast(pl.String))
+        .join(df_age_map, on='Age', how='left')
+        .with_columns(pl.coalesce('Age_group', 'Age').alias('Age'))
+        .drop('Age_group')
+    )
+
+######################################################################################################################
+
+def _filter_breakdown(df, selected_countries, by=None, age_mapping=None, dimension=None):
+    """
+    Filtra (y en el caso de 'Age', reagrupa) las filas del desglose pedido.
+    Solo usa expresiones, por lo que funciona igual sobre pl.DataFrame y pl.LazyFrame.
+    """
+
+    breakdown_filter = _breakdown_filter_expr(
+        selected_countries, by=by, age_mapping=age_mapping, dimension=dimension
+    )
+
+    if by != 'Age':
+        return df.filter(breakdown_filter)
+
+    # --- CASO EDAD ---
+
+    # A. Pre-filtro (antes de mapear, sin clonar la tabla completa)
+    df_pre = df.filter(breakdown_filter)
+
+    # Mapeo: join contra la tabla (pequeña) de grupos, solo sobre las filas supervivientes
+    df_pre = _map_age_groups(df_pre, age_mapping)
+
+    # B. Agregación (Suma de conteos / Recálculo de tasas por el reagrupamiento)
+    # Columnas de agrupación (Aseguramos mantener Region_2)
+    grp_cols = ['Country', 'Region_2', 'Year', 'Age']
+
+    df_country = df_pre.group_by(grp_cols).agg(
+        _weighted_rate().round(2).alias('homicides_rate'),
+        pl.col('homicides_count').sum(),
+        pl.col('population').sum()
+    )
     
+    # RECALCULAR LA DIFERENCIA ABSOLUTA (por País y Grupo de Edad; un año sin datos da nulo)
+    df_country = (
+        compute_change_metrics(df_country, series_cols=['Country', 'Age'], metrics=('abs_change',))
+        .sort(['Country', 'Age', 'Year'])
+    )
+
+    return df_country
 
-    countries_with_data = df_country['Country'].unique().to_list()
-    countries_without_data = [c for c in selected_countries if c not in countries_with_data]
-    print(f'📊 Paises SIN datos de este tipo:')
-    print(f'   - Número: {len(countries_without_data)} de {len(selected_countries)}')
-    print(f'   - Lista: {countries_without_data}')
-    print('-'*80)
+######################################################################################################################
+
+@profiled('process_time_series_data', context_args=('by', 'dimension'))
+def process_time_series_data(
+    df, 
+    selected_countries, 
+    prop_years_in_period_limit, 
+    ref_region_for_start_year='Europe',
+    by=None,             # 'Sex', 'Age', 'Category' o None
+    age_mapping=None,     # Solo requerido si by='Age'
+    dimension=None,
+    coverage_index=None,  # Índice de cobertura precalculado (build_coverage_index), opcional
+    report=None           # AnalysisReport donde dejar los diagnósticos, opcional
+):
+    """
+    Genera DataFrames de series temporales filtrando dinámicamente por:
+    - Total
+    - Sexo (Dimension=Total, Sex!=Total)
+    - Edad (Dimension=Total, Age!=Total + Mapeo)
+    - Contexto (Dimension='by situational context', Category!=Total)
+
+    Acepta un pl.DataFrame o un pl.LazyFrame (ej. el de scan_processed_data): en ese caso
+    los filtros se empujan al scan (predicado + proyección) y solo se materializa el subconjunto.
+    Con coverage_index, el filtro de calidad se responde desde el índice sin recorrer las series.
+    Los diagnósticos solo se calculan si se van a loguear (ver set_verbosity) o si se pasa report.
+    """
+    
+    df_time_series = {}
+    log_summary = LOGGER.isEnabledFor(logging.INFO)
+    log_detail = LOGGER.isEnabledFor(logging.DEBUG)
+
+    # -------------------------------------------------------------------------
+    # 1. FILTRADO INICIAL Y LÓGICA CONDICIONAL
+    # -------------------------------------------------------------------------
+
+    if log_summary:
+        init_msg = f"⚙️ Procesando desglose por: {by.upper()}" if by else f"⚙️ Procesando desglose por: TOTAL PAÍS"
+        LOGGER.info(init_msg)
+        LOGGER.info('-'*80)
+
+    with stage('time_series.filter', df_in=df, by=by) as st:
+        df_country = _filter_breakdown(
+            df, 
+            selected_countries = selected_countries, 
+            by = by, 
+            age_mapping = age_mapping, 
+            dimension = dimension
+        )
+
+        # Con entrada lazy, aquí se ejecuta el scan ya filtrado
+        if isinstance(df_country, pl.LazyFrame):
+            df_country = collect_profiled(df_country, 'time_series.filter')
+
+        st.set_output(df_country)
+
+    countries_without_data = None
+    if log_summary or report is not None:
+        countries_with_data = set(df_country['Country'].unique().to_list())
+        countries_without_data = [c for c in selected_countries if c not in countries_with_data]
+
+    if log_summary:
+        LOGGER.info(f'📊 Paises SIN datos de este tipo:')
+        LOGGER.info(f'   - Número: {len(countries_without_data)} de {len(selected_countries)}')
+        if log_detail:
+            LOGGER.debug(f'   - Lista: {countries_without_data}')
+        LOGGER.info('-'*80)
 
     # Ordenamiento final (Vital para visualización)
     df_time_series['country'] = df_country.sort(["Country", "Year"])
@@ -221,13 +589,22 @@ def process_time_series_data(
     # -------------------------------------------------------------------------
     # Pasamos 'by' para que valide que existan datos para TODAS las categorías
     # (ej. si by='Category', valida que tenga datos de Gangs, Interpersonal, etc.)
-    countries_with_enough_data, prop_year_in_period = get_countries_with_enough_data(
-        df = df_time_series['country'], 
-        countries = selected_countries,
-        period = [min_year, max_year],
-        prop_years_in_period_limit = prop_years_in_period_limit,
-        by = by 
-    )
+    with stage('time_series.coverage', df_in=df_time_series['country'], by=by, from_index=coverage_index is not None) as st:
+        breakdown_coverage_index = None
+        if coverage_index is not None:
+            breakdown_coverage_index = select_coverage_index(
+                coverage_index, selected_countries, by=by, age_mapping=age_mapping, dimension=dimension
+            )
+
+        countries_with_enough_data, prop_year_in_period = get_countries_with_enough_data(
+            df = df_time_series['country'], 
+            countries = selected_countries,
+            period = [min_year, max_year],
+            prop_years_in_period_limit = prop_years_in_period_limit,
+            by = by,
+            coverage_index = breakdown_coverage_index
+        )
+        st.set_output(n_valid_countries=len(countries_with_enough_data))
 
     # -------------------------------------------------------------------------
     # 4. SERIES REGIONALES (Agregación Ponderada)
@@ -236,122 +613,512 @@ def process_time_series_data(
     group_cols_region = ['Region_2', 'Year']
     if by: group_cols_region.append(by)
 
-    # Detectamos si podemos usar el método preciso (Conteos/Población)
-    has_precision = 'homicides_count' in df_country.columns and 'population' in df_country.columns
-    
-    if has_precision:
-        # Fórmula: (Suma Muertos / Suma Pob) * 100k
-        agg_regional = (pl.col('homicides_count').sum() / pl.col('population').sum() * 100000)
-    else:
-        # Fallback: Promedio simple
-        agg_regional = pl.mean('homicides_rate')
+    with stage('time_series.region_aggregation', df_in=df_time_series['country'], by=by) as st:
+        df_time_series['region'] = st.set_output(
+            df_time_series['country']
+            .filter(pl.col('Country').is_in(countries_with_enough_data))
+            .group_by(group_cols_region)
+            .agg(_weighted_rate().round(2).alias('mean_homicides_rate'))
+            .sort(group_cols_region)
+        )
+
+    # Logs de control
+    if log_summary:
+        LOGGER.info(f"📅 Periodo para región: {min_year}-{max_year}")
+        LOGGER.info(f"✅ Países válidos para región: {len(countries_with_enough_data)} de {len(selected_countries)}")
+        LOGGER.info('-'*80)
+
+    if report is not None:
+        report.add(
+            'time_series',
+            by = by,
+            dimension = dimension,
+            n_countries = len(selected_countries),
+            countries_without_data = countries_without_data,
+            min_year = min_year,
+            max_year = max_year,
+            countries_with_enough_data = countries_with_enough_data,
+            prop_years_in_period = prop_year_in_period
+        )
+
+    return df_time_series, min_year, max_year
+
+######################################################################################################################
+
+def process_time_series_data_lazy(
+    df, 
+    selected_countries, 
+    prop_years_in_period_limit, 
+    ref_region_for_start_year='Europe',
+    by=None,
+    age_mapping=None,
+    dimension=None
+):
+    """
+    Variante lazy de process_time_series_data: construye todo el plan
+    país -> periodo -> cobertura -> región como una única consulta sin materializar nada.
+    Devuelve un dict de pl.LazyFrame con las claves 'country', 'region' y 'period'
+    (una fila con min_year / max_year). Usar collect_time_series_data para ejecutarlo.
+    """
+
+    # 1. Series por país (mismo filtrado que la versión eager)
+    lf_country = _filter_breakdown(
+        df.lazy(), 
+        selected_countries = selected_countries, 
+        by = by, 
+        age_mapping = age_mapping, 
+        dimension = dimension
+    ).sort(["Country", "Year"])
+
+    # 2. Periodo: Q25 de los años de la región de referencia (o el mínimo si no hay datos)
+    is_ref_region = pl.col('Region_2') == ref_region_for_start_year
+    lf_period = lf_country.select(
+        min_year = pl.when(is_ref_region.any())
+                     .then(pl.col('Year').filter(is_ref_region).quantile(0.25))
+                     .otherwise(pl.col('Year').min())
+                     .cast(pl.Int64),
+        max_year = pl.col('Year').max().cast(pl.Int64)
+    )
+
+    # 3. Cobertura: proporción de años presentes, penalizando el peor segmento
+    coverage_keys = ['Country']
+    if by: coverage_keys.append(by)
 
-    df_time_series['region'] = (
-        df_time_series['country']
-        .filter(pl.col('Country').is_in(countries_with_enough_data))
+    lf_valid_countries = (
+        lf_country
+        .join(lf_period, how='cross')
+        .filter(pl.col('Year').is_between(pl.col('min_year'), pl.col('max_year')))
+        .group_by(coverage_keys)
+        .agg(
+            (pl.col('Year').n_unique() / (pl.col('max_year').first() - pl.col('min_year').first() + 1)).alias('prop')
+        )
+        .group_by('Country')
+        .agg(pl.col('prop').min().round(2).alias('final_prop'))
+        .filter(pl.col('final_prop') >= prop_years_in_period_limit)
+        .select('Country')
+    )
+
+    # 4. Series regionales (agregación ponderada)
+    group_cols_region = ['Region_2', 'Year']
+    if by: group_cols_region.append(by)
+
+    lf_region = (
+        lf_country
+        .join(lf_valid_countries, on='Country', how='semi')
         .group_by(group_cols_region)
-        .agg(agg_regional.round(2).alias('mean_homicides_rate'))
+        .agg(_weighted_rate().round(2).alias('mean_homicides_rate'))
         .sort(group_cols_region)
     )
 
-    # Logs de control
-    print(f"📅 Periodo para región: {min_year}-{max_year}")
-    print(f"✅ Países válidos para región: {len(countries_with_enough_data)} de {len(selected_countries)}")
-    print('-'*80)
+    return {'country': lf_country, 'region': lf_region, 'period': lf_period}
 
-    return df_time_series, min_year, max_year
+######################################################################################################################
+
+def collect_time_series_data(lazy_time_series):
+    """
+    Ejecuta los planes de process_time_series_data_lazy con un único pl.collect_all
+    (eliminación de subplanes comunes + ejecución en paralelo).
+    Devuelve la misma tupla que process_time_series_data: (df_time_series, min_year, max_year).
+    """
+    df_country, df_region, df_period = pl.collect_all([
+        lazy_time_series['country'], 
+        lazy_time_series['region'], 
+        lazy_time_series['period']
+    ])
+
+    df_time_series = {'country': df_country, 'region': df_region}
+
+    return df_time_series, df_period['min_year'][0], df_period['max_year'][0]
 
 ######################################################################################################################
 
-def calculate_ranking_country(df, countries, prop_years_in_period_limit, start_year, end_year, by=None):
+@profiled('process_time_series_batch')
+def process_time_series_batch(
+    df, 
+    breakdowns, 
+    selected_countries, 
+    prop_years_in_period_limit, 
+    ref_region_for_start_year='Europe'
+):
     """
-    Calcula el ranking de países (o segmentos país-sexo/edad) para un periodo dado.
-    Si existen columnas de conteo y población, calcula la tasa ponderada del periodo.
-    Si no, usa el promedio simple de las tasas anuales.
+    Calcula varios desgloses (Total, Sexo, Edad, Categoría...) en una sola ejecución.
+    - breakdowns: lista de specs {'by': ..., 'age_mapping': ..., 'dimension': ..., 'name': ...}
+      (solo 'by' es necesario; 'name' por defecto: by / 'Total', más la dimensión si la hay).
+
+    Todos los planes parten del mismo filtro de países y se ejecutan juntos con pl.collect_all,
+    así que el dataset se lee una vez y Polars reparte los desgloses entre los núcleos.
+    Devuelve {name: (df_time_series, min_year, max_year)}, igual que process_time_series_data.
     """
-    
-    # 1. Mapa de regiones ligero (para pegar después)
-    df_regions_map = df.select(['Country', 'Region_2']).unique()
-    
-    # 2. Filtrar países con suficientes datos (Usando tu función optimizada)
-    ranking_selected_countries, prop_year_in_period = get_countries_with_enough_data(
-        df = df, 
-        countries=countries,
-        period = [start_year, end_year],
-        prop_years_in_period_limit = prop_years_in_period_limit,
-        by=by
+
+    # Filtro común compartido por todos los desgloses (subplan común del collect_all)
+    lf_base = df.lazy().filter(pl.col('Country').is_in(selected_countries))
+
+    names, lazy_frames = [], []
+    for spec in breakdowns:
+        by = spec.get('by')
+        dimension = spec.get('dimension')
+        name = spec.get('name') or (f"{by or 'Total'} ({dimension})" if dimension else (by or 'Total'))
+        if name in names:
+            raise ValueError(f"Desglose duplicado en el batch: '{name}' (usa 'name' para distinguirlos)")
+
+        lazy_time_series = process_time_series_data_lazy(
+            lf_base, 
+            selected_countries = selected_countries, 
+            prop_years_in_period_limit = prop_years_in_period_limit, 
+            ref_region_for_start_year = ref_region_for_start_year,
+            by = by, 
+            age_mapping = spec.get('age_mapping'), 
+            dimension = dimension
+        )
+
+        names.append(name)
+        lazy_frames += [lazy_time_series['country'], lazy_time_series['region'], lazy_time_series['period']]
+
+    collected = collect_all_profiled(lazy_frames, 'time_series.batch')
+
+    results = {}
+    for i, name in enumerate(names):
+        df_country, df_region, df_period = collected[3*i : 3*i + 3]
+        results[name] = (
+            {'country': df_country, 'region': df_region}, 
+            df_period['min_year'][0], 
+            df_period['max_year'][0]
+        )
+
+    return results
+
+######################################################################################################################
+
+def calculate_ranking_periods(df, countries, prop_years_in_period_limit, periods, by=None, coverage_index=None):
+    """
+    Motor de rankings multi-periodo en una sola pasada.
+    Une cada fila con la tabla (pequeña) de periodos [(start_year, end_year), ...] y calcula
+    cobertura y tasa del periodo en el mismo group_by (periodo, País[, by]).
+    El coste no crece con una pasada completa por periodo.
+    Con coverage_index (claves ['Country'[, by]]) la cobertura sale del bitmap de años.
+
+    Devuelve:
+    - df_ranking: ranking por periodo (columnas 'period_idx', 'start_year', 'end_year', 'Periodo')
+    - df_scores: proporción de años con datos por (periodo, País), para los logs
+    """
+
+    # 1. Tabla de periodos (una fila por periodo, en el orden recibido)
+    df_periods = pl.LazyFrame(
+        {
+            'period_idx': list(range(len(periods))),
+            'start_year': [int(start) for start, _ in periods],
+            'end_year': [int(end) for _, end in periods],
+        },
+        schema={'period_idx': pl.UInt32, 'start_year': pl.Int64, 'end_year': pl.Int64}
+    ).with_columns(
+        pl.format('{}-{}', 'start_year', 'end_year').alias('Periodo')
     )
 
-    ranking_not_selected_countries = [c for c in countries if c not in ranking_selected_countries]
+    # 2. Mapa de regiones ligero (para pegar después)
+    lf = df.lazy()
+    lf_regions_map = lf.select(['Country', 'Region_2']).unique()
 
-    # 3. Definir columnas de agrupación
+    # 3. Columnas de agrupación
     group_cols = ['Country']
     if by:
         group_cols.append(by)
 
-    # 4. Lógica de Agregación (El "Nuevo Enfoque")
-    # Verificamos si tenemos los datos para hacer el cálculo ponderado (más preciso)
-    has_precision_data = 'homicides_count' in df.columns and 'population' in df.columns
+    # 4. Cobertura + tasa ponderada en un único group_by por (periodo, segmento)
+    lf_segments = (
+        lf
+        .filter(pl.col('Country').is_in(countries))
+        .join_where(
+            df_periods,
+            pl.col('Year') >= pl.col('start_year'),
+            pl.col('Year') <= pl.col('end_year')
+        )
+        .group_by(['period_idx'] + group_cols)
+        .agg(
+            pl.col('Year').n_unique().alias('years_count'),
+            _weighted_rate().round(2).alias('mean_homicides_rate') # Tasa ponderada del periodo
+        )
+        .join(df_periods, on='period_idx', how='left')
+    )
 
-    if has_precision_data:
-        # Tasa del Periodo = (Suma Muertes Periodo / Suma Población Periodo) * 100k
-        # Esto evita sesgos si la población cambió mucho en 30 años.
-        agg_expr = (pl.col('homicides_count').sum() / pl.col('population').sum() * 100000)
+    # 5. Proporción por (periodo, País), penalizando el peor segmento (ej. by='Sex': min(M, F))
+    if coverage_index is not None:
+        base_year = coverage_index['base_year'][0] if coverage_index.height else 0
+        # Una fila por (periodo, palabra del bitmap) que solapa el periodo
+        period_masks = [
+            (idx, word, mask)
+            for idx, (start, end) in enumerate(periods)
+            for word, mask in _year_masks(int(start), int(end), base_year).items()
+        ]
+        df_masks = pl.LazyFrame(
+            {
+                'period_idx': [idx for idx, _, _ in period_masks],
+                'bitmap_word': [word for _, word, _ in period_masks],
+                'year_mask': [mask for _, _, mask in period_masks],
+            },
+            schema={'period_idx': pl.UInt32, 'bitmap_word': pl.UInt32, 'year_mask': pl.UInt64}
+        )
+        lf_segment_years = (
+            coverage_index.lazy()
+            .filter(pl.col('Country').is_in(countries))
+            .group_by(group_cols + ['bitmap_word'])
+            .agg(pl.col('years_bitmap').bitwise_or())
+            .join(df_masks, on='bitmap_word', how='inner')
+            .with_columns(
+                (pl.col('years_bitmap') & pl.col('year_mask')).bitwise_count_ones().alias('years_count')
+            )
+            .group_by(['period_idx'] + group_cols)
+            .agg(pl.col('years_count').sum())
+            .filter(pl.col('years_count') > 0)
+            .join(df_periods, on='period_idx', how='left')
+        )
     else:
-        # Fallback: Promedio simple de tasas anuales (tu método anterior)
-        agg_expr = pl.mean('homicides_rate')
+        lf_segment_years = lf_segments
 
-    # 5. Construcción del DataFrame
-    df_ranking = (
-        df
-        .filter(
-            pl.col('Year').is_between(start_year, end_year),
-            pl.col('Country').is_in(ranking_selected_countries)
-        )
-        .group_by(group_cols)
-        .agg(
-            agg_expr.round(2).alias('mean_homicides_rate')
+    lf_scores = (
+        lf_segment_years
+        .with_columns(
+            (pl.col('years_count') / (pl.col('end_year') - pl.col('start_year') + 1)).alias('prop')
         )
-        # Unir región
+        .group_by(['period_idx', pl.col('Country').cast(pl.String)])
+        .agg(pl.col('prop').min().round(2).alias('final_prop'))
+        .sort(['period_idx', 'Country'])
+    )
+
+    lf_ranking = (
+        lf_segments
         .join(
-            df_regions_map, 
-            on='Country', 
-            how='left'
+            lf_scores.filter(pl.col('final_prop') >= prop_years_in_period_limit),
+            left_on=['period_idx', pl.col('Country').cast(pl.String)],
+            right_on=['period_idx', 'Country'],
+            how='semi'
         )
+        .select(['period_idx', 'start_year', 'end_year', 'Periodo'] + group_cols + ['mean_homicides_rate'])
+        .join(lf_regions_map, on='Country', how='left')
         # Ordenar (Ascendente para que Plotly horizontal ponga el mayor arriba)
-        .sort("mean_homicides_rate", descending=False)
+        .sort(['period_idx', 'mean_homicides_rate'] + group_cols) # Empates: orden estable por segmento
     )
-    
-    # 6. Logs informativos
-    print('-'*100)
-    print(f'📊 Ranking Period: {start_year} - {end_year}')
-    if by: print(f'   Segmentado por: {by}')
-    print(f'   Países analizados: {len(countries)}')
-    print(f'   Países seleccionados (Data > {prop_years_in_period_limit*100}%): {len(ranking_selected_countries)}')
-    print(f'   Países descartados: {ranking_not_selected_countries}')
-    print(f'   Prop. datos (años) en el periodo, por pais: {prop_year_in_period}')
-    print('-'*100)
-    
-    return df_ranking
+
+    df_ranking, df_scores = collect_all_profiled([lf_ranking, lf_scores], 'ranking.periods')
+
+    return df_ranking, df_scores
 
 ######################################################################################################################
 
+def calculate_rolling_rankings(
+    df, 
+    countries, 
+    prop_years_in_period_limit, 
+    start_years=None, 
+    end_years=None, 
+    by=None
+):
+    """
+    Rankings de todas las ventanas [start_year, end_year] a la vez mediante sumas acumuladas.
+    Por cada serie (País[, by]) se construye una rejilla densa de años con las sumas acumuladas
+    de homicides_count, population y presencia del año: la tasa ponderada y la cobertura de
+    cualquier ventana salen de una diferencia de prefijos, en O(1) por ventana.
+
+    - start_years: por defecto todos los años desde 1990 hasta el último año con datos.
+    - end_years: por defecto solo el último año con datos.
+
+    Devuelve un DataFrame "tidy" con una fila por (ventana, País[, by]) que supera el límite,
+    ordenado por ventana y tasa (mismo criterio que calculate_ranking_country).
+    """
+
+    lf = df.lazy().filter(pl.col('Country').is_in(countries))
+
+    # 1. Columnas de agrupación (series)
+    group_cols = ['Country']
+    if by:
+        group_cols.append(by)
+
+    # 2. Ventanas a evaluar
+    data_min_year, data_max_year = lf.select(
+        pl.col('Year').min().alias('min_year'), pl.col('Year').max().alias('max_year')
+    ).collect().row(0)
+
+    if start_years is None:
+        start_years = range(1990, data_max_year + 1) if data_max_year is not None else []
+    if end_years is None:
+        end_years = [data_max_year] if data_max_year is not None else []
+
+    windows = [(int(s), int(e)) for s in start_years for e in end_years if s <= e]
+    df_windows = pl.LazyFrame(
+        windows,
+        schema={'start_year': pl.Int64, 'end_year': pl.Int64},
+        orient='row'
+    ).unique(maintain_order=True)
+
+    # Rejilla de años: cubre ventanas y datos (sin ventanas o sin datos, la salida queda vacía con su esquema)
+    grid_years = [year for window in windows for year in window]
+    grid_years += [year for year in (data_min_year, data_max_year) if year is not None]
+    grid_min_year, grid_max_year = (min(grid_years), max(grid_years)) if grid_years else (0, -1)
+
+    # 3. Valores anuales por serie (presencia del año + numerador/denominador de la tasa ponderada)
+    lf_yearly = (
+        lf
+        .group_by(group_cols + ['Year'])
+        .agg(
+            pl.lit(1, dtype=pl.Int64).alias('present'),
+            _known_population_counts().sum().alias('num'),
+            pl.col('population').sum().cast(pl.Float64).alias('den')
+        )
+    )
+
+    # 4. Rejilla densa (serie x año) + sumas acumuladas (inclusiva y exclusiva)
+    lf_years = pl.LazyFrame({'Year': pl.int_range(grid_min_year, grid_max_year + 1, eager=True)})
+
+    prefix_cols = ['present', 'num', 'den']
+    lf_prefix = (
+        lf_yearly.select(group_cols).unique()
+        .join(lf_years, how='cross')
+        .join(lf_yearly, on=group_cols + ['Year'], how='left')
+        .with_columns(pl.col(prefix_cols).fill_null(0))
+        .sort(group_cols + ['Year'])
+        .with_columns(
+            [pl.col(c).cum_sum().over(group_cols).alias(f'cum_{c}') for c in prefix_cols]
+        )
+        .with_columns(
+            [(pl.col(f'cum_{c}') - pl.col(c)).alias(f'prev_{c}') for c in prefix_cols]
+        )
+    )
+
+    lf_end = lf_prefix.select(
+        group_cols + [pl.col('Year').alias('end_year')] + [f'cum_{c}' for c in prefix_cols]
+    )
+    lf_start = lf_prefix.select(
+        group_cols + [pl.col('Year').alias('start_year')] + [f'prev_{c}' for c in prefix_cols]
+    )
+
+    # 5. Diferencia de prefijos por (ventana, serie)
+    lf_window_values = (
+        lf_end
+        .join(df_windows, on='end_year', how='inner')
+        .join(lf_start, on=group_cols + ['start_year'], how='inner')
+        .select(
+            ['start_year', 'end_year'] + group_cols + 
+            [(pl.col(f'cum_{c}') - pl.col(f'prev_{c}')).alias(c) for c in prefix_cols]
+        )
+        # Segmentos sin ningún año en la ventana no cuentan (igual que n_unique sobre filas)
+        .filter(pl.col('present') > 0)
+        .with_columns(
+            (pl.col('present') / (pl.col('end_year') - pl.col('start_year') + 1)).alias('prop')
+        )
+        .with_columns(
+            pl.col('prop').min().over(['start_year', 'end_year', 'Country']).round(2).alias('final_prop')
+        )
+    )
+
+    lf_regions_map = df.lazy().select(['Country', 'Region_2']).unique()
+
+    df_rankings = (
+        lf_window_values
+        .filter(pl.col('final_prop') >= prop_years_in_period_limit)
+        .with_columns(
+            (pl.col('num') / pl.col('den') * RATE_SCALE).round(2).alias('mean_homicides_rate'),
+            pl.format('{}-{}', 'start_year', 'end_year').alias('Periodo')
+        )
+        .select(['start_year', 'end_year', 'Periodo'] + group_cols + ['mean_homicides_rate', 'final_prop'])
+        .join(lf_regions_map, on='Country', how='left')
+        .sort(['start_year', 'end_year', 'mean_homicides_rate'] + group_cols) # Empates: orden estable por segmento
+        .collect()
+    )
+
+    return df_rankings
+
+######################################################################################################################
+
+def _log_ranking_period(countries, prop_years_in_period_limit, start_year, end_year, scores_df, by=None, report=None):
+    """
+    Logs informativos de un periodo del ranking (a partir de las proporciones calculadas).
+    Las listas y el dict por país solo se construyen si se van a usar (nivel DEBUG o report).
+    """
+    log_summary = LOGGER.isEnabledFor(logging.INFO)
+    log_detail = LOGGER.isEnabledFor(logging.DEBUG)
+    if not (log_summary or report is not None):
+        return
+
+    # Proporción por país (países sin filas en el periodo: 0.0)
+    scores_df = scores_df.filter(pl.col('Country').is_in(countries))
+    selected = set(
+        scores_df.filter(pl.col('final_prop') >= prop_years_in_period_limit)['Country'].to_list()
+    )
+    ranking_selected_countries = sorted(selected)
+
+    if log_detail or report is not None:
+        ranking_not_selected_countries = [c for c in countries if c not in selected]
+        prop_year_in_period = dict(zip(scores_df['Country'].to_list(), scores_df['final_prop'].to_list()))
+        for c in countries:
+            if c not in prop_year_in_period:
+                prop_year_in_period[c] = 0.0
+
+    if log_summary:
+        LOGGER.info('-'*100)
+        LOGGER.info(f'📊 Ranking Period: {start_year} - {end_year}')
+        if by: LOGGER.info(f'   Segmentado por: {by}')
+        LOGGER.info(f'   Países analizados: {len(countries)}')
+        LOGGER.info(f'   Países seleccionados (Data > {prop_years_in_period_limit*100}%): {len(ranking_selected_countries)}')
+        if log_detail:
+            LOGGER.debug(f'   Países descartados: {ranking_not_selected_countries}')
+            LOGGER.debug(f'   Prop. datos (años) en el periodo, por pais: {prop_year_in_period}')
+        LOGGER.info('-'*100)
+
+    if report is not None:
+        report.add(
+            'ranking_period',
+            by = by,
+            start_year = start_year,
+            end_year = end_year,
+            n_countries = len(countries),
+            selected_countries = ranking_selected_countries,
+            discarded_countries = ranking_not_selected_countries,
+            prop_years_in_period = prop_year_in_period
+        )
+
+######################################################################################################################
+
+def calculate_ranking_country(
+    df, countries, prop_years_in_period_limit, start_year, end_year, by=None, coverage_index=None, report=None
+):
+    """
+    Calcula el ranking de países (o segmentos país-sexo/edad) para un periodo dado.
+    La tasa del periodo es siempre la ponderada por población (Suma Muertos / Suma Pob) * 100k;
+    la población de los años con tasa 0 ya viene rellenada del procesado (backfill_population).
+    """
+
+    df_ranking, df_scores = calculate_ranking_periods(
+        df = df, 
+        countries = countries, 
+        prop_years_in_period_limit = prop_years_in_period_limit, 
+        periods = [(start_year, end_year)], 
+        by = by,
+        coverage_index = coverage_index
+    )
+
+    _log_ranking_period(countries, prop_years_in_period_limit, start_year, end_year, df_scores, by=by, report=report)
+
+    return df_ranking.drop(['period_idx', 'start_year', 'end_year', 'Periodo'])
+
+######################################################################################################################
+
+@profiled('process_ranking_data', context_args=('by',))
 def process_ranking_data(
     df, 
     selected_countries, 
     prop_years_in_period_limit, 
     initial_years, 
     max_year,
-    by=None # <--- NUEVO ARGUMENTO NECESARIO
+    by=None, # <--- NUEVO ARGUMENTO NECESARIO
+    coverage_index=None, # Índice de cobertura del desglose (select_coverage_index), opcional
+    report=None # AnalysisReport donde dejar los diagnósticos por periodo, opcional
 ):
     """
     Orquestador para generar rankings combinados.
     Ahora soporta agrupación dinámica ('by') para regiones.
+    Todos los periodos (initial_year - max_year) se calculan en una sola pasada.
     """
 
     df_ranking_dict = {'country': {}, 'region': {}}
-    combined_list_country = []
-    combined_list_region = []
 
     # Columnas para agrupar la región
     # Si by='Sex', agrupamos por ['Region_2', 'Sex']
@@ -359,50 +1126,60 @@ def process_ranking_data(
     if by:
         region_group_cols.append(by)
 
-    for initial_year in initial_years:
+    if not initial_years:
+        return {'country': None, 'region': None}, df_ranking_dict
 
-        print(f"🔄 Procesando ranking ({by if by else 'Total'}) para: {initial_year}-{max_year}")
-        
-        # A. Ranking País
-        df_rank = calculate_ranking_country(
+    LOGGER.info(f"🔄 Procesando ranking ({by if by else 'Total'}) para: {[f'{y}-{max_year}' for y in initial_years]}")
+
+    # A. Ranking País (todos los periodos a la vez)
+    with stage('ranking.periods', df_in=df, by=by, n_periods=len(initial_years)) as st:
+        df_rank_all, df_scores = calculate_ranking_periods(
             df = df, 
             countries = selected_countries, 
             prop_years_in_period_limit = prop_years_in_period_limit, 
-            start_year = initial_year, 
-            end_year = max_year,
-            by = by # <--- Pasamos el argumento
-        )
-        
-        df_ranking_dict['country'][initial_year] = df_rank
-        
-        label_period = f"{initial_year}-{max_year}"
-        combined_list_country.append(
-            df_rank.with_columns(pl.lit(label_period).alias("Periodo"))
+            periods = [(initial_year, max_year) for initial_year in initial_years],
+            by = by,
+            coverage_index = coverage_index
         )
+        st.set_output(df_rank_all)
 
-        # B. Ranking Región (ADAPTADO)
-        # Agregamos usando las columnas dinámicas
-        df_region_rank = (
-            df_rank
-            .group_by(region_group_cols) # <--- USO DE GRUPO DINÁMICO
+    # B. Ranking Región (ADAPTADO): un único group_by por (periodo, región[, by])
+    with stage('ranking.region_aggregation', df_in=df_rank_all, by=by) as st:
+        df_region_all = st.set_output(
+            df_rank_all
+            .group_by(['period_idx', 'Periodo'] + region_group_cols) # <--- USO DE GRUPO DINÁMICO
             .agg(pl.mean('mean_homicides_rate').round(2))
-            .sort('mean_homicides_rate', descending=False)
-        )
-        
-        df_ranking_dict['region'][initial_year] = df_region_rank
-        
-        combined_list_region.append(
-            df_region_rank.with_columns(pl.lit(label_period).alias("Periodo"))
+            .sort(['period_idx', 'mean_homicides_rate'] + region_group_cols)
         )
 
-    # Concatenación Final
+    for period_idx, initial_year in enumerate(initial_years):
+
+        with stage('ranking.period', df_in=df_rank_all, by=by, start_year=initial_year, end_year=max_year) as st:
+
+            _log_ranking_period(
+                selected_countries, prop_years_in_period_limit, initial_year, max_year, 
+                df_scores.filter(pl.col('period_idx') == period_idx), by=by, report=report
+            )
+
+            df_ranking_dict['country'][initial_year] = st.set_output(
+                df_rank_all
+                .filter(pl.col('period_idx') == period_idx)
+                .drop(['period_idx', 'start_year', 'end_year', 'Periodo'])
+            )
+            df_ranking_dict['region'][initial_year] = (
+                df_region_all
+                .filter(pl.col('period_idx') == period_idx)
+                .drop(['period_idx', 'Periodo'])
+            )
+
+    # Concatenación Final (ya ordenada por periodo y tasa)
     df_ranking_combined = {
-        'country': pl.concat(combined_list_country) if combined_list_country else None,
-        'region': pl.concat(combined_list_region) if combined_list_region else None
+        'country': df_rank_all.drop(['period_idx', 'start_year', 'end_year']).select(pl.exclude('Periodo'), 'Periodo'),
+        'region': df_region_all.drop('period_idx').select(pl.exclude('Periodo'), 'Periodo')
     }
     
-    print("✅ Rankings procesados y combinados correctamente.")
+    LOGGER.info("✅ Rankings procesados y combinados correctamente.")
     
     return df_ranking_combined, df_ranking_dict
 
-######################################################################################################################
\ No newline at end of file
+######################################################################################################################
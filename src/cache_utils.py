@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import polars as pl
+
+from src.data_utils import dataset_fingerprint, scan_processed_data, _file_fingerprint
+
+######################################################################################################################
+
+PROJECT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_PATH, 'data', 'cache', 'results')
+DEFAULT_MAX_SIZE_BYTES = 512 * 1024**2
+
+# Argumentos cuyo orden no afecta al resultado (se normalizan ordenados y sin duplicados)
+UNORDERED_ARGS = {'selected_countries', 'countries'}
+
+MANIFEST_FILE = 'manifest.json'
+
+######################################################################################################################
+
+def _frame_fingerprint(df):
+    """
+    Huella de contenido de un DataFrame/LazyFrame pasado como argumento (ej. coverage_index):
+    esquema, número de filas y suma de los hashes de fila (el hash depende de la versión de polars).
+    """
+    lf = df.lazy()
+    schema = lf.collect_schema()
+    rows, rows_hash = lf.select(
+        pl.len(),
+        pl.struct(pl.all()).hash(seed=0).sum()
+    ).collect().row(0)
+    return {
+        '__frame__': {
+            'schema': [[name, str(dtype)] for name, dtype in schema.items()],
+            'rows': rows,
+            'hash': rows_hash,
+            'polars': pl.__version__
+        }
+    }
+
+def _normalize_args(kwargs):
+    """Normaliza los argumentos de la llamada para que la clave sea estable."""
+    normalized = {}
+    for k, v in kwargs.items():
+        if k in UNORDERED_ARGS and v is not None:
+            v = sorted(set(v))
+        elif isinstance(v, (tuple, range)):
+            v = list(v)
+        elif isinstance(v, (pl.DataFrame, pl.LazyFrame)):
+            v = _frame_fingerprint(v)
+        normalized[k] = v
+    return normalized
+
+def _json_default(obj):
+    # Tablas anidadas (ej. dentro de un dict): entran por su huella de contenido
+    if isinstance(obj, (pl.DataFrame, pl.LazyFrame)):
+        return _frame_fingerprint(obj)
+    if isinstance(obj, pl.Series):
+        return obj.to_list()
+    # Escalares numpy / polars y otros tipos sencillos
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return str(obj)
+
+def _code_fingerprint(func):
+    """Huella del código fuente del módulo de func: editar el módulo invalida sus entradas."""
+    try:
+        path = inspect.getsourcefile(inspect.unwrap(func))
+    except TypeError: # Funciones built-in: sin fichero fuente
+        path = None
+    return _file_fingerprint(path) if path and os.path.exists(path) else None
+
+######################################################################################################################
+
+def _encode(obj, frames):
+    """Serializa resultados anidados (dict/tuple/list + DataFrames) a JSON + lista de frames."""
+    if isinstance(obj, pl.DataFrame):
+        frames.append(obj)
+        return {'__frame__': len(frames) - 1}
+    if isinstance(obj, dict):
+        return {'__dict__': [[_encode(k, frames), _encode(v, frames)] for k, v in obj.items()]}
+    if isinstance(obj, tuple):
+        return {'__tuple__': [_encode(v, frames) for v in obj]}
+    if isinstance(obj, list):
+        return {'__list__': [_encode(v, frames) for v in obj]}
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return obj
+
+def _decode(obj, entry_dir):
+    if isinstance(obj, dict):
+        if '__frame__' in obj:
+            return pl.read_parquet(os.path.join(entry_dir, f"frame_{obj['__frame__']}.parquet"))
+        if '__dict__' in obj:
+            return {_decode(k, entry_dir): _decode(v, entry_dir) for k, v in obj['__dict__']}
+        if '__tuple__' in obj:
+            return tuple(_decode(v, entry_dir) for v in obj['__tuple__'])
+        if '__list__' in obj:
+            return [_decode(v, entry_dir) for v in obj['__list__']]
+    return obj
+
+######################################################################################################################
+
+class ResultsCache:
+    """
+    Caché en disco (opt-in) de resultados de analysis_utils.
+
+    La clave combina la huella de contenido del dataset de entrada (CSV o Parquet) con el
+    nombre de la función, la huella del código de su módulo y sus argumentos normalizados.
+    El df de entrada y los DataFrame/LazyFrame pasados como argumento entran por su huella
+    de contenido. Cada entrada se guarda como un directorio con un manifest JSON y un
+    Parquet por DataFrame. Si el dataset cambia, las entradas antiguas de esa ruta se
+    descartan; el tamaño total se acota con expulsión LRU.
+
+    Uso:
+        cache = ResultsCache()
+        df_time_series, min_year, max_year = cache.call(
+            process_time_series_data, source=INPUT_FILE,
+            selected_countries=SELECTED_COUNTRIES, prop_years_in_period_limit=0.65, by='Sex'
+        )
+        # Resultados derivados: 'df_key' describe cómo se obtuvo el df de entrada
+        df_ranking_combined, df_ranking_dict = cache.call(
+            process_ranking_data, source=INPUT_FILE, df=df_time_series['country'],
+            df_key={'time_series': {'by': 'Sex'}}, ...
+        )
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_bytes=DEFAULT_MAX_SIZE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # Claves y entradas
+    # -------------------------------------------------------------------------
+
+    def make_key(self, func, source_fingerprint, df_key=None, code_fingerprint=None, df_fingerprint=None, **kwargs):
+        func_name = func if isinstance(func, str) else f"{func.__module__}.{func.__qualname__}"
+        if code_fingerprint is None and not isinstance(func, str):
+            code_fingerprint = _code_fingerprint(func)
+        payload = {
+            'func': func_name,
+            'code': code_fingerprint,
+            'source': source_fingerprint,
+            'df_key': df_key,
+            'df': df_fingerprint,
+            'args': _normalize_args(kwargs)
+        }
+        raw = json.dumps(payload, sort_keys=True, default=_json_default)
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _entries(self):
+        """Lista de (key, manifest) de todas las entradas completas."""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            manifest_path = os.path.join(self._entry_dir(key), MANIFEST_FILE)
+            if os.path.isfile(manifest_path):
+                with open(manifest_path) as f:
+                    entries.append((key, json.load(f)))
+        return entries
+
+    def get(self, key):
+        entry_dir = self._entry_dir(key)
+        manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+        if not os.path.isfile(manifest_path):
+            return None, False
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        # LRU: el mtime del manifest marca el último acceso
+        os.utime(manifest_path)
+
+        return _decode(manifest['result'], entry_dir), True
+
+    def put(self, key, result, metadata=None):
+        frames = []
+        encoded = _encode(result, frames)
+
+        # Escritura atómica: directorio temporal + rename
+        tmp_dir = self._entry_dir(f".tmp_{key}_{os.getpid()}")
+        os.makedirs(tmp_dir, exist_ok=True)
+        size = 0
+        for i, frame in enumerate(frames):
+            frame_path = os.path.join(tmp_dir, f"frame_{i}.parquet")
+            frame.write_parquet(frame_path)
+            size += os.path.getsize(frame_path)
+
+        manifest = dict(metadata or {}, result=encoded, size_bytes=size, created_at=time.time())
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, default=_json_default)
+
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.replace(tmp_dir, entry_dir)
+
+        self._evict()
+
+    def invalidate(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def clear(self):
+        for key in os.listdir(self.cache_dir):
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    # -------------------------------------------------------------------------
+    # Invalidación y expulsión
+    # -------------------------------------------------------------------------
+
+    def _drop_stale(self, source_path, source_fingerprint):
+        """Elimina entradas calculadas sobre una versión anterior del mismo dataset."""
+        for key, manifest in self._entries():
+            if manifest.get('source_path') == source_path and manifest.get('source_fingerprint') != source_fingerprint:
+                self.invalidate(key)
+
+    def apply_change_manifest(self, manifest_path):
+        """
+        Invalidación selectiva tras un procesado incremental (ver el manifest de cambios del
+        script de procesado). Las entradas calculadas sobre la versión anterior del dataset
+        cuyos países no se ven afectados se re-indexan con la huella nueva (siguen siendo
+        válidas: los resultados solo dependen de las filas de sus países); el resto se elimina.
+        Devuelve (entradas conservadas, entradas invalidadas).
+        """
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        # Un procesado completo no trae lista de países afectados: se invalida todo
+        affected = manifest.get('affected_countries')
+        affected = set(affected) if affected is not None else None
+
+        kept, invalidated = 0, 0
+        for source_path, new_fingerprint in manifest.get('fingerprints', {}).items():
+            old_fingerprint = manifest.get('previous_fingerprints', {}).get(source_path)
+            if old_fingerprint is None or old_fingerprint == new_fingerprint:
+                continue
+
+            for key, entry in self._entries():
+                if entry.get('source_path') != source_path or entry.get('source_fingerprint') != old_fingerprint:
+                    continue
+
+                args = entry.get('args', {})
+                countries = args.get('selected_countries', args.get('countries'))
+
+                if affected is None or countries is None or affected & set(countries):
+                    self.invalidate(key)
+                    invalidated += 1
+                    continue
+
+                new_key = self.make_key(
+                    entry['func'], new_fingerprint, df_key=entry.get('df_key'),
+                    code_fingerprint=entry.get('code_fingerprint'), df_fingerprint=entry.get('df_fingerprint'), **args
+                )
+                entry['source_fingerprint'] = new_fingerprint
+                with open(os.path.join(self._entry_dir(key), MANIFEST_FILE), 'w') as f:
+                    json.dump(entry, f, default=_json_default)
+
+                if os.path.exists(self._entry_dir(new_key)):
+                    self.invalidate(key)
+                else:
+                    os.replace(self._entry_dir(key), self._entry_dir(new_key))
+                kept += 1
+
+        return kept, invalidated
+
+    def _evict(self):
+        """Expulsión LRU hasta que el tamaño total quede por debajo de max_size_bytes."""
+        entries = []
+        for key, manifest in self._entries():
+            last_access = os.path.getmtime(os.path.join(self._entry_dir(key), MANIFEST_FILE))
+            entries.append((last_access, key, manifest.get('size_bytes', 0)))
+
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            self.invalidate(key)
+            total -= size
+
+    # -------------------------------------------------------------------------
+    # API principal
+    # -------------------------------------------------------------------------
+
+    def call(self, func, source, df=None, df_key=None, **kwargs):
+        """
+        Devuelve func(df, **kwargs) desde la caché si existe; si no, lo calcula y lo guarda.
+        - source: ruta del dataset procesado (CSV o directorio Parquet) que define la huella.
+        - df: datos de entrada; si es None solo se leen (lazy) en caso de fallo de caché.
+          Si se pasa, su huella de contenido entra en la clave (dos df distintos no colisionan).
+        - df_key: descripción JSON de cómo se derivó df cuando no es el dataset tal cual.
+        """
+        source_path = os.path.abspath(source)
+        source_fingerprint = dataset_fingerprint(source_path)
+        self._drop_stale(source_path, source_fingerprint)
+
+        code_fingerprint = _code_fingerprint(func)
+        df_fingerprint = _frame_fingerprint(df) if df is not None else None
+        key = self.make_key(
+            func, source_fingerprint, df_key=df_key,
+            code_fingerprint=code_fingerprint, df_fingerprint=df_fingerprint, **kwargs
+        )
+        result, hit = self.get(key)
+        if hit:
+            return result
+
+        if df is None:
+            df = scan_processed_data(source_path)
+
+        result = func(df, **kwargs)
+
+        self.put(key, result, metadata={
+            'func': f"{func.__module__}.{func.__qualname__}",
+            'code_fingerprint': code_fingerprint,
+            'df_fingerprint': df_fingerprint,
+            'source_path': source_path,
+            'source_fingerprint': source_fingerprint,
+            'df_key': df_key,
+            'args': _normalize_args(kwargs)
+        })
+
+        return result
+
+######################################################################################################################
@@ -0,0 +1,147 @@
+import os
+import shutil
+import hashlib
+import functools
+from urllib.parse import quote
+
+import polars as pl
+
+######################################################################################################################
+
+# Columnas de texto con cardinalidad baja: se guardan como Categorical en el dataset columnar
+CATEGORICAL_COLS = ['Country', 'Region', 'Subregion', 'Dimension', 'Category', 'Sex', 'Age', 'Region_2']
+
+# Orden físico del dataset (permite a Parquet generar estadísticas min/max útiles por row group)
+SORT_COLS = ['Country', 'Year']
+
+PARTITION_COL = 'Dimension'
+
+# Memo en proceso de las huellas ya calculadas: (ruta, tamaño, mtime) -> hash
+_FINGERPRINT_MEMO = {}
+
+######################################################################################################################
+
+def write_processed_dataset(df, output_path, partition_by=PARTITION_COL):
+    """
+    Escribe el dataset procesado como Parquet particionado (estilo Hive) por 'Dimension',
+    ordenado por País/Año, con estadísticas y columnas categóricas tipadas (Enum o Categorical).
+    """
+    # Las columnas ya codificadas (pl.Enum) se conservan tal cual; el texto libre pasa a Categorical
+    df_out = (
+        df
+        .with_columns(
+            pl.col(c).cast(pl.Categorical) for c in CATEGORICAL_COLS 
+            if c in df.columns and df.schema[c] == pl.String
+        )
+        .sort(SORT_COLS, maintain_order=True)
+    )
+
+    # Sobrescribimos el dataset completo para no dejar particiones obsoletas
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+
+    df_out.write_parquet(
+        output_path,
+        partition_by=partition_by,
+        statistics=True
+    )
+
+    return output_path
+
+def _hive_part_path(partition_by, part, args):
+    # Misma codificación de la clave que write_parquet(partition_by=...) (ej. 'by%20mechanisms')
+    value = quote(str(args.partition_keys.item()), safe='')
+    return f"{partition_by}={value}/part-{part:05d}-{args.index_in_partition:05d}.parquet"
+
+def sink_processed_dataset(lfs, output_path, partition_by=PARTITION_COL):
+    """
+    Versión en streaming de write_processed_dataset (modo out-of-core del script de procesado).
+    Recibe trozos (LazyFrames) con países disjuntos y en orden; cada trozo se ordena y se escribe
+    con sink_parquet en sus propios ficheros de cada partición (part-00000-..., part-00001-...),
+    así que el dataset leído en orden es el mismo que el de write_processed_dataset y en
+    memoria solo hay un trozo a la vez.
+    """
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)
+
+    for part, lf in enumerate(lfs):
+        schema = lf.collect_schema()
+        (
+            lf
+            .with_columns(
+                pl.col(c).cast(pl.Categorical) for c in CATEGORICAL_COLS
+                if c in schema and schema[c] == pl.String
+            )
+            .sort(SORT_COLS, maintain_order=True)
+            .sink_parquet(
+                pl.PartitionBy(
+                    output_path, key=partition_by,
+                    file_path_provider=functools.partial(_hive_part_path, partition_by, part)
+                ),
+                statistics=True,
+                mkdir=True
+            )
+        )
+
+    return output_path
+
+######################################################################################################################
+
+def scan_processed_data(path):
+    """
+    Devuelve un pl.LazyFrame sobre el dataset procesado.
+    - Directorio: dataset Parquet particionado (los filtros por 'Dimension' podan particiones).
+    - .parquet / .ipc / .arrow: fichero columnar único.
+    - .csv: compatibilidad con el formato antiguo.
+    """
+    if os.path.isdir(path):
+        return pl.scan_parquet(path, hive_partitioning=True)
+
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == '.parquet':
+        return pl.scan_parquet(path)
+    elif ext in ('.ipc', '.arrow', '.feather'):
+        return pl.scan_ipc(path)
+    elif ext == '.csv':
+        return pl.scan_csv(path)
+    else:
+        raise ValueError(f"Formato no soportado para el dataset procesado: {path}")
+
+######################################################################################################################
+
+def _file_fingerprint(path, chunk_size=1 << 20):
+    """Hash del contenido de un fichero (memoizado mientras tamaño y mtime no cambien)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    if memo_key not in _FINGERPRINT_MEMO:
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+        _FINGERPRINT_MEMO[memo_key] = hasher.hexdigest()
+
+    return _FINGERPRINT_MEMO[memo_key]
+
+######################################################################################################################
+
+def dataset_fingerprint(path):
+    """
+    Huella de contenido de un dataset: un fichero (CSV/Parquet) o un directorio
+    (dataset particionado: se combinan las huellas de todos sus ficheros y rutas relativas).
+    """
+    if not os.path.isdir(path):
+        return _file_fingerprint(path)
+
+    hasher = hashlib.blake2b(digest_size=16)
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            hasher.update(os.path.relpath(file_path, path).encode())
+            hasher.update(_file_fingerprint(file_path).encode())
+
+    return hasher.hexdigest()
+
+######################################################################################################################
@@ -0,0 +1,178 @@
+import os
+import re
+import html
+import importlib.util
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from src.profiling_utils import stage
+
+######################################################################################################################
+
+# Formatos de imagen estática (requieren el paquete opcional 'kaleido')
+STATIC_FORMATS = {'png', 'jpg', 'jpeg', 'webp', 'svg', 'pdf'}
+SUPPORTED_FORMATS = {'html', 'json'} | STATIC_FORMATS
+
+BUNDLE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script type="text/javascript">{plotlyjs}</script>
+<style>
+body {{ font-family: sans-serif; margin: 0 auto; max-width: 1400px; padding: 1em; }}
+nav a {{ margin-right: 1em; }}
+section {{ margin-bottom: 3em; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<nav>{toc}</nav>
+{sections}
+</body>
+</html>
+"""
+
+######################################################################################################################
+
+def unique_figure_names(names):
+    """
+    Nombres de fichero seguros y sin colisiones (también sin distinguir mayúsculas, por los
+    sistemas de ficheros que no lo hacen): los repetidos reciben un sufijo _2, _3...
+    """
+    used, unique = set(), []
+    for name in names:
+        # 'grafico.html' -> 'grafico' (la extensión la pone cada formato)
+        stem, ext = os.path.splitext(str(name))
+        if ext.lower().lstrip('.') not in SUPPORTED_FORMATS:
+            stem = str(name)
+        base = re.sub(r'[^\w\-]+', '_', stem).strip('_') or 'figure'
+        candidate, i = base, 1
+        while candidate.lower() in used:
+            i += 1
+            candidate = f"{base}_{i}"
+        used.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+def _build_figure(spec):
+    """Figura de un spec: ya construida ('figure') o generada con plots_utils ('plot' + 'kwargs')."""
+    if spec.get('figure') is not None:
+        return spec['figure']
+
+    from src import plots_utils
+    plot = spec['plot']
+    plot_func = getattr(plots_utils, plot) if isinstance(plot, str) else plot
+    kwargs = dict(spec.get('kwargs', {}), plot_save_path=None, show=False, return_fig=True)
+    return plot_func(**kwargs)
+
+def _export_one(spec, file_name, output_dir, formats, bundle, include_plotlyjs):
+    """Trabajo de un worker: construye la figura y escribe sus formatos (y su fragmento del bundle)."""
+    fig = _build_figure(spec)
+
+    paths = {}
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{file_name}.{fmt}")
+        if fmt == 'html':
+            pio.write_html(fig, path, include_plotlyjs=include_plotlyjs, full_html=True)
+        elif fmt == 'json':
+            pio.write_json(fig, path)
+        else:
+            pio.write_image(fig, path, format=fmt)
+        paths[fmt] = path
+
+    # Fragmento sin plotly.js: el bundle lo incrusta una sola vez
+    div = pio.to_html(fig, full_html=False, include_plotlyjs=False, div_id=file_name) if bundle else None
+
+    return paths, div
+
+######################################################################################################################
+
+def export_figures(
+    specs,
+    output_dir,
+    formats=('html',),
+    bundle_path=None,
+    bundle_title='Informe',
+    executor='thread',
+    max_workers=None,
+    include_plotlyjs='cdn'
+):
+    """
+    Exporta muchas figuras en paralelo.
+    - specs: lista de dicts {'name': ..., 'figure': fig} o {'name': ..., 'plot': 'barplot', 'kwargs': {...}}
+      ('plot' es el nombre de una función de plots_utils o cualquier callable que acepte
+      plot_save_path / show / return_fig; la figura se construye dentro del worker).
+    - formats: cualquier combinación de 'html' (un fichero por figura, plotly.js por CDN),
+      'json' y formatos estáticos ('png', 'svg', 'pdf'...; requieren kaleido).
+    - bundle_path: si se indica, un único HTML autocontenido (plotly.js incrustado una vez,
+      funciona sin conexión) con todas las figuras en el orden de specs.
+    - executor: 'thread' (por defecto; las figuras ya construidas no se copian) o 'process'
+      (specs y figuras se serializan con pickle; compensa con figuras grandes o imágenes;
+      en scripts, la llamada debe ir bajo if __name__ == '__main__').
+
+    Los nombres de fichero se derivan de 'name' y nunca colisionan (ver unique_figure_names).
+    Devuelve ({nombre de fichero: {formato: ruta}}, ruta del bundle o None).
+    """
+    formats = list(dict.fromkeys(f.lower().lstrip('.') for f in formats))
+    unsupported = set(formats) - SUPPORTED_FORMATS
+    if unsupported:
+        raise ValueError(f"Formatos no soportados: {sorted(unsupported)} (disponibles: {sorted(SUPPORTED_FORMATS)})")
+    if STATIC_FORMATS & set(formats) and importlib.util.find_spec('kaleido') is None:
+        raise ImportError("La exportación a imagen estática requiere 'kaleido' (pip install kaleido)")
+
+    if executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    elif executor == 'process':
+        # 'spawn': hacer fork de un proceso con el pool de hilos de Polars activo puede bloquearse
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context('spawn'))
+    else:
+        raise ValueError(f"executor debe ser 'thread' o 'process', no '{executor}'")
+
+    file_names = unique_figure_names([spec.get('name', 'figure') for spec in specs])
+    os.makedirs(output_dir, exist_ok=True)
+
+    with stage('export.figures', n_figures=len(specs), formats=formats, executor=executor) as st:
+        with pool:
+            futures = [
+                pool.submit(
+                    _export_one, spec, file_name, output_dir, formats,
+                    bundle_path is not None, include_plotlyjs
+                )
+                for spec, file_name in zip(specs, file_names)
+            ]
+            results = [future.result() for future in futures]
+
+        exported = {file_name: paths for file_name, (paths, _) in zip(file_names, results)}
+        st.set_output(total_bytes=sum(os.path.getsize(p) for paths in exported.values() for p in paths.values()))
+
+        if bundle_path is not None:
+            write_bundle(
+                bundle_path,
+                [(spec.get('name', file_name), file_name, div) for spec, file_name, (_, div) in zip(specs, file_names, results)],
+                title=bundle_title
+            )
+            st.set_output(bundle_bytes=os.path.getsize(bundle_path))
+
+    return exported, bundle_path
+
+def write_bundle(bundle_path, sections, title='Informe'):
+    """HTML autocontenido: plotly.js una sola vez + una sección por (título, id, div de la figura)."""
+    toc = ''.join(f'<a href="#section_{anchor}">{html.escape(str(name))}</a>' for name, anchor, _ in sections)
+    body = '\n'.join(
+        f'<section id="section_{anchor}"><h2>{html.escape(str(name))}</h2>\n{div}\n</section>'
+        for name, anchor, div in sections
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(bundle_path)), exist_ok=True)
+    with open(bundle_path, 'w', encoding='utf-8') as f:
+        f.write(BUNDLE_TEMPLATE.format(
+            title=html.escape(title), plotlyjs=get_plotlyjs(), toc=toc, sections=body
+        ))
+
+    return bundle_path
+
+######################################################################################################################
@@ -1,10 +1,154 @@
-import plotly.express as px
-from plotly.subplots import make_subplots
+import os
+import re
+import json
+import math
 import polars as pl
-import numpy as np  
+
+from src.analysis_utils import LOGGER
+from src.profiling_utils import stage, profiled
+
+# Plotly y numpy se importan dentro de cada función (al primer uso): importar este módulo
+# no paga su coste, p. ej. en procesos que solo calculan rankings o series.
+
+# Referencias a customdata en los hovertemplates: %{customdata[i]} o %{customdata[i]:formato}
+CUSTOMDATA_REF = re.compile(r'%\{customdata\[(\d+)\](:[^}]*)?\}')
+
+HIDDEN_TRACES_SCRIPT = """
+(function() {
+    var gd = document.getElementById('{plot_id}');
+    var loaded = false;
+    // Las trazas ocultas (legendonly) se cargan del fichero auxiliar al primer clic en la leyenda
+    function loadHiddenTraces() {
+        if (loaded) { return; }
+        loaded = true;
+        var script = document.createElement('script');
+        script.src = __SRC__;
+        script.onload = function() {
+            var hidden = window.__plotlyHiddenTraces[__KEY__];
+            Plotly.restyle(gd, hidden.data, hidden.indices);
+        };
+        document.head.appendChild(script);
+    }
+    gd.on('plotly_legendclick', loadHiddenTraces);
+    gd.on('plotly_legenddoubleclick', loadHiddenTraces);
+})();
+"""
+
+#################################################################################################################
+
+def _compact_array(values, decimals):
+    """Floats redondeados en float32 y enteros en el tipo más pequeño posible (arrays binarios más cortos)."""
+    import numpy as np
+    
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'f':
+        return np.round(arr, decimals).astype(np.float32)
+    if arr.dtype.kind in 'iu' and arr.size:
+        return arr.astype(np.result_type(np.min_scalar_type(arr.min()), np.min_scalar_type(arr.max())))
+    return arr
+
+def _compact_customdata(trace, decimals):
+    """
+    Deduplica customdata: las columnas constantes en la traza (ej. País, Región) se escriben
+    como texto en su hovertemplate y las no referenciadas se eliminan; el resto se re-indexa.
+    """
+    import numpy as np
+    
+    if trace.customdata is None:
+        return
+
+    template = trace.hovertemplate
+    if not template:
+        # Sin hovertemplate Plotly no muestra customdata
+        trace.customdata = None
+        return
+
+    data = np.asarray(trace.customdata, dtype=object)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+
+    referenced = {int(m.group(1)): bool(m.group(2)) for m in CUSTOMDATA_REF.finditer(template)}
+    constants = {
+        i: data[0, i] for i, has_format in referenced.items()
+        if not has_format and i < data.shape[1] and (data[:, i] == data[0, i]).all()
+    }
+    keep = [i for i in sorted(referenced) if i not in constants and i < data.shape[1]]
+    new_index = {old: new for new, old in enumerate(keep)}
+
+    def replace(match):
+        i = int(match.group(1))
+        if i in constants:
+            return str(constants[i])
+        return f"%{{customdata[{new_index[i]}]{match.group(2) or ''}}}"
+
+    trace.hovertemplate = CUSTOMDATA_REF.sub(replace, template)
+
+    if not keep:
+        trace.customdata = None
+        return
+
+    kept = data[:, keep]
+    try:
+        trace.customdata = _compact_array(kept.astype(np.float64), decimals)
+    except (TypeError, ValueError):
+        trace.customdata = kept
+
+def _compact_traces(fig, decimals):
+    for trace in fig.data:
+        for attr in ('x', 'y'):
+            if trace[attr] is not None:
+                trace[attr] = _compact_array(trace[attr], decimals)
+        _compact_customdata(trace, decimals)
+
+def _to_list(values, decimals):
+    import numpy as np
+    
+    if values is None:
+        return None
+    arr = np.asarray(values)
+    if arr.dtype.kind == 'f':
+        arr = np.round(arr.astype(np.float64), decimals)
+    return arr.tolist()
+
+def _write_html_lazy_hidden(fig, plot_save_path, decimals):
+    """
+    Escribe el HTML sin los datos de las trazas ocultas (legendonly): x / y / customdata van a
+    un fichero auxiliar '<nombre>_hidden.js' (JSON asignado a una variable global, así también
+    se carga abriendo el HTML como fichero local) que se pide al primer clic en la leyenda.
+    Devuelve la ruta del fichero auxiliar (None si no hay trazas ocultas).
+    """
+    import plotly.graph_objects as go
+    
+    hidden = [i for i, trace in enumerate(fig.data) if trace.visible == 'legendonly']
+    if not hidden:
+        fig.write_html(plot_save_path, include_plotlyjs='cdn', full_html=True)
+        return None
+
+    fig_out = go.Figure(fig)
+    payload = {'indices': hidden, 'data': {'x': [], 'y': [], 'customdata': []}}
+    for i in hidden:
+        trace = fig_out.data[i]
+        for attr in ('x', 'y', 'customdata'):
+            payload['data'][attr].append(_to_list(trace[attr], decimals))
+        trace.update(x=[], y=[], customdata=None)
+
+    key = os.path.splitext(os.path.basename(plot_save_path))[0]
+    side_path = os.path.join(os.path.dirname(plot_save_path), f"{key}_hidden.js")
+    with open(side_path, 'w', encoding='utf-8') as f:
+        f.write("window.__plotlyHiddenTraces = window.__plotlyHiddenTraces || {};\n")
+        f.write(f"window.__plotlyHiddenTraces[{json.dumps(key)}] = {json.dumps(payload, separators=(',', ':'))};\n")
+
+    post_script = (
+        HIDDEN_TRACES_SCRIPT
+        .replace('__SRC__', json.dumps(os.path.basename(side_path)))
+        .replace('__KEY__', json.dumps(key))
+    )
+    fig_out.write_html(plot_save_path, include_plotlyjs='cdn', full_html=True, post_script=post_script)
+    return side_path
 
 #################################################################################################################
 
+@profiled('time_series_plot')
 def time_series_plot(
         df, x, y, height=600, title=None, line_group=None, color=None, 
         line_dash=None, facet_col=None, facet_row=None,  facet_col_wrap=None,    
@@ -13,79 +157,135 @@ def time_series_plot(
         hovertemplate=None, title_size=20, x_ticks_size=14, x_title_size=16, 
         y_ticks_size=14, y_title_size=16, legend_size=14, legend_title_size=16,
         plot_save_path=None, show=True,
-        default_visible_name=None 
+        default_visible_name=None, return_fig=False,
+        compact=False, decimals=3, webgl_threshold=None, lazy_hidden_traces=False
     ):
+    """
+    Modo de tamaño reducido del HTML (para muchos países x años x desgloses):
+    - compact: datos en float32 redondeados a 'decimals' y customdata deduplicado por traza.
+    - webgl_threshold: con más puntos que este umbral se usa Scattergl (render WebGL).
+    - lazy_hidden_traces: los datos de las trazas ocultas por defecto (ver default_visible_name)
+      se guardan en un fichero auxiliar junto al HTML y se cargan al usar la leyenda.
+    """
 
-    # Crear el gráfico de líneas
-    fig = px.line(
-        df, x=x, y=y, color=color, line_group=line_group,
-        line_dash=line_dash, facet_col=facet_col, 
-        facet_row=facet_row, facet_col_wrap=facet_col_wrap,
-        hover_name=hover_name, title=title, hover_data=hover_data, 
-        markers=True, category_orders=category_orders, 
-        color_discrete_map=color_discrete_map, labels=labels
-    )
+    import plotly.express as px
+
+    with stage('time_series_plot.figure_build', df_in=df) as st:
+        use_webgl = webgl_threshold is not None and df.height > webgl_threshold
 
-    fig.update_traces(hovertemplate=hovertemplate)
+        # Crear el gráfico de líneas
+        fig = px.line(
+            df, x=x, y=y, color=color, line_group=line_group,
+            line_dash=line_dash, facet_col=facet_col, 
+            facet_row=facet_row, facet_col_wrap=facet_col_wrap,
+            hover_name=hover_name, title=title, hover_data=hover_data, 
+            markers=True, category_orders=category_orders, 
+            color_discrete_map=color_discrete_map, labels=labels,
+            render_mode='webgl' if use_webgl else 'auto'
+        )
+
+        fig.update_traces(hovertemplate=hovertemplate)
 
-    # --- CAMBIO CLAVE: APLICAR ESTILOS A TODOS LOS EJES ---
-    # Usamos update_xaxes y update_yaxes para asegurar que la config 
-    # se aplique a TODOS los subplots (izquierda y derecha)
+        if compact:
+            _compact_traces(fig, decimals)
+
+        # --- CAMBIO CLAVE: APLICAR ESTILOS A TODOS LOS EJES ---
+        # Usamos update_xaxes y update_yaxes para asegurar que la config 
+        # se aplique a TODOS los subplots (izquierda y derecha)
     
-    fig.update_xaxes(
-        showgrid=False,
-        tickfont=dict(size=x_ticks_size), 
-        title_font=dict(size=x_title_size)
-    )
+        fig.update_xaxes(
+            showgrid=False,
+            tickfont=dict(size=x_ticks_size), 
+            title_font=dict(size=x_title_size)
+        )
 
-    fig.update_yaxes(
-        showgrid=True,             # <--- Esto ahora activará la grid en AMBOS lados
-        gridcolor='lightgray',
-        tickfont=dict(size=y_ticks_size), 
-        title_font=dict(size=y_title_size)
-    )
-    # ------------------------------------------------------
-
-    # Lógica de ejes independientes (facet)
-    if facet_col or facet_row:
-        fig.update_yaxes(matches=None) 
-        fig.for_each_yaxis(lambda yaxis: yaxis.update(showticklabels=True))
-
-    # Lógica de visibilidad por defecto
-    if default_visible_name:
-            # 1. Si el usuario pasa un solo string ("Spain"), lo convertimos a lista ["Spain"]
-            #    Si ya es una lista, la dejamos tal cual.
-            names_to_show = [default_visible_name] if isinstance(default_visible_name, str) else default_visible_name
+        fig.update_yaxes(
+            showgrid=True,             # <--- Esto ahora activará la grid en AMBOS lados
+            gridcolor='lightgray',
+            tickfont=dict(size=y_ticks_size), 
+            title_font=dict(size=y_title_size)
+        )
+        # ------------------------------------------------------
+
+        # Lógica de ejes independientes (facet)
+        if facet_col or facet_row:
+            fig.update_yaxes(matches=None) 
+            fig.for_each_yaxis(lambda yaxis: yaxis.update(showticklabels=True))
+
+        # Lógica de visibilidad por defecto
+        if default_visible_name:
+                # 1. Si el usuario pasa un solo string ("Spain"), lo convertimos a lista ["Spain"]
+                #    Si ya es una lista, la dejamos tal cual.
+                names_to_show = [default_visible_name] if isinstance(default_visible_name, str) else default_visible_name
             
-            # 2. Verificamos si el nombre de la traza NO está en esa lista
-            fig.for_each_trace(lambda trace: trace.update(visible="legendonly") 
-                            if trace.name not in names_to_show else None)
-
-    # Layout general (Fondo, Título, Leyenda)
-    fig.update_layout(
-        plot_bgcolor='white', 
-        height=height,  
-        title=dict(text=f"<b>{title}</b>" if title else None, font=dict(size=title_size), x=0.5, xanchor='center'),
-        legend=dict(font=dict(size=legend_size), title_font=dict(size=legend_title_size))
-    )
+                # 2. Verificamos si el nombre de la traza NO está en esa lista
+                fig.for_each_trace(lambda trace: trace.update(visible="legendonly") 
+                                if trace.name not in names_to_show else None)
+
+        # Layout general (Fondo, Título, Leyenda)
+        fig.update_layout(
+            plot_bgcolor='white', 
+            height=height,  
+            title=dict(text=f"<b>{title}</b>" if title else None, font=dict(size=title_size), x=0.5, xanchor='center'),
+            legend=dict(font=dict(size=legend_size), title_font=dict(size=legend_title_size))
+        )
     
-    # Limpiar títulos de los facets
-    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+        # Limpiar títulos de los facets
+        fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+
+        st.set_output(n_traces=len(fig.data))
     
     if plot_save_path:
-        fig.write_html(plot_save_path, include_plotlyjs='cdn', full_html=True)
+        with stage('time_series_plot.html_write') as st:
+            if lazy_hidden_traces:
+                side_path = _write_html_lazy_hidden(fig, plot_save_path, decimals)
+            else:
+                side_path = None
+                fig.write_html(plot_save_path, include_plotlyjs='cdn', full_html=True)
+
+            html_bytes = os.path.getsize(plot_save_path)
+            side_bytes = os.path.getsize(side_path) if side_path else 0
+            st.set_output(html_bytes=html_bytes, hidden_traces_bytes=side_bytes)
+            LOGGER.info(
+                f"💾 {plot_save_path}: {html_bytes / 1024:.0f} KB"
+                + (f" (+ {side_bytes / 1024:.0f} KB de trazas ocultas)" if side_path else "")
+            )
     
     if show:
         fig.show()
 
+    if return_fig:
+        return fig
+
 #################################################################################################################
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import polars as pl
-import math
-import numpy as np 
 
+def _discrete_color_map(values, color_discrete_map=None):
+    """Color por valor: el del mapa si existe; si no, la secuencia del template por orden (como px)."""
+    import plotly.express as px
+    import plotly.io as pio
+    
+    sequence = (
+        px.defaults.color_discrete_sequence
+        or pio.templates[pio.templates.default].layout.colorway
+        or px.colors.qualitative.D3
+    )
+    mapping = dict(color_discrete_map or {})
+    for val in values:
+        if val not in mapping:
+            mapping[val] = sequence[len(mapping) % len(sequence)]
+    return mapping
+
+def _hover_custom_columns(hover_data, x, y):
+    """Columnas de customdata en el orden de hover_data (sin x/y ni duplicados), como px."""
+    if not hover_data:
+        return []
+    cols = []
+    for c in hover_data:
+        if c not in (x, y) and c not in cols:
+            cols.append(c)
+    return cols
+
+@profiled('barplot')
 def barplot(
     df, x, y, 
     # --- Datos y Facets ---
@@ -122,231 +322,251 @@ def barplot(
     
     # --- Espaciado ---
     horizontal_spacing=0.15,
-    vertical_spacing=0.1
+    vertical_spacing=0.1,
+
+    # --- Exportación por lotes (ver export_utils) ---
+    return_fig=False
     ):
 
-    # 1. Configuración base del Layout
-    layout_args = dict(
-        plot_bgcolor='white',      
-        title=dict(
-            text=f"<b>{title}</b>" if title else None, 
-            font=dict(size=title_size), x=0.5, xanchor='center'
-        ),
-        legend=dict(
-            font=dict(size=legend_size), 
-            title_font=dict(size=legend_title_size)
-        ),
-        height=height,
-        barmode=barmode 
-    )
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    with stage('barplot.figure_build', df_in=df, facets=bool(facet_col)) as st:
+        # 1. Configuración base del Layout
+        layout_args = dict(
+            plot_bgcolor='white',      
+            title=dict(
+                text=f"<b>{title}</b>" if title else None, 
+                font=dict(size=title_size), x=0.5, xanchor='center'
+            ),
+            legend=dict(
+                font=dict(size=legend_size), 
+                title_font=dict(size=legend_title_size)
+            ),
+            height=height,
+            barmode=barmode 
+        )
     
-    sort_descending = True if reverse_y_order else False
+        sort_descending = True if reverse_y_order else False
 
-    # =========================================================================
-    # RAMA A: GRÁFICO SIMPLE (SIN FACETS)
-    # =========================================================================
-    if not facet_col:
-        tick_vals, tick_text = None, None
+        # =========================================================================
+        # RAMA A: GRÁFICO SIMPLE (SIN FACETS)
+        # =========================================================================
+        if not facet_col:
+            tick_vals, tick_text = None, None
         
-        if yticks_color_column and yticks_color_map:
-            stats_df = (
-                df.group_by(y)
-                .agg([
-                    pl.col(x).sum().alias("total_metric"),       
-                    pl.col(yticks_color_column).first().alias("region_name") 
-                ])
-                .sort("total_metric", descending=sort_descending) 
-            )
-            ordered_items = stats_df[y].to_list()
-            ordered_regions = stats_df["region_name"].to_list()
+            if yticks_color_column and yticks_color_map:
+                stats_df = (
+                    df.group_by(y)
+                    .agg([
+                        pl.col(x).sum().alias("total_metric"),       
+                        pl.col(yticks_color_column).first().alias("region_name") 
+                    ])
+                    .sort("total_metric", descending=sort_descending) 
+                )
+                ordered_items = stats_df[y].to_list()
+                ordered_regions = stats_df["region_name"].to_list()
             
-            df_sorted = df.sort(x, descending=sort_descending)
+                df_sorted = df.sort(x, descending=sort_descending)
             
-            try:
-                tick_text = [
-                    f"<span style='color:{yticks_color_map[r]}; font-weight:bold'>{c}</span>"
-                    for c, r in zip(ordered_items, ordered_regions)
-                ]
-                tick_vals = ordered_items
-            except KeyError:
-                tick_vals = ordered_items
-                tick_text = ordered_items
-        else:
-            # Si no hay colores, ordenamos por la métrica
-            order_df = df.group_by(y).agg(pl.col(x).sum().alias('sum_x')).sort('sum_x', descending=sort_descending)
-            tick_vals = order_df[y].to_list()
-            df_sorted = df 
-
-        cat_orders = {y: tick_vals} if tick_vals else None
-
-        fig = px.bar(
-            df_sorted, x=x, y=y, orientation=orientation, color=color,
-            barmode=barmode, title=title, hover_data=hover_data,
-            color_discrete_map=color_discrete_map,
-            labels=labels,
-            category_orders=cat_orders 
-        )
+                try:
+                    tick_text = [
+                        f"<span style='color:{yticks_color_map[r]}; font-weight:bold'>{c}</span>"
+                        for c, r in zip(ordered_items, ordered_regions)
+                    ]
+                    tick_vals = ordered_items
+                except KeyError:
+                    tick_vals = ordered_items
+                    tick_text = ordered_items
+            else:
+                # Si no hay colores, ordenamos por la métrica
+                order_df = df.group_by(y).agg(pl.col(x).sum().alias('sum_x')).sort('sum_x', descending=sort_descending)
+                tick_vals = order_df[y].to_list()
+                df_sorted = df 
+
+            cat_orders = {y: tick_vals} if tick_vals else None
+
+            fig = px.bar(
+                df_sorted, x=x, y=y, orientation=orientation, color=color,
+                barmode=barmode, title=title, hover_data=hover_data,
+                color_discrete_map=color_discrete_map,
+                labels=labels,
+                category_orders=cat_orders 
+            )
         
-        y_axis_config = dict(
-            tickfont=dict(size=y_ticks_size),
-            title_font=dict(size=y_title_size),
-            automargin=True
-        )
+            y_axis_config = dict(
+                tickfont=dict(size=y_ticks_size),
+                title_font=dict(size=y_title_size),
+                automargin=True
+            )
         
-        if tick_vals:
-            y_axis_config.update(dict(
-                tickmode='array', 
-                tickvals=tick_vals, 
-                ticktext=tick_text if tick_text else tick_vals,
-                type='category'
-            ))
+            if tick_vals:
+                y_axis_config.update(dict(
+                    tickmode='array', 
+                    tickvals=tick_vals, 
+                    ticktext=tick_text if tick_text else tick_vals,
+                    type='category'
+                ))
             
-        fig.update_yaxes(**y_axis_config)
-        fig.update_xaxes(
-            tickfont=dict(size=x_ticks_size),       
-            title_font=dict(size=x_title_size),     
-            showgrid=True, gridcolor='#f0f0f0'
-        )
+            fig.update_yaxes(**y_axis_config)
+            fig.update_xaxes(
+                tickfont=dict(size=x_ticks_size),       
+                title_font=dict(size=x_title_size),     
+                showgrid=True, gridcolor='#f0f0f0'
+            )
 
-    # =========================================================================
-    # RAMA B: GRÁFICO CON FACETS (GRID)
-    # =========================================================================
-    else:
-        facet_vals = df[facet_col].unique().to_list()
-        facet_vals.sort() 
+        # =========================================================================
+        # RAMA B: GRÁFICO CON FACETS (GRID)
+        # =========================================================================
+        else:
+            facet_vals = df[facet_col].unique().to_list()
+            facet_vals.sort() 
         
-        num_plots = len(facet_vals)
-        num_rows = int(np.ceil(num_plots / cols_wrap))
+            num_plots = len(facet_vals)
+            num_rows = math.ceil(num_plots / cols_wrap)
         
-        fig = make_subplots(
-            rows=num_rows, cols=cols_wrap, 
-            subplot_titles=facet_vals,
-            shared_xaxes=True,    
-            shared_yaxes=False,   
-            horizontal_spacing=horizontal_spacing,
-            vertical_spacing=vertical_spacing
-        )
-
-        seen_legends = set()
+            fig = make_subplots(
+                rows=num_rows, cols=cols_wrap, 
+                subplot_titles=facet_vals,
+                shared_xaxes=True,    
+                shared_yaxes=False,   
+                horizontal_spacing=horizontal_spacing,
+                vertical_spacing=vertical_spacing
+            )
 
-        for i, val in enumerate(facet_vals):
-            row = (i // cols_wrap) + 1
-            col = (i % cols_wrap) + 1
-            
-            sub_df = df.filter(pl.col(facet_col) == val)
-            
             # Blindaje duplicados (Vital para evitar barras apiladas fantasmas)
-            unique_keys = [y]
+            unique_keys = [facet_col, y]
             if color: unique_keys.append(color)
-            sub_df = sub_df.unique(subset=unique_keys, keep='first')
 
-            # 1. RANKING (Eje Y)
+            sort_cols = [facet_col, y]
+            if color: sort_cols.append(color)
+
+            df_facets = df.unique(subset=unique_keys, keep='first', maintain_order=True)
+
+            # 1. RANKING (Eje Y) de todos los facets en un único group_by
+            tick_aggs = [pl.col(x).sum().alias("total_metric")]
+            if yticks_color_column and yticks_color_map and yticks_color_column != y:
+                tick_aggs.append(pl.col(yticks_color_column).first())
+
             stats_df = (
-                sub_df.group_by(y)
-                .agg(pl.col(x).sum().alias("total_metric"))
-                .sort("total_metric", descending=sort_descending)
+                df_facets.group_by([facet_col, y], maintain_order=True)
+                .agg(tick_aggs)
+                .sort([facet_col, "total_metric"], descending=[False, sort_descending], maintain_order=True)
             )
-            current_tick_vals = stats_df[y].to_list()
-            current_tick_text = None
+            stats_by_facet = stats_df.partition_by(facet_col, as_dict=True, maintain_order=True)
 
-            # 2. GENERACIÓN DE TEXTO HTML
-            if yticks_color_column and yticks_color_map:
-                # --- CORRECCIÓN ERROR POLARS (DuplicateError) ---
-                # Usamos un set o lista condicional para evitar duplicados en el select
-                cols_to_select = [y]
-                if yticks_color_column != y:
-                    cols_to_select.append(yticks_color_column)
-                
-                region_map = sub_df.select(cols_to_select).unique(subset=[y], keep='first')
-                stats_df = stats_df.join(region_map, on=y, how='left')
-                
-                try:
-                    current_tick_text = [
-                        f"<span style='color:{yticks_color_map[r]}; font-weight:bold'>{c}</span>"
-                        for c, r in zip(stats_df[y], stats_df[yticks_color_column])
-                    ]
-                except:
-                    current_tick_text = current_tick_vals
+            # 2. DATOS: una partición por (facet, color) ya ordenada por eje Y
+            df_sorted = df_facets.sort(sort_cols)
+            partition_keys = [facet_col, color] if color else [facet_col]
+            traces_data = df_sorted.partition_by(partition_keys, as_dict=True, maintain_order=True)
 
-            # 3. ORDEN COLOR Y DATOS
-            current_cat_orders = {y: current_tick_vals}
-            if color:
-                color_vals = sub_df[color].unique().sort().to_list()
-                current_cat_orders[color] = color_vals 
+            # Colores discretos (mismo criterio que Plotly Express: mapa + secuencia por orden)
+            color_vals_all = df_sorted[color].unique().sort().to_list() if color else ['']
+            color_values_map = _discrete_color_map(color_vals_all, color_discrete_map if color else None)
 
-            sort_cols = [y]
-            if color: sort_cols.append(color)
-            sub_df_sorted = sub_df.sort(sort_cols)
+            custom_cols = _hover_custom_columns(hover_data, x, y)
 
-            # 4. GENERAR TRAZAS
-            aux_fig = px.bar(
-                sub_df_sorted, x=x, y=y, orientation=orientation, color=color,
-                color_discrete_map=color_discrete_map,
-                hover_data=hover_data, labels=labels,
-                barmode=barmode,
-                category_orders=current_cat_orders 
-            )
-            
-            for trace in aux_fig.data:
-                trace_name = trace.name 
-                
-                # --- CORRECCIÓN VISUAL: OFFSETGROUP ---
-                # Esto obliga a Plotly a agrupar por color y no por índice relativo.
-                # Soluciona las barras partidas en el primer subplot.
-                if barmode == 'group':
-                    trace.offsetgroup = trace_name
-                
-                if trace_name not in seen_legends:
-                    trace.showlegend = True
+            seen_legends = set()
+
+            for i, val in enumerate(facet_vals):
+                row = (i // cols_wrap) + 1
+                col = (i % cols_wrap) + 1
+
+                facet_stats = stats_by_facet.get((val,))
+                current_tick_vals = facet_stats[y].to_list() if facet_stats is not None else []
+                current_tick_text = None
+
+                # 3. GENERACIÓN DE TEXTO HTML
+                if yticks_color_column and yticks_color_map and facet_stats is not None:
+                    tick_regions = facet_stats[yticks_color_column].to_list()
+                    if all(r in yticks_color_map for r in tick_regions):
+                        current_tick_text = [
+                            f"<span style='color:{yticks_color_map[r]}; font-weight:bold'>{c}</span>"
+                            for c, r in zip(current_tick_vals, tick_regions)
+                        ]
+                    else:
+                        current_tick_text = current_tick_vals
+
+                # 4. GENERAR TRAZAS (go.Bar directo, una por color presente en el facet)
+                color_vals = (
+                    sorted(key[1] for key in traces_data if key[0] == val) if color else ['']
+                )
+
+                for color_val in color_vals:
+                    trace_df = traces_data[(val, color_val) if color else (val,)]
+                    trace_name = str(color_val) if color else ''
+
+                    trace = go.Bar(
+                        x=trace_df[x].to_numpy(),
+                        y=trace_df[y].to_numpy(),
+                        name=trace_name,
+                        orientation=orientation,
+                        customdata=trace_df.select(custom_cols).to_numpy() if custom_cols else None,
+                        marker=dict(color=color_values_map[color_val], pattern=dict(shape='')),
+                        legendgroup=trace_name, # Vincula la leyenda entre subplots
+                        showlegend=trace_name not in seen_legends
+                    )
                     seen_legends.add(trace_name)
-                    trace.legendgroup = trace_name # Vincula la leyenda entre subplots
-                else:
-                    trace.showlegend = False
-                    trace.legendgroup = trace_name
-                
-                fig.add_trace(trace, row=row, col=col)
+
+                    # --- CORRECCIÓN VISUAL: OFFSETGROUP ---
+                    # Esto obliga a Plotly a agrupar por color y no por índice relativo.
+                    # Soluciona las barras partidas en el primer subplot.
+                    if barmode == 'group':
+                        trace.update(alignmentgroup=True, offsetgroup=trace_name)
+
+                    fig.add_trace(trace, row=row, col=col)
             
-            # 5. CONFIGURAR EJES
-            y_update_args = dict(
-                row=row, col=col,
-                showgrid=False,
-                tickfont=dict(size=y_ticks_size),
-                title_font=dict(size=y_title_size),
-                title_text=labels.get(y, y) if labels else y, 
-                automargin=True
-            )
+                # 5. CONFIGURAR EJES
+                y_update_args = dict(
+                    row=row, col=col,
+                    showgrid=False,
+                    tickfont=dict(size=y_ticks_size),
+                    title_font=dict(size=y_title_size),
+                    title_text=labels.get(y, y) if labels else y, 
+                    automargin=True
+                )
             
-            if current_tick_vals:
-                y_update_args.update(dict(
-                    tickmode='array', 
-                    tickvals=current_tick_vals, 
-                    ticktext=current_tick_text if current_tick_text else current_tick_vals,
-                    type='category', 
-                    categoryorder='array', 
-                    categoryarray=current_tick_vals 
-                ))
+                if current_tick_vals:
+                    y_update_args.update(dict(
+                        tickmode='array', 
+                        tickvals=current_tick_vals, 
+                        ticktext=current_tick_text if current_tick_text else current_tick_vals,
+                        type='category', 
+                        categoryorder='array', 
+                        categoryarray=current_tick_vals 
+                    ))
             
-            fig.update_yaxes(**y_update_args)
+                fig.update_yaxes(**y_update_args)
             
-            show_x_title = (row == num_rows)
-            fig.update_xaxes(
-                title_text=labels.get(x, x) if labels and show_x_title else (x if show_x_title else None),
-                row=row, col=col, 
-                showgrid=True, gridcolor='#f0f0f0',
-                tickfont=dict(size=x_ticks_size),
-                title_font=dict(size=x_title_size)
-            )
+                show_x_title = (row == num_rows)
+                fig.update_xaxes(
+                    title_text=labels.get(x, x) if labels and show_x_title else (x if show_x_title else None),
+                    row=row, col=col, 
+                    showgrid=True, gridcolor='#f0f0f0',
+                    tickfont=dict(size=x_ticks_size),
+                    title_font=dict(size=x_title_size)
+                )
 
-    # =========================================================================
-    # AJUSTES FINALES
-    # =========================================================================
-    fig.update_traces(hovertemplate=hovertemplate)
-    fig.update_traces(textfont_size=12, textangle=0, textposition="outside", cliponaxis=False)
+        # =========================================================================
+        # AJUSTES FINALES
+        # =========================================================================
+        fig.update_traces(hovertemplate=hovertemplate)
+        fig.update_traces(textfont_size=12, textangle=0, textposition="outside", cliponaxis=False)
     
-    fig.update_layout(**layout_args)
+        fig.update_layout(**layout_args)
+
+        st.set_output(n_traces=len(fig.data))
 
     if plot_save_path:
-        fig.write_html(plot_save_path, include_plotlyjs='cdn', full_html=True)
+        with stage('barplot.html_write') as st:
+            fig.write_html(plot_save_path, include_plotlyjs='cdn', full_html=True)
+            html_bytes = os.path.getsize(plot_save_path)
+            st.set_output(html_bytes=html_bytes)
+            LOGGER.info(f"💾 {plot_save_path}: {html_bytes / 1024:.0f} KB")
     
     if show:
-        fig.show()
\ No newline at end of file
+        fig.show()
+
+    if return_fig:
+        return fig
\ No newline at end of file
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import logging
+import resource
+import functools
+import threading
+import tracemalloc
+import polars as pl
+
+######################################################################################################################
+
+LOGGER = logging.getLogger('homicides.profiling')
+
+# Desactivado por defecto: sin activar, cada etapa solo cuesta un par de comprobaciones
+_CONFIG = {
+    'enabled': False,
+    'jsonl_path': None,       # Fichero JSONL donde añadir los registros (además del logger)
+    'polars_profile': False,  # Desglose por nodo del plan (LazyFrame.profile()) o plan optimizado
+    'trace_memory': False,    # Pico de memoria Python (tracemalloc) por etapa
+}
+
+# Etapas abiertas por hilo (para anidar: cada registro guarda su etapa padre). Por hilo para
+# que las etapas de peticiones concurrentes (query_service) no se mezclen entre sí.
+_LOCAL = threading.local()
+
+def _stack():
+    """Pila de etapas abiertas del hilo actual."""
+    if not hasattr(_LOCAL, 'stack'):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+def _parent_name():
+    stack = _stack()
+    return stack[-1].name if stack else None
+
+######################################################################################################################
+
+def enable_profiling(jsonl_path=None, polars_profile=False, trace_memory=False):
+    """
+    Activa la instrumentación por etapas (filtro, cobertura, agregación regional, ranking,
+    construcción de figuras, escritura HTML...). Cada etapa emite un registro estructurado
+    (JSON) al logger 'homicides.profiling' y, si se indica, a un fichero JSONL.
+    """
+    _CONFIG.update(
+        enabled=True, jsonl_path=jsonl_path,
+        polars_profile=polars_profile, trace_memory=trace_memory
+    )
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable_profiling():
+    if _CONFIG['trace_memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _CONFIG.update(enabled=False, jsonl_path=None, polars_profile=False, trace_memory=False)
+
+def is_profiling_enabled():
+    return _CONFIG['enabled']
+
+######################################################################################################################
+
+def _n_rows(obj):
+    """Filas de un DataFrame (None para LazyFrame u otros objetos: no se fuerza su ejecución)."""
+    if isinstance(obj, pl.DataFrame):
+        return obj.height
+    return None
+
+def _rss_mb():
+    """RSS actual del proceso (Linux: /proc/self/statm); si no está disponible, el pico."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _emit(record):
+    line = json.dumps(record, default=str, ensure_ascii=False)
+    LOGGER.info(line)
+    if _CONFIG['jsonl_path']:
+        with open(_CONFIG['jsonl_path'], 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+######################################################################################################################
+
+class Stage:
+    """Registro de una etapa en curso (ver stage)."""
+
+    def __init__(self, name, df_in=None, **context):
+        self.name = name
+        self.record = None
+        if not _CONFIG['enabled']:
+            return
+
+        # La pila del hilo que abre la etapa (end() la cierra en esa misma pila)
+        self._stack = _stack()
+        self.record = {
+            'stage': name,
+            'parent': _parent_name(),
+            'rows_in': _n_rows(df_in),
+            'rows_out': None,
+            **context
+        }
+
+        # tracemalloc tiene un único pico global: lo repartimos entre la etapa padre y la hija
+        self._py_peak = 0
+        if _CONFIG['trace_memory'] and tracemalloc.is_tracing():
+            if self._stack:
+                self._stack[-1]._py_peak = max(self._stack[-1]._py_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        self._stack.append(self)
+        self._rss_start = _rss_mb()
+        self._maxrss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self._start = time.perf_counter()
+
+    def set_output(self, df_out=None, **context):
+        """Filas de salida y contexto adicional (ej. bytes escritos) de la etapa."""
+        if self.record is not None:
+            if df_out is not None:
+                self.record['rows_out'] = _n_rows(df_out)
+            self.record.update(context)
+        return df_out
+
+    def end(self):
+        if self.record is None:
+            return
+
+        self.record['wall_s'] = round(time.perf_counter() - self._start, 6)
+        self.record['rss_start_mb'] = round(self._rss_start, 1)
+        self.record['rss_end_mb'] = round(_rss_mb(), 1)
+        # Crecimiento del pico de RSS durante la etapa (0 si no se superó el pico previo)
+        self.record['peak_rss_delta_mb'] = round(
+            (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - self._maxrss_start) / 1024, 1
+        )
+
+        if _CONFIG['trace_memory'] and tracemalloc.is_tracing():
+            self._py_peak = max(self._py_peak, tracemalloc.get_traced_memory()[1])
+            self.record['py_peak_mb'] = round(self._py_peak / 1024**2, 2)
+
+        if self in self._stack:
+            self._stack.remove(self)
+        if self._stack and _CONFIG['trace_memory']:
+            self._stack[-1]._py_peak = max(self._stack[-1]._py_peak, self._py_peak)
+
+        _emit(self.record)
+        self.record = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.record is not None and exc_type is not None:
+            self.record['error'] = exc_type.__name__
+        self.end()
+        return False
+
+def stage(name, df_in=None, **context):
+    """
+    Abre una etapa. Se usa siempre como context manager (se cierra aunque haya excepción):
+        with stage('time_series.filter', df_in=df, by=by) as st:
+            df_country = ...
+            st.set_output(df_country)
+    """
+    return Stage(name, df_in=df_in, **context)
+
+def profiled(name=None, context_args=()):
+    """
+    Decorador: mide la función completa como una etapa. 'context_args' son los nombres de
+    argumentos (pasados por nombre) que se añaden al registro, ej. ('by',).
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _CONFIG['enabled']:
+                return func(*args, **kwargs)
+
+            df_in = args[0] if args else kwargs.get('df')
+            context = {k: kwargs[k] for k in context_args if k in kwargs}
+            with Stage(stage_name, df_in=df_in, **context) as st:
+                result = func(*args, **kwargs)
+                st.set_output(result if isinstance(result, pl.DataFrame) else None)
+            return result
+
+        return wrapper
+    return decorator
+
+######################################################################################################################
+
+def _emit_polars_profile(name, df_profile):
+    """Un registro por nodo del plan ejecutado (tiempos en microsegundos)."""
+    for row in df_profile.iter_rows(named=True):
+        _emit({
+            'stage': name,
+            'parent': _parent_name(),
+            'polars_node': row['node'],
+            'start_us': row['start'],
+            'end_us': row['end'],
+            'wall_s': round((row['end'] - row['start']) / 1e6, 6)
+        })
+
+def collect_profiled(lf, name):
+    """
+    lf.collect(); con polars_profile activo emite el desglose por nodo de lf.profile().
+    En versiones de Polars sin profile() (2.0+) emite el plan optimizado y el tiempo total.
+    """
+    if not (_CONFIG['enabled'] and _CONFIG['polars_profile']):
+        return lf.collect()
+
+    if hasattr(lf, 'profile'):
+        df, df_profile = lf.profile()
+        _emit_polars_profile(name, df_profile)
+        return df
+
+    plan = lf.explain()
+    start = time.perf_counter()
+    df = lf.collect()
+    _emit({
+        'stage': name,
+        'parent': _parent_name(),
+        'polars_plan': plan,
+        'rows_out': df.height,
+        'wall_s': round(time.perf_counter() - start, 6)
+    })
+    return df
+
+def collect_all_profiled(lazy_frames, name):
+    """
+    pl.collect_all(lazy_frames); con polars_profile activo, perfila cada plan por separado
+    (se pierde la ejecución conjunta, pero se ve el coste de cada nodo).
+    """
+    if not (_CONFIG['enabled'] and _CONFIG['polars_profile']):
+        return pl.collect_all(lazy_frames)
+
+    return [collect_profiled(lf, f"{name}[{i}]") for i, lf in enumerate(lazy_frames)]
+
+######################################################################################################################
@@ -0,0 +1,284 @@
+import io
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import polars as pl
+
+from src.data_utils import scan_processed_data, dataset_fingerprint
+from src.analysis_utils import (
+    build_coverage_index, select_coverage_index,
+    process_time_series_data, process_ranking_data
+)
+
+######################################################################################################################
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_PROP_YEARS_IN_PERIOD_LIMIT = 0.65
+DEFAULT_REF_REGION_FOR_START_YEAR = 'Europe'
+
+LEVELS = {'time_series': ('country', 'region'), 'ranking': ('country', 'region')}
+FORMATS = {'json': 'application/json', 'arrow': 'application/vnd.apache.arrow.stream'}
+
+######################################################################################################################
+
+class QueryService:
+    """
+    Consultas en memoria sobre el dataset procesado (para dashboards): el dataset y el índice
+    de cobertura se cargan una sola vez y cada resultado se guarda por conjunto de parámetros
+    (LRU acotado). Peticiones concurrentes con los mismos parámetros comparten el cálculo.
+
+    Uso:
+        service = QueryService(INPUT_FILE, age_mapping=AGE_MAPPING)
+        df_time_series, min_year, max_year = service.time_series(selected_countries=['Spain'], by='Sex')
+        df_ranking_combined = service.ranking(selected_countries=['Spain'], initial_years=[2000, 2014])
+        serve(service, port=8050)   # API HTTP (ver QueryHandler)
+    """
+
+    def __init__(self, source, age_mapping=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.source = source
+        self.age_mapping = age_mapping
+        self.max_entries = max_entries
+
+        start = time.perf_counter()
+        # Mismos tipos que los notebooks obtienen del CSV procesado (texto plano)
+        self.df = (
+            scan_processed_data(source)
+            .with_columns(pl.col(pl.Enum, pl.Categorical).cast(pl.String))
+            .collect()
+        )
+        self.coverage_index = build_coverage_index(self.df)
+        self.fingerprint = dataset_fingerprint(source)
+        self.countries = self.df['Country'].unique().sort().to_list()
+        self.load_seconds = time.perf_counter() - start
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------------------------------
+    # Caché (LRU + cálculos en curso compartidos)
+    # -------------------------------------------------------------------------
+
+    def _cached(self, key, compute):
+        with self._lock:
+            future = self._cache.get(key)
+            if future is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                owner = False
+            else:
+                future = Future()
+                self._cache[key] = future
+                self.misses += 1
+                owner = True
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                # Los errores no se cachean: la siguiente petición lo vuelve a intentar
+                with self._lock:
+                    self._cache.pop(key, None)
+                future.set_exception(e)
+
+        return future.result()
+
+    def _normalize_countries(self, selected_countries):
+        if selected_countries is None:
+            return tuple(self.countries)
+        return tuple(sorted(set(selected_countries)))
+
+    # -------------------------------------------------------------------------
+    # Consultas
+    # -------------------------------------------------------------------------
+
+    def time_series(
+        self,
+        selected_countries=None,
+        prop_years_in_period_limit=DEFAULT_PROP_YEARS_IN_PERIOD_LIMIT,
+        ref_region_for_start_year=DEFAULT_REF_REGION_FOR_START_YEAR,
+        by=None,
+        dimension=None
+    ):
+        """Equivalente a process_time_series_data (todos los países si selected_countries es None)."""
+        countries = self._normalize_countries(selected_countries)
+        key = ('time_series', countries, prop_years_in_period_limit, ref_region_for_start_year, by, dimension)
+
+        return self._cached(key, lambda: process_time_series_data(
+            df = self.df,
+            selected_countries = list(countries),
+            prop_years_in_period_limit = prop_years_in_period_limit,
+            ref_region_for_start_year = ref_region_for_start_year,
+            by = by,
+            age_mapping = self.age_mapping if by == 'Age' else None,
+            dimension = dimension,
+            coverage_index = self.coverage_index
+        ))
+
+    def ranking(
+        self,
+        initial_years,
+        selected_countries=None,
+        prop_years_in_period_limit=DEFAULT_PROP_YEARS_IN_PERIOD_LIMIT,
+        ref_region_for_start_year=DEFAULT_REF_REGION_FOR_START_YEAR,
+        by=None,
+        dimension=None,
+        max_year=None
+    ):
+        """
+        Equivalente a process_ranking_data sobre la serie temporal de los mismos parámetros.
+        'min_year' en initial_years y max_year=None toman el periodo de la serie temporal.
+        Devuelve df_ranking_combined ({'country': ..., 'region': ...}).
+        """
+        countries = self._normalize_countries(selected_countries)
+        df_time_series, min_year, series_max_year = self.time_series(
+            countries, prop_years_in_period_limit, ref_region_for_start_year, by, dimension
+        )
+
+        initial_years = tuple(min_year if year == 'min_year' else int(year) for year in initial_years)
+        max_year = series_max_year if max_year is None else int(max_year)
+        key = ('ranking', countries, prop_years_in_period_limit, ref_region_for_start_year, by, dimension, initial_years, max_year)
+
+        def compute():
+            df_ranking_combined, _ = process_ranking_data(
+                df = df_time_series['country'],
+                selected_countries = list(countries),
+                prop_years_in_period_limit = prop_years_in_period_limit,
+                initial_years = list(initial_years),
+                max_year = max_year,
+                by = by,
+                coverage_index = select_coverage_index(
+                    self.coverage_index, list(countries), by=by,
+                    age_mapping=self.age_mapping if by == 'Age' else None, dimension=dimension
+                )
+            )
+            return df_ranking_combined
+
+        return self._cached(key, compute)
+
+    def stats(self):
+        return {
+            'source': self.source,
+            'fingerprint': self.fingerprint,
+            'rows': self.df.height,
+            'countries': len(self.countries),
+            'load_seconds': round(self.load_seconds, 3),
+            'cache_entries': len(self._cache),
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+        }
+
+######################################################################################################################
+
+def _encode_frame(df, fmt, metadata):
+    """DataFrame -> (bytes, content-type). En Arrow los metadatos van en cabeceras HTTP."""
+    if fmt == 'arrow':
+        buffer = io.BytesIO()
+        df.write_ipc_stream(buffer)
+        return buffer.getvalue(), FORMATS['arrow']
+
+    body = dict(metadata, columns=df.columns, rows=df.to_dicts())
+    return json.dumps(body, default=str).encode(), FORMATS['json']
+
+def _parse_query(query):
+    """Parámetros de la URL -> kwargs de QueryService (listas separadas por comas)."""
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+
+    kwargs = {}
+    if params.get('countries'):
+        kwargs['selected_countries'] = [c for c in params['countries'].split(',') if c]
+    if 'prop_years_in_period_limit' in params:
+        kwargs['prop_years_in_period_limit'] = float(params['prop_years_in_period_limit'])
+    if 'ref_region' in params:
+        kwargs['ref_region_for_start_year'] = params['ref_region']
+    for name in ('by', 'dimension'):
+        if params.get(name):
+            kwargs[name] = params[name]
+
+    level = params.get('level', 'country')
+    fmt = params.get('format', 'json')
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: '{fmt}' (opciones: {list(FORMATS)})")
+
+    return params, kwargs, level, fmt
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    API HTTP (GET) sobre un QueryService:
+    - /time_series?countries=Spain,France&by=Sex&level=country&format=json|arrow
+    - /ranking?initial_years=1990,min_year,2014&max_year=2023&by=Sex&level=region
+    - /countries, /stats
+    Parámetros comunes: countries, by, dimension, prop_years_in_period_limit, ref_region.
+    """
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == '/stats':
+                return self._send_json(self.service.stats())
+            if url.path == '/countries':
+                return self._send_json({'countries': self.service.countries})
+
+            endpoint = url.path.strip('/')
+            if endpoint not in LEVELS:
+                return self._send_json({'error': f"Ruta desconocida: {url.path}"}, status=404)
+
+            params, kwargs, level, fmt = _parse_query(url.query)
+            if level not in LEVELS[endpoint]:
+                raise ValueError(f"level debe ser uno de {list(LEVELS[endpoint])}")
+
+            if endpoint == 'time_series':
+                df_time_series, min_year, max_year = self.service.time_series(**kwargs)
+                df, metadata = df_time_series[level], {'min_year': min_year, 'max_year': max_year}
+            else:
+                if not params.get('initial_years'):
+                    raise ValueError("Falta el parámetro 'initial_years' (ej. initial_years=1990,min_year,2014)")
+                initial_years = params['initial_years'].split(',')
+                df = self.service.ranking(initial_years, max_year=params.get('max_year'), **kwargs)[level]
+                metadata = {'initial_years': initial_years}
+
+            body, content_type = _encode_frame(df, fmt, metadata)
+            headers = {f"X-{k.replace('_', '-').title()}": ','.join(map(str, v)) if isinstance(v, list) else str(v) for k, v in metadata.items()}
+            self._send(body, content_type, headers=headers)
+
+        except (ValueError, TypeError, KeyError, pl.exceptions.PolarsError) as e:
+            self._send_json({'error': f"{type(e).__name__}: {e}"}, status=400)
+
+    def _send_json(self, obj, status=200):
+        self._send(json.dumps(obj, default=str).encode(), FORMATS['json'], status=status)
+
+    def _send(self, body, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin log por petición en stderr (los dashboards hacen muchas)
+        pass
+
+def make_server(service, host='127.0.0.1', port=8050):
+    """Servidor HTTP multihilo (una petición por hilo; Polars libera el GIL al calcular)."""
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(service, host='127.0.0.1', port=8050):
+    server = make_server(service, host=host, port=port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+######################################################################################################################
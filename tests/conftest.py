@@ -0,0 +1,6 @@
+import os
+import sys
+
+TESTS_PATH = os.path.dirname(os.path.abspath(__file__))
+PROJECT_PATH = os.path.join(TESTS_PATH, '..')
+sys.path.append(PROJECT_PATH)
@@ -0,0 +1,140 @@
+import polars as pl
+import pytest
+
+from config.config_01a import AGE_MAPPING
+from src.analysis_utils import (
+    build_coverage_index, calculate_ranking_periods, calculate_rolling_rankings, get_countries_with_enough_data,
+    _filter_breakdown,
+)
+
+#################################################################################################################
+
+def _long_span_frame():
+    # 1940-2019 (80 years): the coverage bitmap needs two UInt64 words
+    years_a = [1940] + list(range(2000, 2020))
+    years_b = [1940] + list(range(2000, 2020, 2))
+    return pl.DataFrame({
+        'Country': ['A'] * len(years_a) + ['B'] * len(years_b),
+        'Region_2': ['Europe'] * (len(years_a) + len(years_b)),
+        'Year': years_a + years_b,
+        'homicides_count': [1.0] * (len(years_a) + len(years_b)),
+        'population': [100000.0] * (len(years_a) + len(years_b)),
+    })
+
+def test_coverage_index_spans_more_than_64_years():
+    df = _long_span_frame()
+
+    assert get_countries_with_enough_data(df, ['A', 'B'], (2000, 2019), 0.5) == (['A', 'B'], {'A': 1.0, 'B': 0.5})
+
+    index = build_coverage_index(df, keys=['Country'])
+    assert index['bitmap_word'].unique().sort().to_list() == [0, 1]
+
+def test_ranking_periods_index_matches_scan_over_64_years():
+    df = _long_span_frame()
+    periods = [(1940, 1960), (1990, 2010), (2000, 2019), (1900, 2030)]
+
+    expected = calculate_ranking_periods(df, ['A', 'B'], 0.1, periods)
+    from_index = calculate_ranking_periods(
+        df, ['A', 'B'], 0.1, periods, coverage_index=build_coverage_index(df, keys=['Country'])
+    )
+
+    assert from_index[0].equals(expected[0])
+    assert from_index[1].equals(expected[1])
+
+@pytest.mark.parametrize('windows', [dict(start_years=[]), dict(end_years=[]), dict(start_years=[2030], end_years=[2000])])
+def test_rolling_rankings_without_windows(windows):
+    df = _long_span_frame()
+    expected = calculate_rolling_rankings(df, ['A', 'B'], 0.5, start_years=[2000], end_years=[2019])
+
+    result = calculate_rolling_rankings(df, ['A', 'B'], 0.5, **windows)
+
+    assert expected.height == 2
+    assert result.is_empty()
+    assert result.schema == expected.schema
+
+def test_rolling_rankings_break_ties_by_country():
+    # Every country has the same rate: the order must not depend on the input row order
+    df = _long_span_frame()
+    df = pl.concat([df.with_columns(pl.lit('C').alias('Country')), df]).reverse()
+
+    result = calculate_rolling_rankings(df, ['A', 'B', 'C'], 0.5, start_years=[2000, 2010], end_years=[2019])
+
+    assert result['mean_homicides_rate'].n_unique() == 1
+    assert result.select('start_year', 'Country').rows() == [
+        (2000, 'A'), (2000, 'B'), (2000, 'C'), (2010, 'A'), (2010, 'B'), (2010, 'C')
+    ]
+
+#################################################################################################################
+
+def _age_frame(missing_population=False):
+    rows = []
+    for country, scale in [('A', 1), ('B', 2), ('C', 3)]:
+        for year in [2018, 2019, 2020]:
+            for age, count in [('0-9', 1), ('15 -17', 2), ('18-19', 3), ('Unknown', 4), ('Total', 10)]:
+                missing = missing_population and (country, year, age) == ('B', 2019, '18-19')
+                population = None if missing else 1000.0 * scale
+                rows.append((country, 'Europe', year, 'Total', 'Total', 'Total', age, count * scale + year % 10, population))
+            # Other dimensions must never leak into the Age breakdown
+            rows.append((country, 'Europe', year, 'by sex', 'Total', 'Male', 'Total', 5.0, 500.0))
+    return pl.DataFrame(
+        rows, orient='row',
+        schema=['Country', 'Region_2', 'Year', 'Dimension', 'Category', 'Sex', 'Age', 'homicides_count', 'population']
+    ).with_columns(pl.col('homicides_count').cast(pl.Float64))
+
+def _legacy_age_breakdown(df, selected_countries, age_mapping):
+    # Baseline implementation, verbatim: clone + replace over every row, filter, aggregate, diff
+    df_pre = df.clone()
+    if age_mapping:
+        df_pre = df_pre.with_columns(pl.col('Age').replace(age_mapping))
+    df_pre = df_pre.filter(
+        pl.col('Country').is_in(selected_countries) &
+        (pl.col('Dimension') == 'Total') &
+        (pl.col('Category') == 'Total') &
+        (pl.col('Age') != 'Total')
+    )
+    df_country = df_pre.group_by(['Country', 'Region_2', 'Year', 'Age']).agg(
+        (pl.col('homicides_count').sum() / pl.col('population').sum() * 100000).round(2).alias('homicides_rate'),
+        pl.col('homicides_count').sum(),
+        pl.col('population').sum()
+    )
+    return df_country.sort(['Country', 'Age', 'Year']).with_columns(
+        homicides_rate_abs_change=pl.col('homicides_rate').diff().over(['Country', 'Age']).round(2)
+    )
+
+@pytest.mark.parametrize('age_mapping', [AGE_MAPPING, None, {'Unknown': 'Total', '0-9': '0-14'}])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_age_breakdown_matches_legacy_path(age_mapping, lazy):
+    df = _age_frame()
+    selected = ['A', 'B']
+    cols = [
+        'Country', 'Region_2', 'Year', 'Age', 'homicides_count', 'population', 'homicides_rate',
+        'homicides_rate_abs_change'
+    ]
+
+    result = _filter_breakdown(df.lazy() if lazy else df, selected, by='Age', age_mapping=age_mapping)
+    if lazy:
+        result = result.collect()
+    expected = _legacy_age_breakdown(df, selected, age_mapping)
+
+    result = result.select(cols).sort(['Country', 'Age', 'Year'])
+    expected = expected.select(cols).sort(['Country', 'Age', 'Year'])
+
+    assert set(result['Country'].unique()) == set(expected['Country'].unique()) == set(selected)
+    assert result.equals(expected)
+    # Unmapped ages keep their label unless the mapping sends them to 'Total'
+    assert ('Unknown' in result['Age'].to_list()) == ('Unknown' not in (age_mapping or {}))
+
+def test_age_breakdown_ignores_counts_without_population():
+    # Only intended divergence from the baseline: counts whose population is unknown leave the numerator
+    df = _age_frame(missing_population=True)
+    keys = ['Country', 'Year', 'Age']
+
+    result = _filter_breakdown(df, ['A', 'B'], by='Age', age_mapping=AGE_MAPPING)
+    expected = _legacy_age_breakdown(df, ['A', 'B'], AGE_MAPPING)
+    diff = result.join(expected, on=keys, suffix='_legacy').filter(
+        pl.col('homicides_rate') != pl.col('homicides_rate_legacy')
+    )
+
+    assert diff.select(keys).rows() == [('B', 2019, '15-19')]
+    assert diff['homicides_rate'].item() == round(13 / 2000 * 100000, 2)
+    assert diff['homicides_rate_legacy'].item() == round(28 / 2000 * 100000, 2)
@@ -0,0 +1,98 @@
+import os
+import importlib.util
+
+import polars as pl
+import pytest
+
+from benchmarks.synthetic_data import make_processed_unodc
+from src.analysis_utils import build_coverage_index, process_ranking_data, process_time_series_data
+from src.cache_utils import ResultsCache, _frame_fingerprint
+from src.data_utils import dataset_fingerprint
+
+#################################################################################################################
+
+@pytest.fixture(scope='module')
+def df():
+    return make_processed_unodc(scale=0.05)
+
+@pytest.fixture
+def source(df, tmp_path):
+    path = tmp_path / 'processed.csv'
+    df.write_csv(path)
+    return str(path)
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultsCache(cache_dir=str(tmp_path / 'cache'))
+
+def _load_module(path):
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+#################################################################################################################
+
+def test_call_with_frame_argument(df, source, cache):
+    countries = df['Country'].unique().sort().to_list()
+    kwargs = dict(selected_countries=countries, prop_years_in_period_limit=0.5, by='Sex')
+
+    def cached(coverage_index):
+        return cache.call(
+            process_time_series_data, source=source, df=df, coverage_index=coverage_index, **kwargs
+        )
+
+    expected = process_time_series_data(df, **kwargs)
+    df_time_series, min_year, max_year = cached(build_coverage_index(df))
+    assert (min_year, max_year) == expected[1:]
+    assert df_time_series['country'].equals(expected[0]['country'])
+
+    # The entry is stored under the content fingerprint of the frame argument
+    fingerprint = dataset_fingerprint(os.path.abspath(source))
+    kwargs['df_fingerprint'] = _frame_fingerprint(df)
+    key = cache.make_key(process_time_series_data, fingerprint, coverage_index=build_coverage_index(df), **kwargs)
+    cached_result, hit = cache.get(key)
+    assert hit and cached_result[0]['country'].equals(df_time_series['country'])
+
+    # Same content (eager or lazy) -> same key; different content -> different key
+    assert key == cache.make_key(
+        process_time_series_data, fingerprint, coverage_index=build_coverage_index(df).lazy(), **kwargs
+    )
+    assert key != cache.make_key(
+        process_time_series_data, fingerprint,
+        coverage_index=build_coverage_index(df.filter(pl.col('Year') > 2000)), **kwargs
+    )
+
+    kwargs.pop('df_fingerprint')
+    cached(build_coverage_index(df))
+    assert len(cache._entries()) == 1
+
+def test_call_keys_on_input_frame(df, source, cache):
+    # Two derived frames (no df_key) with the same arguments must not share an entry
+    countries = df['Country'].unique().sort().to_list()
+    kwargs = dict(
+        selected_countries=countries, prop_years_in_period_limit=0.5, initial_years=[2000], max_year=2023, by='Category'
+    )
+    frames = {
+        dimension: process_time_series_data(
+            df, selected_countries=countries, prop_years_in_period_limit=0.5, by='Category', dimension=dimension
+        )[0]['country']
+        for dimension in ['by mechanisms', 'by situational context']
+    }
+
+    for dimension, df_breakdown in frames.items():
+        expected = process_ranking_data(df_breakdown, **kwargs)
+        result = cache.call(process_ranking_data, source=source, df=df_breakdown, **kwargs)
+        assert result[0]['country'].equals(expected[0]['country']), dimension
+
+    assert len(cache._entries()) == 2
+
+def test_key_changes_with_module_source(cache, tmp_path):
+    path = tmp_path / 'cache_probe_module.py'
+    path.write_text('def func(df):\n    return df\n')
+    key = cache.make_key(_load_module(path).func, 'fp', by='Sex')
+
+    assert key == cache.make_key(_load_module(path).func, 'fp', by='Sex')
+
+    path.write_text('def func(df):\n    return df.head()  # edited\n')
+    assert key != cache.make_key(_load_module(path).func, 'fp', by='Sex')
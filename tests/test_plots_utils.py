@@ -0,0 +1,57 @@
+import polars as pl
+import pytest
+
+from src.analysis_utils import set_verbosity
+from src.plots_utils import barplot, time_series_plot
+
+#################################################################################################################
+
+@pytest.fixture
+def df():
+    return pl.DataFrame({
+        'Country': ['A'] * 3 + ['B'] * 3,
+        'Year': [2018, 2019, 2020] * 2,
+        'homicides_rate': [1.0, 1.5, 1.2, 3.0, 2.5, 2.8],
+    })
+
+@pytest.fixture(autouse=True)
+def restore_verbosity():
+    yield
+    set_verbosity('detail')
+
+def _reported_kb(output, path):
+    # '💾 <path>: <n> KB ...' lines written through the analysis logger
+    lines = [line for line in output.splitlines() if f'{path}:' in line]
+    assert len(lines) == 1, output
+    return int(lines[0].split(f'{path}: ')[1].split(' KB')[0])
+
+#################################################################################################################
+
+@pytest.mark.parametrize('lazy_hidden_traces', [False, True])
+def test_time_series_plot_reports_html_size(df, tmp_path, capsys, lazy_hidden_traces):
+    path = tmp_path / 'series.html'
+    set_verbosity('summary')
+
+    time_series_plot(
+        df, x='Year', y='homicides_rate', color='Country', show=False, plot_save_path=str(path),
+        default_visible_name='A', lazy_hidden_traces=lazy_hidden_traces
+    )
+
+    output = capsys.readouterr().out
+    assert _reported_kb(output, path) == round(path.stat().st_size / 1024)
+    assert ('de trazas ocultas' in output) == lazy_hidden_traces
+
+def test_barplot_reports_html_size(df, tmp_path, capsys):
+    path = tmp_path / 'bars.html'
+    set_verbosity('summary')
+
+    barplot(df.filter(pl.col('Year') == 2020), x='homicides_rate', y='Country', show=False, plot_save_path=str(path))
+
+    assert _reported_kb(capsys.readouterr().out, path) == round(path.stat().st_size / 1024)
+
+def test_html_size_follows_verbosity(df, tmp_path, capsys):
+    set_verbosity('quiet')
+
+    time_series_plot(df, x='Year', y='homicides_rate', color='Country', show=False, plot_save_path=str(tmp_path / 'q.html'))
+
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,132 @@
+import os
+import shutil
+import logging
+import importlib.util
+
+import polars as pl
+import pytest
+
+from conftest import PROJECT_PATH
+
+SCRIPT_FILE = os.path.join(PROJECT_PATH, 'scripts', 'process_crime_data_eurostat.py')
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'eurostat')
+TSV_FIXTURE = os.path.join(FIXTURES_DIR, 'crim_off_cat.tsv.gz')
+SDMX_FIXTURE = os.path.join(FIXTURES_DIR, 'crim_hom_soff.csv')
+
+#################################################################################################################
+
+@pytest.fixture(scope='module')
+def script():
+    spec = importlib.util.spec_from_file_location('process_crime_data_eurostat', SCRIPT_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def dirs(tmp_path):
+    input_dir = tmp_path / 'raw'
+    shutil.copytree(FIXTURES_DIR, input_dir)
+    return {'input_dir': str(input_dir), 'output_dir': str(tmp_path / 'processed'), 'cache_dir': str(tmp_path / 'cache')}
+
+def _rows(df, *cols):
+    return sorted(df.select(cols).iter_rows(), key=str)
+
+#################################################################################################################
+
+def test_parse_bulk_tsv(script):
+    df = script.parse_bulk_file(TSV_FIXTURE)
+
+    assert df.columns == ['unit', 'iccs', 'geo', 'Year', 'value', 'flag', 'Dataset']
+    assert df['Dataset'].unique().to_list() == ['crim_off_cat']
+    # Annual periods only (2020-Q1 and the freq=Q series are dropped); ':' without a flag is no observation
+    assert sorted(df['Year'].unique().to_list()) == [2019, 2020, 2021]
+    assert _rows(df.filter(pl.col('geo') == 'AT'), 'Year', 'value', 'flag') == [(2019, 65.0, None), (2021, 58.0, 'p')]
+    assert _rows(df.filter(pl.col('geo') == 'EL'), 'Year', 'value', 'flag') == [
+        (2019, 0.8, None), (2020, None, 'c'), (2021, 1.1, 'e')
+    ]
+    assert df.filter(pl.col('geo') == 'TR')['value'].to_list() == [-150.0]
+    assert df.height == 12
+
+def test_parse_sdmx_csv(script):
+    df = script.parse_bulk_file(SDMX_FIXTURE)
+
+    assert df.columns == ['sex', 'unit', 'geo', 'Year', 'value', 'flag', 'Dataset']
+    assert _rows(df, 'sex', 'geo', 'Year', 'value', 'flag') == _rows(
+        pl.DataFrame(
+            [('F', 'ES', 2019, 100.0, None), ('M', 'ES', 2019, 200.0, 'p'), ('M', 'DE', 2020, None, 'c'),
+             ('M', 'EA19', 2020, 5.0, None), ('F', 'PL', 2021, 7.0, None)],
+            schema=['sex', 'geo', 'Year', 'value', 'flag'], orient='row'
+        ),
+        'sex', 'geo', 'Year', 'value', 'flag'
+    )
+
+def test_harmonise_geo(script):
+    df = script.harmonise_geo(script.parse_bulk_file(TSV_FIXTURE))
+    countries = {
+        row[0]: row[1:]
+        for row in df.select('geo', 'Country', 'Region', 'Subregion', 'Region_2', 'Geo_level').unique().iter_rows()
+    }
+
+    # Aggregates have no country
+    assert 'EU27_2020' not in countries
+    assert countries['AT'] == ('Austria', 'Europe', 'Western Europe', 'Europe', 0)
+    assert countries['EL'] == ('Greece', 'Europe', 'Southern Europe', 'Europe', 0)
+    assert countries['TR'] == ('Türkiye', 'Asia', 'Western Asia', 'Asia', 0)
+    assert countries['ES'] == ('Spain', 'Europe', 'Southern Europe', 'Spain', 0)
+    # NUTS regions keep their code and get the country and NUTS level
+    assert countries['ES51'] == ('Spain', 'Europe', 'Southern Europe', 'Spain', 2)
+    assert countries['UKC-L'] == ('United Kingdom', 'Europe', 'Northern Europe', 'Europe', 1)
+    assert set(df['Country']) <= {names[0] for names in script.GEO_COUNTRIES.values()}
+
+def test_process_data(script):
+    df = script.process_data([script.parse_bulk_file(TSV_FIXTURE), script.parse_bulk_file(SDMX_FIXTURE)])
+
+    assert df.columns == script.GEO_COLS + ['iccs', 'sex', 'unit'] + script.VALUE_COLS
+    assert df.filter(pl.col('Dataset') == 'crim_off_cat').height == 11
+    assert df.filter(pl.col('Dataset') == 'crim_hom_soff').height == 4
+    assert df.filter(pl.col('geo').is_in(['EU27_2020', 'EA19'])).is_empty()
+    assert df.filter(pl.col('Dataset') == 'crim_hom_soff')['iccs'].is_null().all()
+
+#################################################################################################################
+
+def test_main_writes_outputs(script, dirs):
+    script.main(**dirs)
+
+    output_file = os.path.join(dirs['output_dir'], f'{script.OUTPUT_NAME}.csv')
+    df_csv = pl.read_csv(output_file)
+    df_dataset = pl.read_parquet(os.path.join(dirs['output_dir'], script.OUTPUT_NAME), hive_partitioning=True)
+
+    assert df_csv.height == df_dataset.height == 15
+    assert sorted(os.listdir(os.path.join(dirs['output_dir'], script.OUTPUT_NAME))) == [
+        'Dataset=crim_hom_soff', 'Dataset=crim_off_cat'
+    ]
+
+def test_rerun_skips_and_reuses_cache(script, dirs, caplog):
+    caplog.set_level(logging.INFO)
+    output_state = os.path.join(dirs['output_dir'], f'{script.OUTPUT_NAME}_state.json')
+
+    script.main(**dirs)
+    assert sum('🧹 Parsed' in m for m in caplog.messages) == 2
+    mtime = os.stat(output_state).st_mtime_ns
+
+    # Unchanged inputs and code: nothing is rebuilt
+    caplog.clear()
+    script.main(**dirs)
+    assert any('nothing to do' in m for m in caplog.messages)
+    assert os.stat(output_state).st_mtime_ns == mtime
+
+    # Forced rebuild: both files come from the content-hash cache
+    caplog.clear()
+    script.main(force=True, **dirs)
+    assert sum('♻️ Cached' in m for m in caplog.messages) == 2
+
+    # A changed file is the only one parsed again, and its stale cache entry is replaced
+    with open(os.path.join(dirs['input_dir'], 'crim_hom_soff.csv'), 'a') as f:
+        f.write('ESTAT:CRIM_HOM_SOFF(1.0),01/01/24 23:00:00,A,F,NR,PT,2021,9,\n')
+    caplog.clear()
+    script.main(**dirs)
+    assert [m for m in caplog.messages if 'Parsed' in m or 'Cached' in m] == [
+        '🧹 Parsed: crim_hom_soff.csv (6 rows)', '♻️ Cached: crim_off_cat.tsv.gz (12 rows)'
+    ]
+    assert len([f for f in os.listdir(dirs['cache_dir']) if f.startswith('crim_hom_soff_')]) == 1
+    assert pl.read_csv(os.path.join(dirs['output_dir'], f'{script.OUTPUT_NAME}.csv')).height == 16
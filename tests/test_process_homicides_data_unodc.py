@@ -0,0 +1,100 @@
+import os
+
+import polars as pl
+import pytest
+
+from benchmarks.synthetic_data import N_COUNTRIES, load_processing_script, make_raw_unodc
+from src.analysis_utils import build_coverage_index
+from src.data_utils import write_processed_dataset
+
+CHUNK_SCALE = 0.25 # Countries per chunk of the raw extract (x200)
+N_CHUNKS = 3
+MEMORY_CAP_MB = 4
+
+#################################################################################################################
+
+@pytest.fixture(scope='module')
+def script():
+    return load_processing_script()
+
+@pytest.fixture(scope='module')
+def raw_dir(tmp_path_factory):
+    # Written chunk by chunk with disjoint countries, like benchmarks/bench_streaming.py
+    path = tmp_path_factory.mktemp('raw')
+    for chunk in range(N_CHUNKS):
+        make_raw_unodc(
+            CHUNK_SCALE, seed=chunk, first_country=chunk * int(N_COUNTRIES * CHUNK_SCALE)
+        ).write_parquet(path / f'chunk-{chunk:05d}.parquet')
+    return str(path)
+
+def _read_dataset(path):
+    return pl.read_parquet(path, hive_partitioning=True)
+
+#################################################################################################################
+
+def test_streaming_matches_in_memory(script, raw_dir, tmp_path, monkeypatch):
+    # Without the engine floor a cap of a few MB already splits the extract in many buckets
+    # (and several staging passes): the correctness of the out-of-core path does not depend on it
+    monkeypatch.setattr(script, 'ENGINE_OVERHEAD_MB', 0)
+
+    df_raw = script.scan_raw_data(raw_dir).collect()
+    assert df_raw.estimated_size('mb') > MEMORY_CAP_MB
+    n_buckets = script.country_buckets(script.harmonise_data(df_raw.lazy()), MEMORY_CAP_MB)['_bucket'].max() + 1
+    assert n_buckets > script.STAGING_BUCKETS_PER_PASS
+
+    # In-memory pipeline + the writes of main
+    memory_dir, streaming_dir = tmp_path / 'memory', tmp_path / 'streaming'
+    memory_dir.mkdir()
+    streaming_dir.mkdir()
+
+    df = script.process_data(df_raw)
+    df.write_csv(memory_dir / 'processed.csv')
+    write_processed_dataset(df, str(memory_dir / 'processed'))
+    build_coverage_index(df).write_parquet(memory_dir / 'coverage.parquet')
+    df_hashes = script.compute_series_hashes(script.harmonise_data(df_raw))
+
+    rows, df_hashes_streaming = script.process_data_streaming(
+        raw_dir, str(streaming_dir / 'processed.csv'), str(streaming_dir / 'processed'),
+        str(streaming_dir / 'coverage.parquet'), memory_cap_mb=MEMORY_CAP_MB
+    )
+
+    assert rows == df.height
+    assert (streaming_dir / 'processed.csv').read_bytes() == (memory_dir / 'processed.csv').read_bytes()
+    assert sorted(os.listdir(streaming_dir / 'processed')) == sorted(os.listdir(memory_dir / 'processed'))
+    assert _read_dataset(streaming_dir / 'processed').equals(_read_dataset(memory_dir / 'processed'))
+    assert pl.read_parquet(streaming_dir / 'coverage.parquet').equals(pl.read_parquet(memory_dir / 'coverage.parquet'))
+    assert df_hashes_streaming.equals(df_hashes)
+    # The staging directory is removed
+    assert sorted(os.listdir(streaming_dir)) == ['coverage.parquet', 'processed', 'processed.csv']
+
+def test_buckets_fit_memory_cap(script, raw_dir, monkeypatch):
+    monkeypatch.setattr(script, 'ENGINE_OVERHEAD_MB', 0)
+    lf = script.harmonise_data(script.scan_raw_data(raw_dir))
+    rows_per_bucket = script.bucket_rows(lf, MEMORY_CAP_MB)
+
+    df_buckets = script.country_buckets(lf, MEMORY_CAP_MB)
+    df_staged = lf.collect().join(df_buckets, on='Country', how='left', nulls_equal=True)
+    sizes = [
+        (df_bucket['Country'].n_unique(), df_bucket.height, df_bucket.drop('_bucket').estimated_size('mb'))
+        for _, df_bucket in df_staged.sort('_bucket').group_by('_bucket', maintain_order=True)
+    ]
+
+    assert len(sizes) > 1
+    # Buckets are ranges of the sorted countries
+    assert df_buckets['Country'].is_sorted() and df_buckets['_bucket'].is_sorted()
+    # Each bucket's working set fits in the cap, unless it holds a single country
+    for n_countries, rows, size_mb in sizes:
+        assert n_countries == 1 or rows <= rows_per_bucket
+        assert n_countries == 1 or size_mb * script.WORKING_SET_FACTOR <= MEMORY_CAP_MB * 1.05
+    # ...and is only closed when the next country does not fit
+    first_rows = (
+        df_staged.group_by('Country', '_bucket').len()
+        .sort('Country')
+        .group_by('_bucket', maintain_order=True).agg(pl.col('len').first())['len']
+    )
+    for (_, rows, _), next_rows in zip(sizes[:-1], first_rows[1:]):
+        assert rows + next_rows > rows_per_bucket
+
+def test_memory_cap_below_engine_overhead(script, raw_dir):
+    with pytest.raises(ValueError, match='memory cap'):
+        script.country_buckets(script.harmonise_data(script.scan_raw_data(raw_dir)), script.ENGINE_OVERHEAD_MB)
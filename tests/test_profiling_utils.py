@@ -0,0 +1,37 @@
+import json
+import threading
+
+import pytest
+
+from src.profiling_utils import disable_profiling, enable_profiling, stage
+
+#################################################################################################################
+
+@pytest.fixture
+def records(tmp_path):
+    path = tmp_path / 'profile.jsonl'
+    enable_profiling(jsonl_path=str(path))
+    yield lambda: [json.loads(line) for line in path.read_text().splitlines()]
+    disable_profiling()
+
+#################################################################################################################
+
+def test_stage_parents_are_per_thread(records):
+    # Both threads keep their outer stage open while the other one opens its inner stage
+    outer_open = threading.Barrier(2)
+    inner_open = threading.Barrier(2)
+
+    def request(tag):
+        with stage(f'{tag}.outer'):
+            outer_open.wait()
+            with stage(f'{tag}.inner'):
+                inner_open.wait()
+
+    threads = [threading.Thread(target=request, args=(tag,)) for tag in ['a', 'b']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    parents = {record['stage']: record['parent'] for record in records()}
+    assert parents == {'a.outer': None, 'a.inner': 'a.outer', 'b.outer': None, 'b.inner': 'b.outer'}